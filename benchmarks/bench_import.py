@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark
+
+Measures cold-start latency of the convert-only path (md2notion_core) and the
+upload path (md2notion_cli plus the lazily imported Notion client). Each
+measurement runs in a fresh interpreter so module caches do not hide the cost.
+
+Usage:
+    python benchmarks/bench_import.py [--runs 20]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SCENARIOS = {
+    "convert-only": (
+        "import md2notion_core\n"
+        "md2notion_core.MarkdownConverter().convert_markdown_to_blocks('# Title\\ntext')\n"
+    ),
+    "cli (no client)": (
+        "import md2notion_cli\n"
+    ),
+    "upload path": (
+        "import md2notion_cli\n"
+        "md2notion_cli.MarkdownToNotionConverter('token').notion\n"
+    ),
+}
+
+TIMER = (
+    "import time\n"
+    "_start = time.perf_counter()\n"
+    "{body}"
+    "print(time.perf_counter() - _start)\n"
+)
+
+
+def measure(body: str, runs: int) -> list:
+    """Run the snippet in fresh interpreters and return timings in seconds"""
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", TIMER.format(body=body)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark md2notion import latency")
+    parser.add_argument('--runs', type=int, default=20, help='Interpreter launches per scenario')
+    args = parser.parse_args()
+
+    print(f"{'scenario':<18} {'median ms':>10} {'p90 ms':>10} {'min ms':>10}")
+    for name, body in SCENARIOS.items():
+        try:
+            timings = sorted(measure(body, args.runs))
+        except subprocess.CalledProcessError as e:
+            print(f"{name:<18} failed: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        median = statistics.median(timings) * 1000
+        p90 = timings[int(len(timings) * 0.9) - 1] * 1000
+        print(f"{name:<18} {median:>10.1f} {p90:>10.1f} {timings[0] * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
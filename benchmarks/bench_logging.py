@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Logging hot-path benchmark
+
+Measures what a log call costs the thread that makes it: the old print
+statements, a synchronous file handler, and the queued JSON logging from
+md2notion_logging (formatting and writing happen on the listener thread),
+including sampled-out and disabled records.
+
+Usage:
+    python benchmarks/bench_logging.py [--calls 100000]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from md2notion_logging import configure_logging, set_request_id, shutdown_logging
+
+
+class SlowStream:
+    """A log sink that stalls like a full pipe or a slow disk"""
+    
+    def __init__(self, delay: float):
+        self.delay = delay
+    
+    def write(self, text: str):
+        time.sleep(self.delay)
+    
+    def flush(self):
+        pass
+
+
+def measure(label: str, calls: int, log_once):
+    start = time.perf_counter()
+    for i in range(calls):
+        log_once(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed / calls * 1e6:7.2f} µs/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cost of log calls on the request path")
+    parser.add_argument('--calls', type=int, default=100000, help='Log calls per measurement (default: 100000)')
+    args = parser.parse_args()
+    
+    logger = logging.getLogger("md2notion.bench")
+    root = logging.getLogger()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.log")
+        
+        with open(path, "w") as f, redirect_stdout(f):
+            start = time.perf_counter()
+            for i in range(args.calls):
+                print(f"🔍 DEBUG: Page ID: {i}")
+            elapsed = time.perf_counter() - start
+        print(f"{'print to file':<34} {elapsed / args.calls * 1e6:7.2f} µs/call")
+        
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        root.handlers[:] = [handler]
+        root.setLevel(logging.INFO)
+        measure("sync FileHandler", args.calls, lambda i: logger.info(f"Uploaded batch {i}"))
+        handler.close()
+        
+        with open(path, "w") as f:
+            configure_logging("INFO", stream=f, sample_rate=0.01)
+            set_request_id("bench")
+            measure("queued JSON", args.calls,
+                    lambda i: logger.info(f"Uploaded batch {i}", extra={"event": "upload_finished", "blocks": 100}))
+            measure("queued JSON, sampled at 1%", args.calls,
+                    lambda i: logger.info("GET / 200", extra={"event": "http_request"}))
+            measure("disabled DEBUG", args.calls, lambda i: logger.debug(f"Page ID: {i}"))
+            start = time.perf_counter()
+            shutdown_logging()
+            print(f"{'listener drain at shutdown':<34} {time.perf_counter() - start:7.2f} s")
+    
+    # A sink that blocks for 1 ms per write: the request thread waits for it
+    # with a synchronous handler, but not with the queue
+    slow_calls = min(args.calls, 1000)
+    handler = logging.StreamHandler(SlowStream(0.001))
+    root.handlers[:] = [handler]
+    measure("sync handler, 1 ms sink", slow_calls, lambda i: logger.info(f"Uploaded batch {i}"))
+    configure_logging("INFO", stream=SlowStream(0.001))
+    measure("queued JSON, 1 ms sink", slow_calls, lambda i: logger.info(f"Uploaded batch {i}"))
+    shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
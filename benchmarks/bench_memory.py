@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Streaming conversion memory benchmark
+
+Writes synthetic documents of increasing size from the tests/test_files
+corpus and converts each in a fresh process, reporting peak resident memory.
+The streaming path (memory-mapped file, chunked conversion, blocks consumed
+in upload-sized batches) should stay nearly flat while reading the whole
+file grows with it.
+
+Usage:
+    python benchmarks/bench_memory.py [--sizes-mb 1 10 100 1000] [--modes stream whole]
+"""
+
+import argparse
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from md2notion_core import MarkdownConverter, MAX_BLOCKS_PER_REQUEST
+
+
+def write_document(path: Path, size: int):
+    """Repeat the test corpus into path until it holds size bytes"""
+    samples = [p.read_bytes() for p in sorted((ROOT / "tests" / "test_files").glob("*.md"))]
+    written = 0
+    with open(path, "wb") as f:
+        while written < size:
+            for sample in samples:
+                f.write(sample + b"\n")
+                written += len(sample) + 1
+
+
+def run_child(mode: str, path: str):
+    """Convert path and print block count, seconds and peak RSS in MB"""
+    converter = MarkdownConverter()
+    start = time.perf_counter()
+    count = 0
+    if mode == "stream":
+        batch = []
+        for block in converter.iter_file_blocks(path):
+            batch.append(block)
+            if len(batch) == MAX_BLOCKS_PER_REQUEST:
+                count += len(batch)
+                batch = []
+        count += len(batch)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            count = len(converter.convert_markdown_to_blocks(f.read()))
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{count} {elapsed:.2f} {peak_mb:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark peak memory of streaming conversion")
+    parser.add_argument('--sizes-mb', type=float, nargs='+', default=[1, 10, 100],
+                        help='Document sizes in MB (default: 1 10 100)')
+    parser.add_argument('--modes', nargs='+', choices=['stream', 'whole'], default=['stream', 'whole'],
+                        help='Conversion paths to measure')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        run_child(*args.child)
+        return
+    
+    with tempfile.TemporaryDirectory() as directory:
+        for size_mb in args.sizes_mb:
+            path = Path(directory) / f"doc-{size_mb:g}mb.md"
+            write_document(path, int(size_mb * 1024 * 1024))
+            for mode in args.modes:
+                result = subprocess.run(
+                    [sys.executable, __file__, "--child", mode, str(path)],
+                    capture_output=True, text=True, check=True
+                )
+                blocks, seconds, peak_mb = result.stdout.split()
+                print(f"{size_mb:>7g} MB {mode:>6}: peak {float(peak_mb):8.1f} MB  "
+                      f"{float(seconds):7.2f}s  ({blocks} blocks)")
+            path.unlink()
+
+
+if __name__ == "__main__":
+    main()
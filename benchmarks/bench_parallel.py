@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Parallel conversion benchmark
+
+Builds a large synthetic document from the tests/test_files corpus and
+compares serial conversion with convert_markdown_parallel at several worker
+counts, checking that the output is identical.
+
+Usage:
+    python benchmarks/bench_parallel.py [--size-mb 50] [--workers 1 2 4 8 16]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from md2notion_core import MarkdownConverter, convert_markdown_parallel, split_markdown_chunks
+
+
+def build_document(size: int) -> str:
+    """Repeat the test corpus until the document reaches size characters"""
+    samples = [path.read_text(encoding="utf-8") for path in sorted((ROOT / "tests" / "test_files").glob("*.md"))]
+    parts = []
+    total = 0
+    while total < size:
+        for sample in samples:
+            parts.append(sample)
+            total += len(sample) + 1
+    return "\n".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel Markdown conversion")
+    parser.add_argument('--size-mb', type=float, default=50, help='Document size in MB (default: 50)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+                        help='Worker counts to try')
+    args = parser.parse_args()
+    
+    document = build_document(int(args.size_mb * 1024 * 1024))
+    print(f"Document: {len(document) / 1024 / 1024:.1f} MB, {os.cpu_count()} CPUs")
+    
+    start = time.perf_counter()
+    chunks = split_markdown_chunks(document, len(document) // 64)
+    print(f"Split into {len(chunks)} chunks in {time.perf_counter() - start:.2f}s")
+    
+    start = time.perf_counter()
+    expected = MarkdownConverter().convert_markdown_to_blocks(document)
+    serial = time.perf_counter() - start
+    print(f"{'serial':>10}: {serial:7.2f}s  ({len(expected)} blocks)")
+    
+    for workers in args.workers:
+        start = time.perf_counter()
+        blocks = convert_markdown_parallel(document, workers)
+        elapsed = time.perf_counter() - start
+        status = "identical" if blocks == expected else "MISMATCH"
+        print(f"{workers:>3} workers: {elapsed:7.2f}s  speedup {serial / elapsed:5.2f}x  {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Parser backend benchmark
+
+Converts the tests/test_files corpus and two synthetic large documents with
+every Markdown parser (the built-in one and the installed backends of
+md2notion_parsers) and reports, per document and parser, the conversion time,
+the peak memory allocated while converting (tracemalloc) and how the blocks
+differ from the baseline parser's. Blocks are compared by type and plain text;
+--diffs prints the most frequent differences.
+
+Usage:
+    python benchmarks/bench_parsers.py [--size-mb 2] [--runs 3] [--baseline regex] [--diffs 5]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from md2notion_core import BUILTIN_PARSER, MarkdownConverter
+from md2notion_parsers import PARSERS, get_parser
+
+SYNTHETIC_SECTION = """## Section {n}
+
+Some *emphasis*, **strong** text, `code`, a [link](https://example.com/{n}) and $x_{n}^2$.
+A second line of the same paragraph.
+
+- Item one with **bold**
+- Item two
+  - Nested item
+  - Another nested item
+
+1. First
+2. Second
+
+> A quoted remark
+> over two lines.
+
+```python
+def section_{n}():
+    return {n}
+```
+
+| Name | Value |
+|------|-------|
+| a{n} | {n} |
+| b{n} | `x \\| y` |
+
+---
+"""
+
+
+def corpus_document(size: int) -> str:
+    """Repeat the test corpus until the document reaches size characters"""
+    samples = [path.read_text(encoding="utf-8") for path in sorted((ROOT / "tests" / "test_files").glob("*.md"))]
+    parts = []
+    total = 0
+    while total < size:
+        for sample in samples:
+            parts.append(sample)
+            total += len(sample) + 1
+    return "\n".join(parts)
+
+
+def commonmark_document(size: int) -> str:
+    """Sections using fences, quotes and nested lists until the document reaches size characters"""
+    parts = []
+    total = 0
+    while total < size:
+        section = SYNTHETIC_SECTION.format(n=len(parts))
+        parts.append(section)
+        total += len(section) + 1
+    return "\n".join(parts)
+
+
+def available_parsers() -> list:
+    parsers = [BUILTIN_PARSER]
+    for name in PARSERS:
+        try:
+            get_parser(name)
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        parsers.append(name)
+    return parsers
+
+
+def signature(block: dict, depth: int = 0) -> list:
+    """One 'type: text' line per block, nested blocks indented"""
+    content = block.get(block["type"])
+    text = ""
+    if isinstance(content, dict):
+        text = "".join((item.get("text") or {}).get("content", "") or (item.get("equation") or {}).get("expression", "")
+                       for item in content.get("rich_text", []))
+        text = text or content.get("expression", "")
+    lines = [f"{'  ' * depth}{block['type']}: {' '.join(text.split())[:60]}"]
+    if isinstance(content, dict) and block["type"] != "table":
+        for child in content.get("children", []):
+            lines.extend(signature(child, depth + 1))
+    return lines
+
+
+def flatten(blocks: list) -> list:
+    return [line for block in blocks for line in signature(block)]
+
+
+def differences(expected: list, actual: list) -> list:
+    """(side, line) for every block line one output has more often than the other
+    
+    Comparing counts instead of aligning sequences keeps this linear on
+    large, repetitive documents; reordered blocks are not reported.
+    """
+    expected_counts, actual_counts = Counter(expected), Counter(actual)
+    changes = []
+    for line in dict.fromkeys(expected + actual):
+        surplus = expected_counts[line] - actual_counts[line]
+        changes.extend([("-" if surplus > 0 else "+", line)] * abs(surplus))
+    return changes
+
+
+def measure(converter: MarkdownConverter, document: str, parser: str, runs: int) -> tuple:
+    """Best time of runs, peak traced memory of one run and the blocks"""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        blocks = converter.convert_markdown_to_blocks(document, parser=parser)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    converter.convert_markdown_to_blocks(document, parser=parser)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Markdown parser backends")
+    parser.add_argument('--size-mb', type=float, default=2, help='Size of the synthetic documents in MB (default: 2)')
+    parser.add_argument('--runs', type=int, default=3, help='Timed runs per document; the best counts (default: 3)')
+    parser.add_argument('--baseline', default=BUILTIN_PARSER, help='Parser the others are compared with')
+    parser.add_argument('--diffs', type=int, default=0, metavar='N',
+                        help='Print the N most frequent differences per document and parser')
+    args = parser.parse_args()
+    
+    parsers = available_parsers()
+    if args.baseline not in parsers:
+        parser.error(f"baseline parser {args.baseline} is not available")
+    size = int(args.size_mb * 1024 * 1024)
+    documents = [(path.name, path.read_text(encoding="utf-8"))
+                 for path in sorted((ROOT / "tests" / "test_files").glob("*.md"))]
+    documents.append((f"corpus x{args.size_mb:g} MB", corpus_document(size)))
+    documents.append((f"commonmark x{args.size_mb:g} MB", commonmark_document(size)))
+    
+    converter = MarkdownConverter()
+    width = max(len(name) for name, _ in documents)
+    print(f"{'Document':<{width}}  {'Parser':<12}  {'Time':>9}  {'MB/s':>7}  {'Peak mem':>9}  "
+          f"{'Blocks':>7}  {'Differ':>7}")
+    totals = {name: [0.0, 0, 0] for name in parsers}
+    for doc_name, document in documents:
+        results = {name: measure(converter, document, name, args.runs) for name in parsers}
+        expected = flatten(results[args.baseline][2])
+        for name in parsers:
+            elapsed, peak, blocks = results[name]
+            actual = flatten(blocks)
+            changes = differences(expected, actual)
+            differ = "-" if name == args.baseline else str(len(changes))
+            megabytes = len(document.encode("utf-8")) / 1024 / 1024
+            print(f"{doc_name:<{width}}  {name:<12}  {elapsed * 1000:7.1f}ms  {megabytes / elapsed:7.1f}  "
+                  f"{peak / 1024 / 1024:7.1f}MB  {len(blocks):>7}  {differ:>7}")
+            totals[name][0] += elapsed
+            totals[name][1] = max(totals[name][1], peak)
+            totals[name][2] += len(changes) if name != args.baseline else 0
+            if args.diffs and name != args.baseline:
+                for (side, line), count in Counter(changes).most_common(args.diffs):
+                    print(f"    {count:>5} x only {args.baseline if side == '-' else name}: {line}")
+    
+    print()
+    for name, (elapsed, peak, changes) in totals.items():
+        print(f"{name:<12} total {elapsed:6.2f}s, peak {peak / 1024 / 1024:6.1f}MB, {changes} differing block lines")
+
+
+if __name__ == "__main__":
+    main()
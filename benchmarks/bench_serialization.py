@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Batch serialization benchmark
+
+Uploads the tests/test_files corpus through a real notion-client AsyncClient
+whose HTTP transport answers locally, and reports the CPU time of the whole
+upload and the share of it spent encoding request bodies. "before" sends
+plain payload lists, which httpx encodes with the standard json module on
+every attempt; "after" sends PreparedBlocks, serialized once (with orjson
+when installed) and reused by retries.
+
+Usage:
+    python benchmarks/bench_serialization.py [--repeat 300] [--retry-rate 0.1]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import md2notion_cli
+from md2notion_cli import MarkdownToNotionConverter, PreparedBlocks, create_notion_client
+
+
+def load_blocks(repeat: int) -> list:
+    converter = MarkdownToNotionConverter("bench-token")
+    samples = [p.read_text(encoding="utf-8") for p in sorted((ROOT / "tests" / "test_files").glob("*.md"))]
+    return converter.convert_markdown_to_blocks("\n\n".join(samples * repeat))
+
+
+class PlainListConverter(MarkdownToNotionConverter):
+    """The previous behaviour: children encoded by httpx on every attempt"""
+    
+    def _prepare_children(self, payloads):
+        return list(payloads)
+
+
+def make_converter(mode: str, retry_rate: float, counter: dict) -> MarkdownToNotionConverter:
+    def respond(request):
+        counter["requests"] += 1
+        if random.random() < retry_rate:
+            return httpx.Response(429, headers={"retry-after": "0"},
+                                  json={"object": "error", "code": "rate_limited", "message": "slow down"})
+        count = len(json.loads(request.content).get("children", [])) if request.content else 0
+        counter["ids"] += count
+        return httpx.Response(200, json={"object": "list", "results": [
+            {"id": f"{counter['ids'] - count + i:032x}"} for i in range(count)
+        ]})
+    
+    converter_class = PlainListConverter if mode == "before" else MarkdownToNotionConverter
+    converter = converter_class(f"bench-token-{mode}")
+    client = create_notion_client(converter.token)
+    client.client = httpx.AsyncClient(base_url=str(client.client.base_url), headers=client.client.headers,
+                                      transport=httpx.MockTransport(respond))
+    client.logger.setLevel(logging.ERROR)
+    converter.notion = client
+    return converter
+
+
+def encode_time(blocks: list, prepared: bool) -> float:
+    """CPU seconds spent encoding one request body per batch"""
+    converter = MarkdownToNotionConverter("bench-token")
+    batches = [[payload for _, payload, _ in batch] for batch in converter._request_batches(blocks)]
+    start = time.process_time()
+    for payloads in batches:
+        if prepared:
+            PreparedBlocks(payloads)
+        else:
+            json.dumps({"children": payloads}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return time.process_time() - start
+
+
+def run(mode: str, blocks: list, retry_rate: float):
+    random.seed(1)
+    counter = {"requests": 0, "ids": 0}
+    converter = make_converter(mode, retry_rate, counter)
+    start = time.process_time()
+    asyncio.run(converter._upload_blocks(blocks, "0" * 32))
+    upload = time.process_time() - start
+    
+    encoding = encode_time(blocks, prepared=(mode == "after"))
+    attempts = counter["requests"] / max(1, len(list(converter._request_batches(blocks))))
+    # Plain lists are encoded again on every attempt; prepared bytes once
+    encoding *= attempts if mode == "before" else 1
+    print(f"{mode:>6}: upload {upload:6.2f}s CPU, encoding {encoding:6.3f}s "
+          f"({encoding / upload:5.1%}), {counter['requests']} requests")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark request body serialization during uploads")
+    parser.add_argument('--repeat', type=int, default=300, help='Copies of the test corpus to upload (default: 300)')
+    parser.add_argument('--retry-rate', type=float, default=0.1,
+                        help='Fraction of requests answered with 429 (default: 0.1)')
+    args = parser.parse_args()
+    
+    blocks = load_blocks(args.repeat)
+    print(f"{len(blocks)} top-level blocks, encoder: {'orjson' if md2notion_cli.orjson else 'json'}")
+    for mode in ("before", "after"):
+        run(mode, blocks, args.retry_rate)
+
+
+if __name__ == "__main__":
+    main()
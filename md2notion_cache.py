@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Shared in-process caches for md2notion
+
+page_cache keeps the metadata of pages md2notion has created or looked up,
+so appending to a known page does not cost a pages.retrieve call each time.
+Entries expire after a TTL, since pages can be renamed, moved or deleted in
+Notion, and the least recently used ones are evicted beyond a size bound.
+Keys include the token fingerprint, so a page is never served from the cache
+to a token that could not read it. schema_cache does the same for the
+property types of databases that pages are published into.
+
+PageTitleIndex maps page titles to IDs for [[Page Title]] links, so links
+resolve without a search request each.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from md2notion_metrics import record_cache
+
+# Page metadata is reused for this long, and for at most this many pages
+DEFAULT_PAGE_TTL = 300.0
+DEFAULT_PAGE_CACHE_SIZE = 1024
+DEFAULT_SCHEMA_TTL = 300.0
+DEFAULT_SCHEMA_CACHE_SIZE = 64
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries expire after ttl seconds"""
+    
+    def __init__(self, name: str, ttl: float, maxsize: int, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """The cached value, or None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self.clock():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        record_cache(self.name, entry is not None)
+        return entry[1] if entry is not None else None
+    
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def pop(self, key: Hashable):
+        """Drop an entry, e.g. after the page turned out to be gone"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+page_cache = TTLCache("page", DEFAULT_PAGE_TTL, DEFAULT_PAGE_CACHE_SIZE)
+schema_cache = TTLCache("database_schema", DEFAULT_SCHEMA_TTL, DEFAULT_SCHEMA_CACHE_SIZE)
+
+
+def normalize_title(title: str) -> str:
+    """Key for title lookups, ignoring case and runs of whitespace"""
+    return " ".join(title.split()).casefold()
+
+
+def page_title(page: Dict[str, Any]) -> Optional[str]:
+    """Plain-text title of a page object, from whichever property holds it"""
+    for prop in (page.get("properties") or {}).values():
+        if prop.get("type") == "title":
+            return "".join(item.get("plain_text", item.get("text", {}).get("content", ""))
+                           for item in prop.get("title", []))
+    return None
+
+
+class PageTitleIndex:
+    """Local title -> page ID index for resolving [[Page Title]] links
+    
+    warm() indexes every page the integration can see with one paginated
+    search sweep, most recently edited first, so a title shared by several
+    pages resolves to the newest. Pages created later are added as they are
+    created. Lookups never make requests.
+    """
+    
+    def __init__(self):
+        self._ids: Dict[str, str] = {}
+        self.warmed = False
+    
+    def get(self, title: str, default: Optional[str] = None) -> Optional[str]:
+        page_id = self._ids.get(normalize_title(title))
+        record_cache("page_title", page_id is not None)
+        return page_id if page_id is not None else default
+    
+    def add(self, page_id: str, title: str, replace: bool = True):
+        key = normalize_title(title)
+        if key and (replace or key not in self._ids):
+            self._ids[key] = page_id
+    
+    async def warm(self, notion, page_size: int = 100) -> int:
+        """Index all visible pages; returns the number of search requests made"""
+        requests = 0
+        cursor = None
+        while True:
+            response = await notion.search(
+                filter={"property": "object", "value": "page"},
+                sort={"direction": "descending", "timestamp": "last_edited_time"},
+                page_size=page_size,
+                **({"start_cursor": cursor} if cursor else {})
+            )
+            requests += 1
+            for page in response.get("results", []):
+                title = page_title(page)
+                if title:
+                    self.add(page["id"], title, replace=False)
+            cursor = response.get("next_cursor")
+            if not response.get("has_more") or not cursor:
+                break
+        self.warmed = True
+        return requests
+    
+    def __len__(self) -> int:
+        return len(self._ids)
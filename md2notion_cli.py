@@ -5,523 +5,659 @@ Markdown to Notion Converter
 A simple command-line tool to convert and upload Markdown files to Notion pages.
 """
 
-import re
 import os
 import sys
 import argparse
 import logging
 import asyncio
+import functools
+import inspect
 import json
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+from md2notion_core import (
+    BUILTIN_PARSER,
+    MarkdownConverter,
+    MAX_BLOCKS_PER_REQUEST,
+    MAX_ELEMENTS_PER_REQUEST,
+    PARALLEL_MIN_CHUNK_SIZE,
+    convert_markdown_parallel,
+    extract_page_id_from_url,
+    iter_file_lines,
+    normalize_page_id,
+)
+from md2notion_cache import PageTitleIndex, page_cache, page_title
+from md2notion_linemap import SIDECAR_SUFFIX, LineMap, sidecar_path
+from md2notion_metrics import BLOCKS_UPLOADED, BYTES_UPLOADED, CONVERSION_SECONDS
+from md2notion_parsers import PARSERS, get_parser
+from md2notion_progress import UploadProgress, count_blocks
+from md2notion_throttle import concurrency_controller, token_key
 
 try:
-    from notion_client import AsyncClient
+    import orjson
 except ImportError:
-    print("Error: notion-client package not found. Please install it with: pip install notion-client")
-    sys.exit(1)
+    orjson = None
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
-class MarkdownToNotionConverter:
-    """Convert Markdown content to Notion blocks"""
+def dumps_json(value: Any) -> bytes:
+    """Compact UTF-8 JSON, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class PreparedBlocks(list):
+    """Block payloads serialized once, so sends and retries reuse the bytes
     
-    def __init__(self, token: str):
-        """Initialize the converter with Notion API token"""
-        self.notion = AsyncClient(auth=token)
+    It is still a list of the payloads; clients from create_notion_client
+    send the stored JSON instead of encoding the children again.
+    """
     
-    def _create_rich_text(self, content: str, annotations: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Create a rich text object"""
-        return {
-            "type": "text",
-            "text": {"content": content},
-            "annotations": annotations or {
-                "italic": False, "bold": False, "code": False,
-                "underline": False, "strikethrough": False, "color": "default"
-            }
-        }
+    def __init__(self, payloads: Iterable[Dict[str, Any]]):
+        super().__init__(payloads)
+        self.json = dumps_json(self)
+
+
+@functools.lru_cache(maxsize=None)
+def _client_class():
+    """The AsyncClient subclass of create_notion_client, defined on first use
     
-    def parse_style(self, text: str) -> List[Dict[str, Any]]:
-        """Parse text styling: **bold**, *italic*, `code`"""
-        rich_text = []
+    Written against notion-client 3.x, where every endpoint calls request(),
+    which builds its httpx request with _build_request(). A release without
+    that builder would quietly re-encode PreparedBlocks, so it is refused.
+    """
+    try:
+        from notion_client import AsyncClient
+    except ImportError as e:
+        raise ImportError("notion-client package not found. Please install it with: pip install notion-client") from e
+    build_request = getattr(AsyncClient, "_build_request", None)
+    if build_request is None or list(inspect.signature(build_request).parameters)[1:5] != ["method", "path",
+                                                                                             "query", "body"]:
+        raise ImportError("Unsupported notion-client version; install notion-client 3.x")
+    
+    class NotionClient(AsyncClient):
+        """Throttled by the token's concurrency controller; sends PreparedBlocks bodies as they are"""
         
-        # More robust pattern that handles nested content better
-        # This pattern matches bold, italic, code, and regular text
-        pattern = r'(`[^`]*`|\*\*[^*]*\*\*|__[^_]*__|\*[^*]*\*|_[^_]*_|[^*_`]+)'
+        def __init__(self, token: str, **options):
+            super().__init__(auth=token, **options)
+            self.controller = concurrency_controller(token)
         
-        for match in re.finditer(pattern, text):
-            content = match.group(0)
-            
-            if content.startswith('`') and content.endswith('`'):
-                rich_text.append(self._create_rich_text(content[1:-1], {"code": True, "italic": False, "bold": False, "underline": False, "strikethrough": False, "color": "default"}))
-            elif content.startswith('**') and content.endswith('**') or content.startswith('__') and content.endswith('__'):
-                rich_text.append(self._create_rich_text(content[2:-2], {"bold": True, "italic": False, "code": False, "underline": False, "strikethrough": False, "color": "default"}))
-            elif content.startswith('*') and content.endswith('*') or content.startswith('_') and content.endswith('_'):
-                rich_text.append(self._create_rich_text(content[1:-1], {"italic": True, "bold": False, "code": False, "underline": False, "strikethrough": False, "color": "default"}))
+        async def request(self, *args, **kwargs):
+            # All endpoints call request, so this routes every API call
+            return await self.controller.request(super().request, *args, **kwargs)
+        
+        def _build_request(self, method, path, query=None, body=None, *args, **kwargs):
+            if not (isinstance(body, dict) and isinstance(body.get("children"), PreparedBlocks)):
+                return super()._build_request(method, path, query, body, *args, **kwargs)
+            request = super()._build_request(method, path, query, None, *args, **kwargs)
+            rest = {key: value for key, value in body.items() if key != "children"}
+            content = b'{"children":' + body["children"].json
+            if rest:
+                content += b"," + dumps_json(rest)[1:]
             else:
-                rich_text.append(self._create_rich_text(content))
-        
-        return rich_text
-    
-    def parse_equations_and_style(self, text: str) -> List[Dict[str, Any]]:
-        """Parse inline equations and text styling with better mixed content handling"""
-        rich_text = []
-        
-        # First, check if there are styled blocks that contain equations
-        # Pattern to match styled content that might contain equations
-        styled_pattern = re.compile(r'(\*\*[^*]*?\$[^*]*?\$[^*]*?\*\*|__[^_]*?\$[^_]*?\$[^_]*?__|\*[^*]*?\$[^*]*?\$[^*]*?\*|_[^_]*?\$[^_]*?\$[^_]*?_)')
-        
-        # Find all styled content with equations
-        styled_matches = list(styled_pattern.finditer(text))
-        
-        if styled_matches:
-            # Process styled content with equations
-            last_idx = 0
-            for match in styled_matches:
-                # Add text before styled content
-                if match.start() > last_idx:
-                    before_text = text[last_idx:match.start()]
-                    if before_text:
-                        rich_text.extend(self._parse_mixed_content(before_text))
-                
-                # Process styled content with equations
-                styled_content = match.group(0)
-                rich_text.extend(self._parse_styled_with_equations(styled_content))
-                
-                last_idx = match.end()
-            
-            # Add remaining text
-            if last_idx < len(text):
-                remaining_text = text[last_idx:]
-                if remaining_text:
-                    rich_text.extend(self._parse_mixed_content(remaining_text))
-        else:
-            # No styled content with equations, use regular parsing
-            rich_text = self._parse_mixed_content(text)
-        
-        return rich_text
-    
-    def _parse_styled_with_equations(self, styled_content: str) -> List[Dict[str, Any]]:
-        """Parse styled content that contains equations"""
-        rich_text = []
-        
-        # Determine the style type
-        if styled_content.startswith('**') and styled_content.endswith('**'):
-            style = {"bold": True, "italic": False, "code": False, "underline": False, "strikethrough": False, "color": "default"}
-            content = styled_content[2:-2]
-        elif styled_content.startswith('__') and styled_content.endswith('__'):
-            style = {"bold": True, "italic": False, "code": False, "underline": False, "strikethrough": False, "color": "default"}
-            content = styled_content[2:-2]
-        elif styled_content.startswith('*') and styled_content.endswith('*'):
-            style = {"bold": False, "italic": True, "code": False, "underline": False, "strikethrough": False, "color": "default"}
-            content = styled_content[1:-1]
-        elif styled_content.startswith('_') and styled_content.endswith('_'):
-            style = {"bold": False, "italic": True, "code": False, "underline": False, "strikethrough": False, "color": "default"}
-            content = styled_content[1:-1]
+                content += b"}"
+            headers = request.headers.copy()
+            # The request was built without a body; let httpx frame the new one
+            for name in ("Content-Length", "Transfer-Encoding"):
+                headers.pop(name, None)
+            headers["Content-Type"] = "application/json"
+            return type(request)(request.method, request.url, headers=headers, content=content,
+                                 extensions=request.extensions)
+    
+    return NotionClient
+
+
+def create_notion_client(token: str):
+    """Create the async Notion client, importing notion-client on first use
+    
+    Every request of the client goes through the adaptive concurrency
+    controller shared by all clients with the same token, and PreparedBlocks
+    children are sent pre-serialized.
+    """
+    client_class = _client_class()
+    from notion_client.client import ClientOptions
+    
+    options = {}
+    # notion-client 3 retries 429s itself; leave them (and Retry-After) to the controller
+    if "retry" in getattr(ClientOptions, "__dataclass_fields__", {}):
+        options["retry"] = False
+    return client_class(token, **options)
+
+
+class RateLimiter:
+    """Async token bucket limiting how many requests start per second"""
+    
+    def __init__(self, requests_per_second: float, burst: int = 1):
+        self.rate = requests_per_second
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = None
+        self._lock = None
+    
+    async def acquire(self):
+        """Wait until a request may be sent"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ImportProgress:
+    """Log progress and throughput of a long-running row import"""
+    
+    def __init__(self, label: str, total: int, log_every: Optional[int] = None):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.log_every = log_every or max(1, total // 20)
+        self._started = None
+    
+    def start(self):
+        self._started = asyncio.get_running_loop().time()
+    
+    def advance(self, count: int = 1):
+        self.done += count
+        if self.done % self.log_every == 0 or self.done == self.total:
+            self.report()
+    
+    def report(self):
+        elapsed = asyncio.get_running_loop().time() - self._started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else 0.0
+        percent = 100.0 * self.done / self.total if self.total else 100.0
+        logger.info(
+            f"{self.label}: {self.done}/{self.total} ({percent:.0f}%) - "
+            f"{rate:.1f} rows/s, ETA {int(eta // 60)}m {int(eta % 60)}s"
+        )
+
+
+class MarkdownToNotionConverter(MarkdownConverter):
+    """Convert Markdown content to Notion blocks and upload them"""
+    
+    def __init__(self, token: str, max_concurrency: int = 3, tables_as_databases: bool = False,
+                 requests_per_second: float = 3.0, conversion_workers: int = 1,
+                 split_level: Optional[int] = None, link_pages: bool = False, line_map=None,
+                 parser: str = BUILTIN_PARSER):
+        """Initialize the converter with Notion API token
+        
+        max_concurrency bounds how many follow-up requests (rows of large
+        tables, database row pages) may be in flight at once.
+        tables_as_databases imports tables as inline databases instead of
+        table blocks; their rows are created at most requests_per_second.
+        conversion_workers > 1 converts large documents in a process pool.
+        split_level moves every section under a heading of that level or
+        higher to its own child page; the pages upload concurrently.
+        link_pages turns [[Page Title]] links into page mentions, using a
+        title index built with one search sweep before the first upload.
+        line_map (a LineMap) turns on source line tracking and collects the
+        ID of every block appended with a known line range.
+        parser names the Markdown parser: the built-in one or a backend from
+        md2notion_parsers.
+        """
+        self.token = token
+        self._notion = None
+        self.max_concurrency = max_concurrency
+        self.tables_as_databases = tables_as_databases
+        self.requests_per_second = requests_per_second
+        self.conversion_workers = conversion_workers
+        self.split_level = split_level
+        self.page_titles = PageTitleIndex() if link_pages else None
+        self.line_map = line_map
+        self.track_lines = line_map is not None
+        self.parser = parser
+        # An UploadProgress the CLI sets to follow conversion and upload
+        self.progress: Optional[UploadProgress] = None
+        # Set while one document is uploaded to several targets
+        self._shared_batches: Optional[Dict[tuple, list]] = None
+        self._row_limiter: Optional[RateLimiter] = None
+    
+    @property
+    def notion(self):
+        """Notion API client, created lazily so conversion never loads it"""
+        if self._notion is None:
+            self._notion = create_notion_client(self.token)
+        return self._notion
+    
+    @notion.setter
+    def notion(self, client):
+        self._notion = client
+    
+    async def _append_table_rows(self, table_id: str, rows: List[List[str]], limit: asyncio.Semaphore):
+        """Append overflow table rows to an existing table in ordered chunks"""
+        async with limit:
+            for chunk_num, chunk in enumerate(self.iter_table_row_chunks(rows), start=1):
+                children = self._prepare_children(chunk)
+                await self.notion.blocks.children.append(block_id=table_id, children=children)
+                self._uploaded(len(chunk), children)
+                logger.info(f"Appended table rows chunk {chunk_num} ({len(chunk)} rows) to {table_id}",
+                            extra={"event": "table_rows"})
+    
+    async def _create_table_database(self, table_block: Dict[str, Any], parent_id: str, title: str) -> str:
+        """Create an inline database shaped like a parsed table"""
+        names = self._database_property_names(table_block)
+        types = self.infer_column_types(table_block)
+        properties = {name: {prop_type: {}} for name, prop_type in zip(names, types)}
+        if hasattr(self.notion, "data_sources"):
+            # Newer API versions take the columns as the database's first data source
+            schema = {"initial_data_source": {"properties": properties}}
         else:
-            # Fallback to regular text
-            return [self._create_rich_text(styled_content)]
-        
-        # Parse equations within the styled content
-        equation_pattern = re.compile(r'(?<!\$)\$(?!\$)(.+?)(?<!\$)\$(?!\$)|\\\((.+?)\\\)', re.DOTALL)
-        last_idx = 0
-        
-        for match in equation_pattern.finditer(content):
-            # Text before equation
-            if match.start() > last_idx:
-                before_text = content[last_idx:match.start()]
-                if before_text:
-                    rich_text.append(self._create_rich_text(before_text, style))
-            
-            # Equation content
-            if match.group(1):  # $...$ format
-                equation = match.group(1).strip('\n ').replace('\n', ' ')
-            else:  # \(...\) format
-                equation = match.group(2).strip('\n ').replace('\n', ' ')
-            
-            if equation:
-                rich_text.append({
-                    "type": "equation",
-                    "equation": {"expression": equation}
-                })
-            
-            last_idx = match.end()
-        
-        # Text after last equation
-        if last_idx < len(content):
-            remaining_text = content[last_idx:]
-            if remaining_text:
-                rich_text.append(self._create_rich_text(remaining_text, style))
-        
-        return rich_text
-    
-    def _parse_mixed_content(self, text: str) -> List[Dict[str, Any]]:
-        """Parse regular text that may contain equations and styling"""
-        rich_text = []
-        # Extract inline equations first (support both $...$ and \(...\) formats)
-        pattern = re.compile(r'(?<!\$)\$(?!\$)(.+?)(?<!\$)\$(?!\$)|\\\((.+?)\\\)', re.DOTALL)
-        last_idx = 0
-        
-        for match in pattern.finditer(text):
-            # Text before equation
-            if match.start() > last_idx:
-                before_text = text[last_idx:match.start()]
-                if before_text:
-                    rich_text.extend(self.parse_style(before_text))
-            
-            # Equation content (handle both formats)
-            if match.group(1):  # $...$ format
-                equation = match.group(1).strip('\n ').replace('\n', ' ')
-            else:  # \(...\) format
-                equation = match.group(2).strip('\n ').replace('\n', ' ')
-            
-            if equation:
-                rich_text.append({
-                    "type": "equation",
-                    "equation": {"expression": equation}
-                })
-            
-            last_idx = match.end()
+            schema = {"properties": properties}
+        database = await self.notion.databases.create(
+            parent={"type": "page_id", "page_id": parent_id},
+            title=[self._create_rich_text(title)],
+            is_inline=True,
+            **schema
+        )
+        logger.info(f"Created database '{title}' with columns: "
+                    + ", ".join(f"{name} ({prop_type})" for name, prop_type in zip(names, types)))
+        return database["id"]
+    
+    async def _import_table_rows(self, database_id: str, table_block: Dict[str, Any], limiter: RateLimiter):
+        """Create one database page per table row through a rate-limited worker pool"""
+        names = self._database_property_names(table_block)
+        types = self.infer_column_types(table_block)
+        total = len(table_block["table"]["children"]) - 1 + len(table_block.get("_pending_rows", []))
+        if not total:
+            return
         
-        # Text after last equation
-        if last_idx < len(text):
-            remaining_text = text[last_idx:]
-            if remaining_text:
-                rich_text.extend(self.parse_style(remaining_text))
+        rows = self._table_cells(table_block)
+        progress = ImportProgress(f"Database {database_id} rows", total)
+        progress.start()
         
-        return rich_text
-
+        async def worker():
+            # Rows are pulled lazily from the shared generator, so only rows in
+            # flight are materialised as property payloads
+            for cells in rows:
+                await limiter.acquire()
+                await self.notion.pages.create(
+                    parent={"database_id": database_id},
+                    properties=self._database_row_properties(names, types, cells)
+                )
+                self._uploaded(1)
+                progress.advance()
+        
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(self.max_concurrency, total))]
+        try:
+            await asyncio.gather(*workers)
+        except Exception as e:
+            logger.error(f"Failed to import rows into database {database_id}: {str(e)}")
+            for task in workers:
+                task.cancel()
+            raise
     
-    def _parse_table(self, lines: List[str], start_index: int) -> tuple[List[Dict[str, Any]], int]:
-        """Parse markdown table and convert to Notion table blocks"""
-        table_blocks = []
-        i = start_index
+    def _shallow_payload(self, block: Dict[str, Any]) -> tuple:
+        """Split a block into its request payload and children to append later
         
-        # Parse header
-        if i >= len(lines):
-            return table_blocks, i
+        Children are sent inline only when none of them has children of its
+        own, since an append response carries the IDs of top-level blocks
+        only. Deeper trees are stripped to the top-level block, and the
+        children are appended to it once its ID is known. Table rows always
+        stay inline because a table cannot be created without them.
+        """
+        payload = self._payload_block(block)
+        block_type = payload.get("type")
+        content = payload.get(block_type)
+        if block_type == "table" or not isinstance(content, dict) or not content.get("children"):
+            return payload, None
         
-        header_line = lines[i].strip()
-        if not header_line.startswith('|') or not header_line.endswith('|'):
-            return table_blocks, i
+        children = content["children"]
+        if len(children) <= MAX_BLOCKS_PER_REQUEST and not any(self._has_nested_children(child) for child in children):
+            return payload, None
+        payload[block_type] = {k: v for k, v in content.items() if k != "children"}
+        # Deferred children keep their temporary fields, like top-level blocks
+        return payload, block[block_type]["children"]
+    
+    def _has_nested_children(self, block: Dict[str, Any]) -> bool:
+        content = block.get(block.get("type"))
+        return isinstance(content, dict) and bool(content.get("children"))
+    
+    def _payload_size(self, payload: Dict[str, Any]) -> int:
+        """Blocks in a payload, counting its inline children"""
+        content = payload.get(payload.get("type"))
+        return 1 + (len(content.get("children", [])) if isinstance(content, dict) else 0)
+    
+    def _request_batches(self, blocks: Iterable[Dict[str, Any]]) -> Iterator[list]:
+        """Group blocks into append requests within Notion's size limits
         
-        # Parse header cells
-        header_cells = [cell.strip() for cell in header_line.split('|')[1:-1]]
+        Yields lists of (block, payload, deferred children) with at most
+        MAX_BLOCKS_PER_REQUEST top-level blocks and MAX_ELEMENTS_PER_REQUEST
+        blocks including inline children.
+        """
+        batch = []
+        size = 0
+        for block in blocks:
+            payload, deferred = self._shallow_payload(block)
+            block_size = self._payload_size(payload)
+            if batch and (len(batch) == MAX_BLOCKS_PER_REQUEST or size + block_size > MAX_ELEMENTS_PER_REQUEST):
+                yield batch
+                batch = []
+                size = 0
+            batch.append((block, payload, deferred))
+            size += block_size
+        if batch:
+            yield batch
+    
+    def _prepare_children(self, payloads: Iterable[Dict[str, Any]]) -> list:
+        """Serialize the children of an append request once, for every attempt"""
+        return PreparedBlocks(payloads)
+    
+    def _batch_children(self, batch: list) -> list:
+        """Children of an append request, serialized once for all targets when uploading to several"""
+        if self._shared_batches is None:
+            return self._prepare_children(payload for _, payload, _ in batch)
+        # The blocks are shared by every target, so the same blocks batch up the same way
+        key = tuple(id(block) for block, _, _ in batch)
+        children = self._shared_batches.get(key)
+        if children is None:
+            children = self._shared_batches[key] = self._prepare_children(payload for _, payload, _ in batch)
+        return children
+    
+    def _uploaded(self, count: int, children: Optional[list] = None):
+        """Count the blocks and request bytes of a successful append request"""
+        BLOCKS_UPLOADED.inc(count)
+        if isinstance(children, PreparedBlocks):
+            BYTES_UPLOADED.inc(len(children.json))
+        if self.progress is not None:
+            self.progress.sent(count)
+    
+    async def _append_request(self, target_id: str, batch: list, follow_ups: list,
+                              follow_up_limit: asyncio.Semaphore, after: Optional[str] = None) -> List[str]:
+        """Send one append request and schedule the follow-ups of its blocks
         
-        # Skip separator line (| --- | --- |)
-        i += 1
-        if i < len(lines) and lines[i].strip().startswith('|'):
-            i += 1
+        Overflow table rows and deferred nested children go to their parents
+        as follow-up tasks; different parents fill concurrently, bounded by
+        follow_up_limit.
+        """
+        position = {"after": after} if after else {}
+        children = self._batch_children(batch)
+        response = await self.notion.blocks.children.append(
+            block_id=target_id,
+            children=children,
+            **position
+        )
         
-        # Parse data rows
-        data_rows = []
-        while i < len(lines):
-            line = lines[i].strip()
-            if not line.startswith('|') or not line.endswith('|'):
-                break
-            
-            row_cells = [cell.strip() for cell in line.split('|')[1:-1]]
-            if len(row_cells) == len(header_cells):
-                data_rows.append(row_cells)
-            i += 1
-        
-        # Create table block
-        if header_cells and data_rows:
-            # Per Notion validation, table rows must live under table.children
-            table_block = {
-                "object": "block",
-                "type": "table",
-                "table": {
-                    "table_width": len(header_cells),
-                    "has_column_header": True,
-                    "has_row_header": False,
-                    "children": []
-                }
-            }
-            
-            # Add header row
-            header_row = {
-                "object": "block",
-                "type": "table_row",
-                "table_row": {
-                    "cells": [[self._create_rich_text(cell)] for cell in header_cells]
-                }
-            }
-            table_block["table"]["children"].append(header_row)
-            
-            # Add data rows
-            for row in data_rows:
-                data_row = {
-                    "object": "block",
-                    "type": "table_row",
-                    "table_row": {
-                        "cells": [[self._create_rich_text(cell)] for cell in row]
-                    }
-                }
-                table_block["table"]["children"].append(data_row)
-            
-            table_blocks.append(table_block)
+        self._uploaded(sum(self._payload_size(payload) for _, payload, _ in batch), children)
         
-        return table_blocks, i
+        block_ids = []
+        for (block, _, deferred), result in zip(batch, response.get("results", [])):
+            block_ids.append(result["id"])
+            if self.line_map is not None and block.get("_lines"):
+                self.line_map.add(block["_lines"], result["id"], target_id)
+            if block.get("_pending_rows"):
+                follow_ups.append(asyncio.ensure_future(
+                    self._append_table_rows(result["id"], block["_pending_rows"], follow_up_limit)
+                ))
+            if deferred:
+                follow_ups.append(asyncio.ensure_future(
+                    self._append_children(result["id"], deferred, follow_ups, follow_up_limit)
+                ))
+        return block_ids
     
-    def _is_list_item(self, line: str) -> tuple[bool, str, str, int]:
-        """Check if line is a list item. Returns: (is_list, type, content, indent_level)"""
-        line_strip = line.strip()
-        if not line_strip:
-            return False, "", "", 0
+    async def _append_children(self, parent_id: str, children: list, follow_ups: list,
+                               follow_up_limit: asyncio.Semaphore):
+        """Append deferred children to an uploaded block, in order"""
+        for batch in self._request_batches(children):
+            async with follow_up_limit:
+                await self._append_request(parent_id, batch, follow_ups, follow_up_limit)
+            logger.debug(f"Appended {len(batch)} nested blocks to {parent_id}")
+    
+    async def _upload_blocks(self, blocks: Iterable[Dict[str, Any]], target_id: str, is_page: bool = False,
+                             after: Optional[str] = None) -> List[str]:
+        """Upload blocks to Notion in batches
         
-        indent_level = len(line) - len(line.lstrip())
+        Batches for the target are sent sequentially to keep their order. The
+        upload is skeleton-first: top-level blocks go out with at most one
+        level of leaf children, and deeper children, as well as rows that
+        did not fit into a table's first request, are appended to their
+        parents afterwards. Different parents fill concurrently (bounded by
+        max_concurrency) while each parent's own requests stay in order.
         
-        # Check numbered list
-        numbered_match = re.match(r'^\d+\.\s+(.+)$', line_strip)
-        if numbered_match:
-            return True, "numbered", numbered_match.group(1), indent_level
+        With tables_as_databases, each table becomes an inline database at its
+        position in the page and its rows are imported in the background while
+        the remaining blocks are uploaded.
         
-        # Check bulleted list
-        bullet_match = re.match(r'^[\*\-+]\s+(.+)$', line_strip)
-        if bullet_match:
-            return True, "bulleted", bullet_match.group(1), indent_level
+        When after is given, the blocks are inserted after that child block of
+        the target. Databases cannot be positioned that way, so tables stay
+        table blocks for such inserts.
         
-        return False, "", "", 0
-    
-    def _process_list_group(self, lines: list, start_index: int, blocks: list) -> int:
-        """Process a group of list items with nesting"""
-        i = start_index
-        stack = []  # Stack to manage nesting levels: (indent_level, block)
+        Blocks may come from a generator: they are sent as soon as a full
+        request has been collected, so a streamed document is never held in
+        memory as a whole.
         
-        while i < len(lines):
-            line = lines[i]
-            is_list, list_type, content, indent_level = self._is_list_item(line)
-            
-            if not is_list:
-                break
-            
-            # Create current list item
-            current_block = {
-                "object": "block",
-                "type": f"{list_type}_list_item",
-                f"{list_type}_list_item": {
-                    "rich_text": self.parse_equations_and_style(content)
-                },
-                "_line_index": i
-            }
-            
-            # Handle nesting
-            while stack and stack[-1][0] >= indent_level:
-                stack.pop()
-            
-            if stack:
-                # Add to parent's children
-                parent_indent, parent_block = stack[-1]
-                parent_type = parent_block["type"]
-                if "children" not in parent_block[parent_type]:
-                    parent_block[parent_type]["children"] = []
-                parent_block[parent_type]["children"].append(current_block)
-            else:
-                # Add to main blocks
-                blocks.append(current_block)
-            
-            stack.append((indent_level, current_block))
-            i += 1
+        Returns the IDs of the created top-level blocks.
+        """
+        if isinstance(blocks, list):
+            if not blocks:
+                return []
+            logger.info(f"Uploading {len(blocks)} blocks to Notion")
         
-        return i
-    
-    def _clean_blocks_recursively(self, blocks):
-        """Remove temporary fields from blocks recursively"""
-        if not isinstance(blocks, list):
-            return blocks
+        block_ids = []
+        follow_ups = []
+        follow_up_limit = asyncio.Semaphore(self.max_concurrency)
+        row_limiter = self._row_limiter or RateLimiter(self.requests_per_second)
+        pending = []
+        batches_sent = 0
         
-        cleaned_blocks = []
-        for block in blocks:
-            if not isinstance(block, dict):
-                continue
-            
-            # Copy block without temporary fields
-            cleaned_block = {k: v for k, v in block.items() if k != '_line_index'}
+        async def flush():
+            nonlocal pending, batches_sent
+            for batch in self._request_batches(pending):
+                batches_sent += 1
+                anchor = (block_ids[-1] if block_ids else after) if after else None
+                try:
+                    block_ids.extend(await self._append_request(
+                        target_id, batch, follow_ups, follow_up_limit, anchor
+                    ))
+                    logger.info(f"Uploaded batch {batches_sent} ({len(batch)} blocks)", extra={"event": "upload_batch"})
+                except Exception as e:
+                    logger.error(f"Failed to upload batch {batches_sent}: {str(e)}")
+                    raise
+            pending = []
+        
+        try:
+            table_count = 0
+            last_heading = None
+            for block in blocks:
+                if self.tables_as_databases and after is None and block.get("type") == "table":
+                    # Flush preceding blocks so the database lands in document order
+                    await flush()
+                    table_count += 1
+                    title = last_heading or f"Table {table_count}"
+                    database_id = await self._create_table_database(block, target_id, title)
+                    # The database stands in for the table block and its header row
+                    self._uploaded(2)
+                    block_ids.append(database_id)
+                    if self.line_map is not None and block.get("_lines"):
+                        self.line_map.add(block["_lines"], database_id, target_id, kind="database")
+                    follow_ups.append(asyncio.ensure_future(self._import_table_rows(database_id, block, row_limiter)))
+                    continue
+                
+                if block.get("type", "").startswith("heading_"):
+                    last_heading = self._heading_text(block) or None
+                pending.append(block)
+                if len(pending) == MAX_BLOCKS_PER_REQUEST:
+                    await flush()
             
-            # Clean children recursively
-            block_type = cleaned_block.get("type")
-            if block_type in ["bulleted_list_item", "numbered_list_item"]:
-                list_content = cleaned_block.get(block_type, {})
-                if "children" in list_content:
-                    list_content["children"] = self._clean_blocks_recursively(list_content["children"])
-                    if not list_content["children"]:
-                        del list_content["children"]
+            await flush()
             
-            cleaned_blocks.append(cleaned_block)
+            # Follow-ups schedule their own (deeper) follow-ups; wait for all
+            waited = 0
+            while waited < len(follow_ups):
+                scheduled = len(follow_ups)
+                await asyncio.gather(*follow_ups[waited:scheduled])
+                waited = scheduled
+        except Exception:
+            for task in follow_ups:
+                task.cancel()
+            raise
         
-        return cleaned_blocks
+        return block_ids
     
-    def _append_paragraph_block(self, blocks: list, text: str):
-        """Add paragraph block(s) to blocks list"""
-        text = text.strip()
-        if not text:
-            return
-        
-        # Split long paragraphs for Notion API limits
-        max_length = 2000  # Conservative limit
-        if len(text) <= max_length:
-            blocks.append({
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": self.parse_equations_and_style(text)
-                }
-            })
-        else:
-            # Split by sentences or at word boundaries
-            chunks = []
-            current_chunk = ""
-            sentences = re.split(r'([.!?]+\s+)', text)
-            
-            for sentence in sentences:
-                if len(current_chunk) + len(sentence) <= max_length:
-                    current_chunk += sentence
-                else:
-                    if current_chunk:
-                        chunks.append(current_chunk.strip())
-                    current_chunk = sentence
-            
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            
-            for chunk in chunks:
-                blocks.append({
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": self.parse_equations_and_style(chunk)
-                    }
-                })
+    def _heading_text(self, block: Dict[str, Any]) -> str:
+        """Plain text of a heading block"""
+        return "".join(part.get("text", {}).get("content", "") for part in block[block["type"]]["rich_text"])
     
-    def convert_markdown_to_blocks(self, markdown_content: str) -> list:
-        """Convert Markdown content to Notion blocks"""
-        blocks = []
+    def _split_heading_level(self, block: Dict[str, Any]) -> int:
+        """Level of a heading that starts a new child page, or 0"""
+        block_type = block.get("type", "")
+        if self.split_level and block_type.startswith("heading_"):
+            level = int(block_type[len("heading_"):])
+            if level <= self.split_level:
+                return level
+        return 0
+    
+    async def _upload_sections(self, blocks: Iterable[Dict[str, Any]], index_id: str) -> List[str]:
+        """Upload blocks, moving each split-level section to a child page
         
-        # Split by block equations first (support both $$...$$ and \[...\] formats)
-        equation_pattern = re.compile(r'(\$\$\s*\n.*?\n\s*\$\$|\$\$.*?\$\$|\\\[.*?\\\])', re.DOTALL)
-        parts = equation_pattern.split(markdown_content)
+        Blocks before the first split heading stay on the index page. Child
+        pages are created one after another so they are listed in document
+        order, titled by their heading; their contents upload concurrently
+        (bounded by max_concurrency) while later sections are still read.
         
-        for part in parts:
-            part = part.strip()
-            if not part:
-                continue
+        Returns the IDs of the child pages.
+        """
+        limit = asyncio.Semaphore(self.max_concurrency)
+        uploads = []
+        page_ids = []
+        section = []
+        
+        async def upload(page_id: str, section_blocks: list):
+            async with limit:
+                await self._upload_blocks(section_blocks, page_id)
+            logger.info(f"Uploaded section page {page_id} ({len(section_blocks)} blocks)")
+        
+        try:
+            for block in blocks:
+                if not self._split_heading_level(block):
+                    section.append(block)
+                    continue
                 
-            if part.startswith('$$'):
-                # Block equation ($$...$$ format)
-                latex = part[2:-2].strip().replace('\n', '\\')
-                blocks.append({
-                    "object": "block",
-                    "type": "equation",
-                    "equation": {"expression": latex}
-                })
-            elif part.startswith('\\[') and part.endswith('\\]'):
-                # Block equation (\[...\] format)
-                latex = part[2:-2].strip().replace('\n', '\\')
-                blocks.append({
-                    "object": "block",
-                    "type": "equation",
-                    "equation": {"expression": latex}
-                })
-            else:
-                # Process text content
-                # Handle headings first
-                def heading_replacer(match):
-                    level = len(match.group(1))
-                    title = match.group(2).strip()
-                    blocks.append({
-                        "object": "block",
-                        "type": f"heading_{level}",
-                        f"heading_{level}": {
-                            "rich_text": self.parse_equations_and_style(title)
+                if page_ids:
+                    uploads.append(asyncio.ensure_future(upload(page_ids[-1], section)))
+                else:
+                    # The introduction goes above the list of child pages
+                    await self._upload_blocks(section, index_id)
+                section = []
+                new_page = await self.notion.pages.create(
+                    parent={"page_id": index_id},
+                    properties={
+                        "title": {
+                            "title": [{"text": {"content": self._heading_text(block) or "Untitled"}}]
                         }
-                    })
-                    return ''
-                
-                part = re.sub(r'^(#{1,3})\s+(.+)$', heading_replacer, part, flags=re.MULTILINE)
-                
-                # Process remaining content line by line
-                lines = part.split('\n')
-                paragraph_lines = []
-                i = 0
-                
-                while i < len(lines):
-                    line = lines[i]
-                    line_strip = line.strip()
-                    
-                    # Check for divider
-                    if re.match(r'^\s*-{3,}\s*$', line_strip):
-                        if paragraph_lines:
-                            self._append_paragraph_block(blocks, '\n'.join(paragraph_lines))
-                            paragraph_lines = []
-                        blocks.append({"object": "block", "type": "divider", "divider": {}})
-                        i += 1
-                        continue
-                    
-                    # Check for table
-                    if line_strip.startswith('|') and line_strip.endswith('|'):
-                        if paragraph_lines:
-                            self._append_paragraph_block(blocks, '\n'.join(paragraph_lines))
-                            paragraph_lines = []
-                        table_blocks, i = self._parse_table(lines, i)
-                        blocks.extend(table_blocks)
-                        continue
-                    
-                    # Check for list items
-                    is_list, _, _, _ = self._is_list_item(line)
-                    if is_list:
-                        if paragraph_lines:
-                            self._append_paragraph_block(blocks, '\n'.join(paragraph_lines))
-                            paragraph_lines = []
-                        i = self._process_list_group(lines, i, blocks)
-                    else:
-                        paragraph_lines.append(line)
-                        i += 1
-                
-                # Add remaining paragraphs
-                if paragraph_lines:
-                    self._append_paragraph_block(blocks, '\n'.join(paragraph_lines))
+                    }
+                )
+                self._remember_page(new_page)
+                if self.line_map is not None and block.get("_lines"):
+                    self.line_map.add(block["_lines"], new_page["id"], index_id, kind="page")
+                page_ids.append(new_page["id"])
+            
+            if page_ids:
+                uploads.append(asyncio.ensure_future(upload(page_ids[-1], section)))
+            else:
+                await self._upload_blocks(section, index_id)
+            
+            await asyncio.gather(*uploads)
+        except Exception:
+            for task in uploads:
+                task.cancel()
+            raise
         
-        return self._clean_blocks_recursively(blocks)
+        logger.info(f"Split document into {len(page_ids)} child pages")
+        return page_ids
     
-    async def _upload_blocks(self, blocks: list, target_id: str, is_page: bool = False):
-        """Upload blocks to Notion in batches"""
-        if not blocks:
-            return
-        
-        logger.info(f"Uploading {len(blocks)} blocks to Notion")
-        
-        # Notion API limit: 100 blocks per request
-        batch_size = 100
-        
-        for i in range(0, len(blocks), batch_size):
-            batch = blocks[i:i+batch_size]
-            batch_num = i // batch_size + 1
-            
-            try:
-                await self.notion.blocks.children.append(block_id=target_id, children=batch)
-                logger.info(f"Uploaded batch {batch_num} ({len(batch)} blocks)")
-            except Exception as e:
-                logger.error(f"Failed to upload batch {batch_num}: {str(e)}")
-                raise e
+    async def _upload_document(self, blocks: Iterable[Dict[str, Any]], page_id: str):
+        """Upload converted blocks to a page, split into child pages if configured"""
+        if self.split_level:
+            await self._upload_sections(blocks, page_id)
+        else:
+            await self._upload_blocks(blocks, page_id)
+    
+    def _convert(self, markdown_content: str) -> list:
+        """Convert Markdown, using several processes for large documents"""
+        progress = self.progress
+        with CONVERSION_SECONDS.time():
+            if self.conversion_workers > 1 and len(markdown_content) > PARALLEL_MIN_CHUNK_SIZE:
+                return convert_markdown_parallel(markdown_content, self.conversion_workers,
+                                                 page_titles=self.page_titles, track_lines=self.track_lines,
+                                                 on_chunk=self._chunk_converted if progress is not None else None,
+                                                 parser=self.parser)
+            blocks = self.convert_markdown_to_blocks(markdown_content)
+            if progress is not None:
+                self._chunk_converted(markdown_content, blocks)
+            return blocks
+    
+    def _chunk_converted(self, chunk: str, blocks: list):
+        self.progress.converted(len(chunk.encode("utf-8")), sum(count_blocks(block) for block in blocks))
+    
+    async def convert_for_upload(self, markdown_content: str) -> list:
+        """Convert Markdown; off the event loop while progress is displayed, so it keeps updating"""
+        if self.progress is None:
+            return self._convert(markdown_content)
+        return await asyncio.get_running_loop().run_in_executor(None, self._convert, markdown_content)
+    
+    def _file_blocks(self, markdown_file: str) -> Iterator[Dict[str, Any]]:
+        """Stream the blocks of a file, counting its bytes and blocks for the progress display"""
+        if self.progress is None:
+            return self.iter_file_blocks(markdown_file)
+        return self.progress.track_blocks(self.iter_blocks(self.progress.track_lines(iter_file_lines(markdown_file))))
+    
+    def _page_key(self, page_id: str) -> tuple:
+        return token_key(self.token), normalize_page_id(page_id)
+    
+    def _remember_page(self, page: Dict[str, Any]) -> Dict[str, Any]:
+        """Cache the metadata of a page returned by pages.create or pages.retrieve"""
+        page_cache.set(self._page_key(page["id"]), {"id": page["id"], "url": page.get("url")})
+        if self.page_titles is not None:
+            title = page_title(page)
+            if title:
+                self.page_titles.add(page["id"], title)
+        return page
+    
+    def _forget_page(self, page_id: str):
+        page_cache.pop(self._page_key(page_id))
+    
+    async def warm_page_titles(self):
+        """Build the title index for [[Page Title]] links, once"""
+        if self.page_titles is not None and not self.page_titles.warmed:
+            requests = await self.page_titles.warm(self.notion)
+            logger.info(f"Indexed {len(self.page_titles)} page titles with {requests} search request(s)")
+    
+    async def _page_url(self, page_id: str) -> str:
+        """URL of a page, from the shared page cache when possible"""
+        page = page_cache.get(self._page_key(page_id))
+        if page is None:
+            page = self._remember_page(await self.notion.pages.retrieve(page_id=page_id))
+        return page["url"]
     
     async def append_markdown_to_notion(self, markdown_content: str, page_id: str) -> str:
         """Append Markdown content to existing Notion page"""
         logger.info(f"Processing markdown content (length: {len(markdown_content)})")
+        await self.warm_page_titles()
         
         # Get page URL
-        page_info = await self.notion.pages.retrieve(page_id=page_id)
-        page_url = page_info['url']
+        page_url = await self._page_url(page_id)
         
         # Convert markdown to blocks
-        blocks = self.convert_markdown_to_blocks(markdown_content)
+        blocks = self._convert(markdown_content)
         logger.info(f"Converted {len(blocks)} blocks")
         
-        # Upload blocks
-        await self._upload_blocks(blocks, page_id)
+        # Upload blocks; a failure may mean the cached page is gone
+        try:
+            await self._upload_document(blocks, page_id)
+        except Exception:
+            self._forget_page(page_id)
+            raise
         logger.info(f"Added {len(blocks)} blocks to existing page")
         
         return page_url
@@ -529,70 +665,134 @@ class MarkdownToNotionConverter:
     async def upload_markdown_to_notion(self, markdown_content: str, page_id: str, title: str = "Untitled") -> str:
         """Upload Markdown content as new Notion page"""
         logger.info(f"Processing markdown content (length: {len(markdown_content)})")
+        await self.warm_page_titles()
         
-        blocks = self.convert_markdown_to_blocks(markdown_content)
+        blocks = await self.convert_for_upload(markdown_content)
         logger.info(f"Converted {len(blocks)} blocks")
-        
-        # Create new page
+        return await self.upload_blocks_to_notion(blocks, page_id, title)
+    
+    async def create_page(self, parent_id: str, title: str) -> Dict[str, Any]:
+        """Create an empty page under another page and return the page object"""
         new_page = await self.notion.pages.create(
-            parent={"page_id": page_id},
+            parent={"page_id": parent_id},
             properties={
                 "title": {
                     "title": [{"text": {"content": title}}]
                 }
             }
         )
+        self._remember_page(new_page)
+        if self.line_map is not None:
+            self.line_map.page_id = new_page["id"]
         
         logger.info(f"Created new page: {new_page['url']}")
+        return new_page
+    
+    async def clear_page(self, page_id: str) -> int:
+        """Delete every block on a page, archiving its child pages; returns the number deleted"""
+        deleted = 0
+        while True:
+            # Deleted blocks leave the list, so each round starts from the top
+            response = await self.notion.blocks.children.list(block_id=page_id, page_size=MAX_BLOCKS_PER_REQUEST)
+            blocks = response.get("results", [])
+            await asyncio.gather(*[self.notion.blocks.delete(block_id=block["id"]) for block in blocks])
+            deleted += len(blocks)
+            if not response.get("has_more") or not blocks:
+                return deleted
+    
+    async def upload_blocks_to_notion(self, blocks: List[Dict[str, Any]], page_id: str, title: str = "Untitled") -> str:
+        """Upload already converted blocks as a new Notion page"""
+        new_page = await self.create_page(page_id, title)
         
         # Upload blocks
-        await self._upload_blocks(blocks, new_page["id"])
+        await self._upload_document(blocks, new_page["id"])
         logger.info(f"Added {len(blocks)} blocks to new page")
         
         return new_page['url']
     
+    async def upload_to_targets(self, blocks: List[Dict[str, Any]], page_ids: List[str],
+                                title: str = "Untitled") -> List[Dict[str, Any]]:
+        """Upload converted blocks as a new page under each of several pages at once
+        
+        Every append request's children are serialized once and sent to all
+        targets, whose requests share the token's concurrency window and one
+        database row rate. A failing target does not stop the others.
+        
+        Returns one {"page_id", "url"} or {"page_id", "error"} per target, in order.
+        """
+        await self.warm_page_titles()
+        
+        async def upload(page_id: str) -> Dict[str, Any]:
+            try:
+                return {"page_id": page_id, "url": await self.upload_blocks_to_notion(blocks, page_id, title)}
+            except Exception as e:
+                logger.error(f"Failed to upload to {page_id}: {str(e)}")
+                return {"page_id": page_id, "error": str(e)}
+        
+        self._shared_batches = {}
+        self._row_limiter = RateLimiter(self.requests_per_second)
+        try:
+            return list(await asyncio.gather(*[upload(page_id) for page_id in page_ids]))
+        finally:
+            self._shared_batches = None
+            self._row_limiter = None
+    
     async def upload_file_to_notion(self, markdown_file: str, page_id: str, title: Optional[str] = None) -> str:
-        """Upload Markdown file to Notion"""
-        with open(markdown_file, "r", encoding="utf-8") as f:
-            content = f.read()
+        """Upload Markdown file to Notion
         
+        The file is streamed: it is memory-mapped, converted in chunks and
+        uploaded batch by batch, so memory use does not grow with its size.
+        Parallel conversion needs the whole document and reads it instead.
+        """
         logger.info(f"Reading markdown file: {markdown_file}")
+        await self.warm_page_titles()
         
         if not title:
             title = Path(markdown_file).stem
         
-        return await self.upload_markdown_to_notion(content, page_id, title)
+        new_page = await self.create_page(page_id, title)
+        await self.upload_file_to_page(markdown_file, new_page["id"])
+        return new_page['url']
+    
+    async def upload_file_to_page(self, markdown_file: str, page_id: str) -> str:
+        """Upload a Markdown file's content to an existing page, streamed like upload_file_to_notion"""
+        await self.warm_page_titles()
+        
+        if self.conversion_workers > 1 and os.path.getsize(markdown_file) > PARALLEL_MIN_CHUNK_SIZE:
+            with open(markdown_file, "r", encoding="utf-8") as f:
+                content = f.read()
+            blocks = await self.convert_for_upload(content)
+            logger.info(f"Converted {len(blocks)} blocks")
+            await self._upload_document(blocks, page_id)
+            logger.info(f"Added {len(blocks)} blocks to page")
+        elif self.split_level:
+            await self._upload_sections(self._file_blocks(markdown_file), page_id)
+        else:
+            block_ids = await self._upload_blocks(self._file_blocks(markdown_file), page_id)
+            logger.info(f"Added {len(block_ids)} blocks to page")
+        
+        return await self._page_url(page_id)
 
 
-def extract_page_id_from_url(url: str) -> str:
-    """Extract page ID from Notion URL"""
-    import re
-    
-    # Pattern for Notion page URLs
-    # Examples:
-    # https://www.notion.so/z123z123d/Survey-latent-reasoning-22f97b0feb94808fbfa4c07162457633?source=copy_link
-    # https://www.notion.so/My-Page-22f97b0feb94808fbfa4c07162457633
-    # https://www.notion.so/22f97b0feb94808fbfa4c07162457633
-    
-    patterns = [
-        # Pattern for URLs with workspace and page name
-        r'https://www\.notion\.so/[^/]+/[^-]*?([a-f0-9]{32})',
-        # Pattern for direct page ID URLs
-        r'https://www\.notion\.so/([a-f0-9]{32})',
-        # Pattern for URLs with just page ID
-        r'([a-f0-9]{32})'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    
-    # If no pattern matches, assume it's already a page ID
-    if re.match(r'^[a-f0-9]{32}$', url):
-        return url
-    
-    raise ValueError(f"Could not extract page ID from URL: {url}")
+def read_targets_file(path: str) -> List[str]:
+    """Page IDs or URLs from a file, one per line; blank lines and # comments are skipped"""
+    targets = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                targets.append(line)
+    return targets
+
+
+def write_summary(path: str, summary: Dict[str, Any]):
+    """Write the final upload summary as JSON to a file, or to stdout for '-'"""
+    data = json.dumps(summary, indent=2)
+    if path == '-':
+        print(data)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
 
 
 def get_token_from_env() -> str:
@@ -603,8 +803,68 @@ def get_token_from_env() -> str:
     return token
 
 
+async def plan_main(args, parser):
+    """Print an offline upload plan for --plan"""
+    from md2notion_plan import format_plan, plan_uploads
+    from md2notion_publish import iter_markdown_files
+    
+    if not args.markdown_file:
+        parser.error("--plan needs a markdown file or directory")
+    paths = iter_markdown_files([args.markdown_file])
+    missing = [str(path) for path in paths if not path.is_file()]
+    if missing or not paths:
+        logger.error(f"Markdown file not found: {', '.join(missing) or args.markdown_file}")
+        sys.exit(1)
+    
+    if not args.verbose:
+        # Keep the report readable; the upload's progress lines are not news here
+        logging.getLogger().setLevel(logging.WARNING)
+    
+    # The token only keys caches here; nothing is sent
+    converter = MarkdownToNotionConverter(
+        args.token or os.getenv('NOTION_TOKEN') or "plan", tables_as_databases=args.tables_as_databases,
+        conversion_workers=args.workers, split_level=args.split_pages, link_pages=args.link_pages,
+        parser=args.parser
+    )
+    plan = await plan_uploads(converter, paths, args.rps, args.title)
+    print(format_plan(plan, args.rps))
+
+
 async def main_async():
     """Main command-line interface (async version)"""
+    if len(sys.argv) > 1 and sys.argv[1] == 'export':
+        from md2notion_export import export_main
+        try:
+            await export_main(sys.argv[2:])
+        except Exception as e:
+            logger.error(f"Error: {str(e)}")
+            sys.exit(1)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'publish':
+        from md2notion_publish import publish_main
+        try:
+            await publish_main(sys.argv[2:])
+        except Exception as e:
+            logger.error(f"Error: {str(e)}")
+            sys.exit(1)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'enqueue':
+        from md2notion_worker import enqueue_main
+        try:
+            enqueue_main(sys.argv[2:])
+        except Exception as e:
+            logger.error(f"Error: {str(e)}")
+            sys.exit(1)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'worker':
+        from md2notion_worker import worker_main
+        try:
+            await worker_main(sys.argv[2:])
+        except Exception as e:
+            logger.error(f"Error: {str(e)}")
+            sys.exit(1)
+        return
+    
     parser = argparse.ArgumentParser(
         description="Convert Markdown files to Notion pages",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -613,13 +873,55 @@ Examples:
   export NOTION_TOKEN="your_token_here"
   python md2notion_cli.py document.md --page_id your_page_id
   python md2notion_cli.py document.md --page_id your_page_id --title "My Document"
+  python md2notion_cli.py handbook.md --page_id your_page_id --split-pages 2
+  python md2notion_cli.py docs/ --plan --rps 3
+  python md2notion_cli.py notes.md --page_id your_page_id --link-pages
+  python md2notion_cli.py release.md --page_id first_page_id second_page_id --targets team_pages.txt
+  python md2notion_cli.py --watch docs/ --page_id your_page_id
+  python md2notion_cli.py export your_page_id -o backup.md --recursive
+  python md2notion_cli.py publish posts/ --database your_database_id
+  python md2notion_cli.py enqueue jobs.db docs/ --page_id your_page_id
+  python md2notion_cli.py worker jobs.db --concurrency 2 --rps 3
         """
     )
     
-    parser.add_argument('markdown_file', help='Path to the markdown file')
-    parser.add_argument('--page_id', required=True, help='Notion page ID')
+    parser.add_argument('markdown_file', nargs='?',
+                        help='Path to the markdown file (or, with --plan, a directory of them)')
+    parser.add_argument('--page_id', nargs='+', action='append',
+                        help='Notion page ID or URL; several upload the document to each of them')
+    parser.add_argument('--targets', metavar='FILE',
+                        help='File with one target page ID or URL per line, in addition to --page_id')
     parser.add_argument('--token', help='Notion API token (or set NOTION_TOKEN env var)')
     parser.add_argument('--title', help='Title for the new page (defaults to filename)')
+    parser.add_argument('--tables-as-databases', action='store_true',
+                        help='Import tables as inline Notion databases instead of table blocks')
+    parser.add_argument('--rps', type=float, default=3.0,
+                        help='Requests per second when creating database rows, and the request '
+                             'budget --plan estimates time with (default: 3)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes used to convert large documents (default: 1)')
+    parser.add_argument('--split-pages', type=int, choices=[1, 2], metavar='LEVEL',
+                        help='Put each section under an H1 (1) or H1/H2 (2) heading on its own '
+                             'child page, uploaded concurrently')
+    parser.add_argument('--link-pages', action='store_true',
+                        help='Turn [[Page Title]] links into mentions of the pages with those titles')
+    parser.add_argument('--parser', choices=[BUILTIN_PARSER, *PARSERS], default=BUILTIN_PARSER,
+                        help='Markdown parser: the built-in one or a CommonMark backend, which needs '
+                             'markdown-it-py or mistune installed (default: regex)')
+    parser.add_argument('--watch', metavar='DIR',
+                        help='Keep Markdown files under DIR mirrored to child pages of --page_id')
+    parser.add_argument('--debounce', type=float, default=2.0,
+                        help='Seconds of quiet before syncing a burst of saves in watch mode (default: 2)')
+    parser.add_argument('--line-map', action='store_true',
+                        help='Write the Notion block ID of every source line range next to the file '
+                             f'(FILE{SIDECAR_SUFFIX})')
+    parser.add_argument('--no-progress', action='store_true',
+                        help='Do not show the live progress line (or, off a terminal, progress log lines)')
+    parser.add_argument('--summary', metavar='FILE',
+                        help="Write a JSON summary of the upload's throughput to FILE ('-' for stdout)")
+    parser.add_argument('--plan', action='store_true',
+                        help='Report the requests, bytes and time the upload would take, and blocks '
+                             'Notion would reject, without contacting Notion')
     parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose logging')
     
     args = parser.parse_args()
@@ -627,34 +929,119 @@ Examples:
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
+    if args.plan:
+        await plan_main(args, parser)
+        return
+    targets = [target for group in args.page_id or [] for target in group]
+    if args.targets:
+        try:
+            targets.extend(read_targets_file(args.targets))
+        except OSError as e:
+            logger.error(f"Cannot read targets file: {str(e)}")
+            sys.exit(1)
+    if not targets:
+        parser.error("--page_id or --targets is required")
+    
     try:
         # Get token
         token = args.token or get_token_from_env()
         
-        # Extract page ID from URL if needed
+        # Extract page IDs from URLs if needed
+        page_ids = []
         try:
-            page_id = extract_page_id_from_url(args.page_id)
-            if page_id != args.page_id:
-                logger.info(f"Extracted page ID: {page_id} from URL")
+            for target in targets:
+                page_id = extract_page_id_from_url(target)
+                if page_id != target:
+                    logger.info(f"Extracted page ID: {page_id} from URL")
+                if page_id not in page_ids:
+                    page_ids.append(page_id)
         except ValueError as e:
             logger.error(f"Invalid page ID or URL: {str(e)}")
             sys.exit(1)
+        page_id = page_ids[0]
+        
+        if args.line_map and (args.watch or len(page_ids) > 1):
+            parser.error("--line-map works with a single file and target page")
+        if args.parser != BUILTIN_PARSER:
+            # A missing parser package fails here, before any page is created
+            backend = get_parser(args.parser)
+            if args.line_map and not backend.tracks_lines:
+                parser.error(f"--line-map needs source lines, which the {args.parser} parser does not report")
+        line_map = LineMap(sidecar_path(args.markdown_file)) if args.line_map and args.markdown_file else None
+        
+        converter = MarkdownToNotionConverter(
+            token, tables_as_databases=args.tables_as_databases, requests_per_second=args.rps,
+            conversion_workers=args.workers, split_level=args.split_pages, link_pages=args.link_pages,
+            line_map=line_map, parser=args.parser
+        )
+        
+        if args.watch:
+            if len(page_ids) > 1:
+                parser.error("--watch takes a single --page_id")
+            if not os.path.isdir(args.watch):
+                logger.error(f"Watch directory not found: {args.watch}")
+                sys.exit(1)
+            from md2notion_watch import watch_directory
+            await watch_directory(converter, args.watch, page_id, debounce=args.debounce)
+            return
         
         # Validate file
+        if not args.markdown_file:
+            parser.error("markdown_file is required unless --watch is used")
         if not os.path.exists(args.markdown_file):
             logger.error(f"Markdown file not found: {args.markdown_file}")
             sys.exit(1)
         
-        # Convert and upload
-        converter = MarkdownToNotionConverter(token)
-        url = await converter.upload_file_to_notion(args.markdown_file, page_id, args.title)
-        
-        print(f"\n✅ Successfully uploaded to Notion!")
-        print(f"📄 Page URL: {url}")
-        
+        progress = UploadProgress(os.path.getsize(args.markdown_file), concurrency_controller(token),
+                                  copies=len(page_ids))
+        converter.progress = progress
+        if not args.no_progress and progress.tty and not args.verbose:
+            # Per-batch log lines would tear the status line
+            logging.getLogger().setLevel(logging.WARNING)
+        progress.start(display=not args.no_progress)
+        outcome = {"status": "failed", "pages": []}
+        try:
+            if len(page_ids) > 1:
+                # Convert once, then publish the same batches to every target
+                with open(args.markdown_file, "r", encoding="utf-8") as f:
+                    blocks = await converter.convert_for_upload(f.read())
+                title = args.title or Path(args.markdown_file).stem
+                results = await converter.upload_to_targets(blocks, page_ids, title)
+                failed = [result for result in results if "error" in result]
+                outcome = {"status": "partial" if failed else "ok", "pages": results}
+                progress.finish()
+                print(f"\n{'✅' if not failed else '⚠️ '} Uploaded to {len(results) - len(failed)} of {len(results)} pages")
+                for result in results:
+                    if "error" in result:
+                        print(f"❌ {result['page_id']}: {result['error']}")
+                    else:
+                        print(f"📄 {result['page_id']}: {result['url']}")
+                if failed:
+                    sys.exit(1)
+                return
+            
+            # Convert and upload
+            url = await converter.upload_file_to_notion(args.markdown_file, page_id, args.title)
+            outcome = {"status": "ok", "pages": [{"page_id": page_id, "url": url}]}
+            progress.finish()
+            
+            print("\n✅ Successfully uploaded to Notion!")
+            print(f"📄 Page URL: {url}")
+            if line_map is not None:
+                line_map.url = url
+                line_map.save()
+                print(f"🗺️  Line map: {line_map.path} ({len(line_map.entries)} blocks)")
+        finally:
+            summary = progress.finish()
+            if args.summary:
+                write_summary(args.summary, {"file": args.markdown_file, **outcome, **summary})
+    
     except ValueError as e:
         logger.error(f"Configuration error: {str(e)}")
         sys.exit(1)
+    except ImportError as e:
+        logger.error(f"Error: {str(e)}")
+        sys.exit(1)
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         sys.exit(1)
@@ -662,6 +1049,7 @@ Examples:
 
 def main():
     """Main command-line interface"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     asyncio.run(main_async())
 
 
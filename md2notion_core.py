@@ -0,0 +1,1161 @@
+#!/usr/bin/env python3
+"""
+Markdown to Notion conversion engine
+
+Pure, network-free conversion of Markdown into Notion block dicts. This module
+does not import the Notion client, so it is cheap to import from pre-commit
+hooks, serverless functions and worker processes that only need conversion.
+"""
+
+import bisect
+import functools
+import gc
+import mmap
+import os
+import re
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+# Notion API limit: 100 blocks per children array / append request
+MAX_BLOCKS_PER_REQUEST = 100
+# ...and at most 1000 blocks in one request, counting nested children
+MAX_ELEMENTS_PER_REQUEST = 1000
+# ...with a body of at most 500 KB
+MAX_REQUEST_BYTES = 500 * 1024
+# Rich text: at most 100 items per array, 2000 characters of text and of
+# link URL per item; equation expressions up to 1000 characters
+MAX_RICH_TEXT_ITEMS = 100
+MAX_RICH_TEXT_LENGTH = 2000
+MAX_URL_LENGTH = 2000
+MAX_EQUATION_LENGTH = 1000
+
+# Block equations: $$...$$ (possibly spanning lines) and \[...\]
+BLOCK_EQUATION_PATTERN = re.compile(r'(\$\$\s*\n.*?\n\s*\$\$|\$\$.*?\$\$|\\\[.*?\\\])', re.DOTALL)
+# Pieces of the multi-line $$ form, to replay how the pattern above matched
+MULTILINE_EQUATION_OPEN = re.compile(r'\$\$\s*\n')
+MULTILINE_EQUATION_CLOSE = re.compile(r'.*?\n\s*\$\$', re.DOTALL)
+# Text between equations that the converter still takes for an equation
+EQUATION_PART_PREFIX = re.compile(r'\s*(\$\$|\\\[)')
+
+HEADING_PATTERN = re.compile(r'^(#{1,3})\s+(.+)$')
+DIVIDER_PATTERN = re.compile(r'^\s*-{3,}\s*$')
+# A line starting a code fence, or closing one: the marker run and the rest of the line
+FENCE_LINE_PATTERN = re.compile(r'^[ \t]*(`{3,}|~{3,})(.*)$', re.MULTILINE)
+BLANK_LINES_PATTERN = re.compile(r'\n(?:[ \t]*\n)+(?=\S)')
+
+# Documents smaller than this are converted serially; pools cost more than they save
+PARALLEL_MIN_CHUNK_SIZE = 256 * 1024
+
+# Characters of input buffered before streaming conversion looks for a boundary
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Mapped file pages are handed back to the OS after this many bytes were read
+MMAP_RELEASE_SIZE = 4 * 1024 * 1024
+RELEASE_MAPPED_PAGES = hasattr(mmap, 'MADV_DONTNEED')
+
+# Table delimiter row, e.g. | --- | :---: | ---: |
+TABLE_SEPARATOR_PATTERN = re.compile(r'^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?$')
+
+# Inline code spans (kept literal), [[Page Title]] links and [text](url) links
+LINK_PATTERN = re.compile(r'(`[^`]*`)|\[\[([^\[\]\n]+)\]\]|\[([^\[\]\n]+)\]\(\s*<?([^()\s<>]+)>?\s*\)')
+# Notion only accepts absolute link URLs
+ABSOLUTE_URL_PATTERN = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*:')
+
+# Notion object IDs: 32 hex digits, optionally dashed like a UUID, not part of a longer hex run
+PAGE_ID_PATTERN = re.compile(
+    r'(?<![0-9a-fA-F])([0-9a-fA-F]{8})-?([0-9a-fA-F]{4})-?([0-9a-fA-F]{4})-?([0-9a-fA-F]{4})-?([0-9a-fA-F]{12})(?![0-9a-fA-F])'
+)
+
+# Column type inference for table-to-database import
+NUMBER_PATTERN = re.compile(r'^[+-]?((\d{1,3}(,\d{3})+|\d+)(\.\d+)?|\.\d+)$')
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2})?)?$')
+CHECKBOX_VALUES = {"true": True, "yes": True, "false": False, "no": False}
+# Cells that mean "no value" and count as empty in typed columns
+PLACEHOLDER_CELLS = {"-", "--", "\u2013", "\u2014", "?", "n/a", "na", "none", "null"}
+
+# The parser built into MarkdownConverter; others live in md2notion_parsers
+BUILTIN_PARSER = "regex"
+
+# Languages Notion accepts for code blocks, and common fence names for them
+CODE_LANGUAGES = {
+    "abap", "arduino", "bash", "basic", "c", "clojure", "coffeescript", "c++", "c#", "css", "dart",
+    "diff", "docker", "elixir", "elm", "erlang", "flow", "fortran", "f#", "gherkin", "glsl", "go",
+    "graphql", "groovy", "haskell", "html", "java", "javascript", "json", "julia", "kotlin", "latex",
+    "less", "lisp", "livescript", "lua", "makefile", "markdown", "markup", "matlab", "mermaid", "nix",
+    "objective-c", "ocaml", "pascal", "perl", "php", "plain text", "powershell", "prolog", "protobuf",
+    "python", "r", "reason", "ruby", "rust", "sass", "scala", "scheme", "scss", "shell", "sql", "swift",
+    "typescript", "vb.net", "verilog", "vhdl", "visual basic", "webassembly", "xml", "yaml",
+}
+CODE_LANGUAGE_ALIASES = {
+    "py": "python", "js": "javascript", "ts": "typescript", "sh": "shell", "zsh": "shell",
+    "console": "shell", "yml": "yaml", "md": "markdown", "cpp": "c++", "cs": "c#", "csharp": "c#",
+    "rb": "ruby", "rs": "rust", "dockerfile": "docker", "golang": "go", "kt": "kotlin", "tex": "latex",
+    "objc": "objective-c", "ps1": "powershell", "proto": "protobuf", "text": "plain text", "txt": "plain text",
+}
+
+
+class MarkdownConverter:
+    """Convert Markdown content to Notion blocks"""
+    
+    # Title -> page ID lookup for [[Page Title]] links; anything with .get(title)
+    page_titles = None
+    
+    # Record the source lines of every block as "_lines": [first, last] (1-based)
+    track_lines = False
+    
+    # Markdown parser: BUILTIN_PARSER or a backend name from md2notion_parsers.PARSERS
+    parser = BUILTIN_PARSER
+    
+    def _with_lines(self, block: Dict[str, Any], first: int, last: int) -> Dict[str, Any]:
+        """Attach a source line range to a block when tracking lines"""
+        if self.track_lines:
+            block["_lines"] = [first, last]
+        return block
+    
+    def _create_rich_text(self, content: str, annotations: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Create a rich text object"""
+        return {
+            "type": "text",
+            "text": {"content": content},
+            "annotations": annotations or {
+                "italic": False, "bold": False, "code": False,
+                "underline": False, "strikethrough": False, "color": "default"
+            }
+        }
+    
+    def parse_style(self, text: str) -> List[Dict[str, Any]]:
+        """Parse links and text styling: [text](url), [[Page Title]], **bold**, *italic*, `code`
+        
+        [[Page Title]] becomes a page mention when page_titles knows the
+        title and stays literal text otherwise. Links to relative URLs keep
+        only their text, since Notion rejects them.
+        """
+        if '[' not in text:
+            return self._parse_text_style(text)
+        
+        rich_text = []
+        last_idx = 0
+        for match in LINK_PATTERN.finditer(text):
+            if match.group(1):
+                continue
+            if match.start() > last_idx:
+                rich_text.extend(self._parse_text_style(text[last_idx:match.start()]))
+            last_idx = match.end()
+            
+            if match.group(2):
+                title = match.group(2).strip()
+                page_id = self.page_titles.get(title) if self.page_titles is not None else None
+                if page_id:
+                    rich_text.append({"type": "mention", "mention": {"type": "page", "page": {"id": page_id}}})
+                else:
+                    rich_text.append(self._create_rich_text(match.group(0)))
+                continue
+            
+            label, url = match.group(3), match.group(4)
+            for item in self._parse_text_style(label):
+                if ABSOLUTE_URL_PATTERN.match(url):
+                    item["text"]["link"] = {"url": url}
+                rich_text.append(item)
+        
+        if last_idx < len(text):
+            rich_text.extend(self._parse_text_style(text[last_idx:]))
+        return rich_text
+    
+    def _parse_text_style(self, text: str) -> List[Dict[str, Any]]:
+        """Parse text styling: **bold**, *italic*, `code`, and backslash escapes"""
+        rich_text = []
+        
+        # More robust pattern that handles nested content better
+        # This pattern matches escapes, bold, italic, code, and regular text
+        pattern = r'(\\[!-/:-@\[-`{-~]|`[^`]*`|\*\*[^*]*\*\*|__[^_]*__|\*[^*]*\*|_[^_]*_|[^*_`\\]+|\\)'
+        
+        plain = ""
+        end = 0
+        for match in re.finditer(pattern, text):
+            content = match.group(0)
+            if plain and match.start() > end:
+                rich_text.append(self._create_rich_text(plain))
+                plain = ""
+            end = match.end()
+            
+            if content.startswith('\\'):
+                # An escaped punctuation character is literal text, joined to the text around it
+                plain += content[-1]
+                continue
+            if not content.startswith(('`', '*', '_')):
+                plain += content
+                continue
+            if plain:
+                rich_text.append(self._create_rich_text(plain))
+                plain = ""
+            
+            if content.startswith('`') and content.endswith('`'):
+                rich_text.append(self._create_rich_text(content[1:-1], {"code": True, "italic": False, "bold": False, "underline": False, "strikethrough": False, "color": "default"}))
+            elif content.startswith('**') and content.endswith('**') or content.startswith('__') and content.endswith('__'):
+                rich_text.append(self._create_rich_text(content[2:-2], {"bold": True, "italic": False, "code": False, "underline": False, "strikethrough": False, "color": "default"}))
+            elif content.startswith('*') and content.endswith('*') or content.startswith('_') and content.endswith('_'):
+                rich_text.append(self._create_rich_text(content[1:-1], {"italic": True, "bold": False, "code": False, "underline": False, "strikethrough": False, "color": "default"}))
+        
+        if plain:
+            rich_text.append(self._create_rich_text(plain))
+        return rich_text
+    
+    def parse_equations_and_style(self, text: str) -> List[Dict[str, Any]]:
+        """Parse inline equations and text styling with better mixed content handling"""
+        rich_text = []
+        
+        # First, check if there are styled blocks that contain equations
+        # Pattern to match styled content that might contain equations
+        styled_pattern = re.compile(r'(?<!\\)(\*\*[^*]*?\$[^*]*?\$[^*]*?\*\*|__[^_]*?\$[^_]*?\$[^_]*?__|\*[^*]*?\$[^*]*?\$[^*]*?\*|_[^_]*?\$[^_]*?\$[^_]*?_)')
+        
+        # Find all styled content with equations
+        styled_matches = list(styled_pattern.finditer(text))
+        
+        if styled_matches:
+            # Process styled content with equations
+            last_idx = 0
+            for match in styled_matches:
+                # Add text before styled content
+                if match.start() > last_idx:
+                    before_text = text[last_idx:match.start()]
+                    if before_text:
+                        rich_text.extend(self._parse_mixed_content(before_text))
+                
+                # Process styled content with equations
+                styled_content = match.group(0)
+                rich_text.extend(self._parse_styled_with_equations(styled_content))
+                
+                last_idx = match.end()
+            
+            # Add remaining text
+            if last_idx < len(text):
+                remaining_text = text[last_idx:]
+                if remaining_text:
+                    rich_text.extend(self._parse_mixed_content(remaining_text))
+        else:
+            # No styled content with equations, use regular parsing
+            rich_text = self._parse_mixed_content(text)
+        
+        return rich_text
+    
+    def _parse_styled_with_equations(self, styled_content: str) -> List[Dict[str, Any]]:
+        """Parse styled content that contains equations"""
+        rich_text = []
+        
+        # Determine the style type
+        if styled_content.startswith('**') and styled_content.endswith('**'):
+            style = {"bold": True, "italic": False, "code": False, "underline": False, "strikethrough": False, "color": "default"}
+            content = styled_content[2:-2]
+        elif styled_content.startswith('__') and styled_content.endswith('__'):
+            style = {"bold": True, "italic": False, "code": False, "underline": False, "strikethrough": False, "color": "default"}
+            content = styled_content[2:-2]
+        elif styled_content.startswith('*') and styled_content.endswith('*'):
+            style = {"bold": False, "italic": True, "code": False, "underline": False, "strikethrough": False, "color": "default"}
+            content = styled_content[1:-1]
+        elif styled_content.startswith('_') and styled_content.endswith('_'):
+            style = {"bold": False, "italic": True, "code": False, "underline": False, "strikethrough": False, "color": "default"}
+            content = styled_content[1:-1]
+        else:
+            # Fallback to regular text
+            return [self._create_rich_text(styled_content)]
+        
+        # Parse equations within the styled content
+        equation_pattern = re.compile(r'(?<![\\$])\$(?!\$)(.+?)(?<![\\$])\$(?!\$)|(?<!\\)\\\((.+?)\\\)', re.DOTALL)
+        last_idx = 0
+        
+        for match in equation_pattern.finditer(content):
+            # Text before equation
+            if match.start() > last_idx:
+                before_text = content[last_idx:match.start()]
+                if before_text:
+                    rich_text.append(self._create_rich_text(before_text, style))
+            
+            # Equation content
+            if match.group(1):  # $...$ format
+                equation = match.group(1).strip('\n ').replace('\n', ' ')
+            else:  # \(...\) format
+                equation = match.group(2).strip('\n ').replace('\n', ' ')
+            
+            if equation:
+                rich_text.append({
+                    "type": "equation",
+                    "equation": {"expression": equation}
+                })
+            
+            last_idx = match.end()
+        
+        # Text after last equation
+        if last_idx < len(content):
+            remaining_text = content[last_idx:]
+            if remaining_text:
+                rich_text.append(self._create_rich_text(remaining_text, style))
+        
+        return rich_text
+    
+    def _parse_mixed_content(self, text: str) -> List[Dict[str, Any]]:
+        """Parse regular text that may contain equations and styling"""
+        rich_text = []
+        # Extract inline equations first (support both $...$ and \(...\) formats)
+        pattern = re.compile(r'(?<![\\$])\$(?!\$)(.+?)(?<![\\$])\$(?!\$)|(?<!\\)\\\((.+?)\\\)', re.DOTALL)
+        last_idx = 0
+        
+        for match in pattern.finditer(text):
+            # Text before equation
+            if match.start() > last_idx:
+                before_text = text[last_idx:match.start()]
+                if before_text:
+                    rich_text.extend(self.parse_style(before_text))
+            
+            # Equation content (handle both formats)
+            if match.group(1):  # $...$ format
+                equation = match.group(1).strip('\n ').replace('\n', ' ')
+            else:  # \(...\) format
+                equation = match.group(2).strip('\n ').replace('\n', ' ')
+            
+            if equation:
+                rich_text.append({
+                    "type": "equation",
+                    "equation": {"expression": equation}
+                })
+            
+            last_idx = match.end()
+        
+        # Text after last equation
+        if last_idx < len(text):
+            remaining_text = text[last_idx:]
+            if remaining_text:
+                rich_text.extend(self.parse_style(remaining_text))
+        
+        return rich_text
+
+    
+    def _split_table_row(self, line: str) -> List[str]:
+        """Split a table row into cells, honouring escaped pipes and code spans"""
+        line = line.strip()
+        if line.startswith('|'):
+            line = line[1:]
+        if line.endswith('|') and not line.endswith('\\|'):
+            line = line[:-1]
+        
+        cells = []
+        current = []
+        i = 0
+        code_ticks = 0  # Length of the backtick run that opened the current code span
+        while i < len(line):
+            char = line[i]
+            if char == '\\' and i + 1 < len(line) and line[i + 1] == '|':
+                # Escaped pipe is literal cell content (GFM drops the backslash)
+                current.append('|')
+                i += 2
+                continue
+            if char == '`':
+                run = len(line) - i - len(line[i:].lstrip('`'))
+                if code_ticks == 0:
+                    # Only open a code span if a matching closing run exists
+                    if re.search(r'(?<!`)' + '`' * run + r'(?!`)', line[i + run:]):
+                        code_ticks = run
+                elif run == code_ticks:
+                    code_ticks = 0
+                current.append('`' * run)
+                i += run
+                continue
+            if char == '|' and code_ticks == 0:
+                cells.append(''.join(current).strip())
+                current = []
+            else:
+                current.append(char)
+            i += 1
+        cells.append(''.join(current).strip())
+        return cells
+    
+    def _normalize_row(self, cells: List[str], width: int) -> List[str]:
+        """Fit a ragged row to the table width without dropping content"""
+        if len(cells) < width:
+            return cells + [''] * (width - len(cells))
+        if len(cells) > width:
+            # Fold surplus cells into the last column so no text is lost
+            return cells[:width - 1] + [' | '.join(cells[width - 1:])]
+        return cells
+    
+    def _build_table_row(self, cells: List[str]) -> Dict[str, Any]:
+        """Create a table_row block from cell strings"""
+        return {
+            "object": "block",
+            "type": "table_row",
+            "table_row": {
+                "cells": [[self._create_rich_text(cell)] for cell in cells]
+            }
+        }
+    
+    def iter_table_row_chunks(self, rows: List[List[str]], chunk_size: int = MAX_BLOCKS_PER_REQUEST):
+        """Yield table_row blocks in chunks, building each chunk only when requested"""
+        for start in range(0, len(rows), chunk_size):
+            yield [self._build_table_row(cells) for cells in rows[start:start + chunk_size]]
+    
+    def _table_cells(self, table_block: Dict[str, Any]):
+        """Yield the data rows of a parsed table block as lists of cell strings"""
+        for row in table_block["table"]["children"][1:]:
+            yield ["".join(part["text"]["content"] for part in cell) for cell in row["table_row"]["cells"]]
+        yield from table_block.get("_pending_rows", [])
+    
+    def infer_column_types(self, table_block: Dict[str, Any]) -> List[str]:
+        """Infer a Notion property type for every column of a parsed table
+        
+        The first column becomes the title. Other columns are "number",
+        "checkbox" or "date" when every non-empty cell fits, else "rich_text";
+        placeholders such as "-" or "n/a" count as empty.
+        """
+        width = table_block["table"]["table_width"]
+        candidates = [{"number", "checkbox", "date"} for _ in range(width)]
+        seen = [False] * width
+        
+        for cells in self._table_cells(table_block):
+            for col, cell in enumerate(cells[:width]):
+                value = cell.strip()
+                if not value or value.lower() in PLACEHOLDER_CELLS or not candidates[col]:
+                    continue
+                seen[col] = True
+                if "number" in candidates[col] and not NUMBER_PATTERN.match(value):
+                    candidates[col].discard("number")
+                if "checkbox" in candidates[col] and value.lower() not in CHECKBOX_VALUES:
+                    candidates[col].discard("checkbox")
+                if "date" in candidates[col] and not DATE_PATTERN.match(value):
+                    candidates[col].discard("date")
+        
+        types = ["title"]
+        for col in range(1, width):
+            matches = [t for t in ("number", "checkbox", "date") if t in candidates[col]]
+            types.append(matches[0] if seen[col] and matches else "rich_text")
+        return types
+    
+    def _database_property_names(self, table_block: Dict[str, Any]) -> List[str]:
+        """Column headers made unique and non-empty, as Notion requires"""
+        header = table_block["table"]["children"][0]["table_row"]["cells"]
+        names = []
+        for col, cell in enumerate(header, start=1):
+            name = "".join(part["text"]["content"] for part in cell).strip() or f"Column {col}"
+            base, suffix = name, 2
+            while name in names:
+                name = f"{base} {suffix}"
+                suffix += 1
+            names.append(name)
+        return names
+    
+    def _database_row_properties(self, names: List[str], types: List[str], cells: List[str]) -> Dict[str, Any]:
+        """Build page properties for one table row"""
+        properties = {}
+        for name, prop_type, cell in zip(names, types, cells):
+            value = cell.strip()
+            if prop_type in ("number", "date") and value.lower() in PLACEHOLDER_CELLS:
+                value = ""
+            if prop_type == "title":
+                properties[name] = {"title": [self._create_rich_text(value)] if value else []}
+            elif prop_type == "number":
+                number = float(value.replace(",", "")) if NUMBER_PATTERN.match(value) else None
+                properties[name] = {"number": number}
+            elif prop_type == "checkbox":
+                properties[name] = {"checkbox": CHECKBOX_VALUES.get(value.lower(), False)}
+            elif prop_type == "date":
+                properties[name] = {"date": {"start": value.replace(" ", "T")} if value else None}
+            else:
+                properties[name] = {"rich_text": [self._create_rich_text(value)] if value else []}
+        return properties
+    
+    def _parse_table(self, lines: List[str], start_index: int) -> tuple[List[Dict[str, Any]], int]:
+        """Parse markdown table and convert to Notion table blocks
+        
+        The table block carries at most MAX_BLOCKS_PER_REQUEST rows, which is
+        what Notion accepts when the table is created. Any further rows are kept
+        as plain cell strings under the temporary "_pending_rows" field and are
+        turned into table_row blocks chunk by chunk while uploading.
+        """
+        table_blocks = []
+        i = start_index
+        
+        # Parse header
+        if i >= len(lines):
+            return table_blocks, i
+        
+        header_line = lines[i].strip()
+        if not header_line.startswith('|') or not header_line.endswith('|'):
+            return table_blocks, i
+        
+        # Parse header cells
+        header_cells = self._split_table_row(header_line)
+        width = len(header_cells)
+        i += 1
+        
+        # Skip separator line (| --- | --- |)
+        if i < len(lines) and lines[i].strip().startswith('|') and TABLE_SEPARATOR_PATTERN.match(lines[i].strip()):
+            i += 1
+        
+        # Parse data rows; ragged rows are padded or folded rather than dropped
+        data_rows = []
+        while i < len(lines):
+            line = lines[i].strip()
+            if not line.startswith('|') or not line.endswith('|'):
+                break
+            
+            data_rows.append(self._normalize_row(self._split_table_row(line), width))
+            i += 1
+        
+        # Create table block
+        if width:
+            table_blocks.append(self._table_block(header_cells, data_rows))
+        
+        return table_blocks, i
+    
+    def _table_block(self, header_cells: List[str], data_rows: List[List[str]]) -> Dict[str, Any]:
+        """Create a table block; rows beyond the first request are kept in "_pending_rows"
+        
+        data_rows must already have the header's width.
+        """
+        # Per Notion validation, table rows must live under table.children
+        first_chunk = MAX_BLOCKS_PER_REQUEST - 1  # The header row takes one slot
+        table_block = {
+            "object": "block",
+            "type": "table",
+            "table": {
+                "table_width": len(header_cells),
+                "has_column_header": True,
+                "has_row_header": False,
+                "children": [self._build_table_row(header_cells)]
+            }
+        }
+        
+        for chunk in self.iter_table_row_chunks(data_rows[:first_chunk]):
+            table_block["table"]["children"].extend(chunk)
+        
+        if len(data_rows) > first_chunk:
+            table_block["_pending_rows"] = data_rows[first_chunk:]
+        
+        return table_block
+    
+    def _is_list_item(self, line: str) -> tuple[bool, str, str, int]:
+        """Check if line is a list item. Returns: (is_list, type, content, indent_level)"""
+        line_strip = line.strip()
+        if not line_strip:
+            return False, "", "", 0
+        
+        indent_level = len(line) - len(line.lstrip())
+        
+        # Check numbered list
+        numbered_match = re.match(r'^\d+\.\s+(.+)$', line_strip)
+        if numbered_match:
+            return True, "numbered", numbered_match.group(1), indent_level
+        
+        # Check bulleted list
+        bullet_match = re.match(r'^[\*\-+]\s+(.+)$', line_strip)
+        if bullet_match:
+            return True, "bulleted", bullet_match.group(1), indent_level
+        
+        return False, "", "", 0
+    
+    def _text_block(self, block_type: str, text: str) -> Dict[str, Any]:
+        """Create a block of block_type whose content is inline Markdown text"""
+        return {
+            "object": "block",
+            "type": block_type,
+            block_type: {
+                "rich_text": self.parse_equations_and_style(text)
+            }
+        }
+    
+    def _equation_block(self, latex: str) -> Dict[str, Any]:
+        return {"object": "block", "type": "equation", "equation": {"expression": latex}}
+    
+    def _code_block(self, code: str, language: str = "") -> Dict[str, Any]:
+        """Create a code block, its text split into rich text items of the maximum length"""
+        language = language.lower()
+        language = CODE_LANGUAGE_ALIASES.get(language, language)
+        return {
+            "object": "block",
+            "type": "code",
+            "code": {
+                "rich_text": [self._create_rich_text(code[start:start + MAX_RICH_TEXT_LENGTH])
+                              for start in range(0, len(code), MAX_RICH_TEXT_LENGTH)],
+                "language": language if language in CODE_LANGUAGES else "plain text"
+            }
+        }
+    
+    def _process_list_group(self, lines: list, start_index: int, blocks: list, first_line: int = 1) -> int:
+        """Process a group of list items with nesting
+        
+        With track_lines, a list item's line range runs to its last nested item.
+        """
+        i = start_index
+        stack = []  # Stack to manage nesting levels: (indent_level, block)
+        
+        while i < len(lines):
+            line = lines[i]
+            is_list, list_type, content, indent_level = self._is_list_item(line)
+            
+            if not is_list:
+                break
+            
+            # Create current list item
+            current_block = self._text_block(f"{list_type}_list_item", content)
+            
+            # Handle nesting
+            while stack and stack[-1][0] >= indent_level:
+                stack.pop()
+            
+            if self.track_lines:
+                self._with_lines(current_block, first_line + i, first_line + i)
+                for _, ancestor in stack:
+                    ancestor["_lines"][1] = first_line + i
+            
+            if stack:
+                # Add to parent's children
+                parent_indent, parent_block = stack[-1]
+                parent_type = parent_block["type"]
+                if "children" not in parent_block[parent_type]:
+                    parent_block[parent_type]["children"] = []
+                parent_block[parent_type]["children"].append(current_block)
+            else:
+                # Add to main blocks
+                blocks.append(current_block)
+            
+            stack.append((indent_level, current_block))
+            i += 1
+        
+        return i
+    
+    def _clean_blocks_recursively(self, blocks):
+        """Drop empty children lists from blocks recursively"""
+        if not isinstance(blocks, list):
+            return blocks
+        
+        cleaned_blocks = []
+        for block in blocks:
+            if not isinstance(block, dict):
+                continue
+            
+            # Copy the block (and below, its list content) so pruning children leaves the original intact
+            cleaned_block = dict(block)
+            
+            # Clean children recursively
+            block_type = cleaned_block.get("type")
+            if block_type in ["bulleted_list_item", "numbered_list_item"]:
+                list_content = cleaned_block[block_type] = dict(cleaned_block.get(block_type, {}))
+                if "children" in list_content:
+                    list_content["children"] = self._clean_blocks_recursively(list_content["children"])
+                    if not list_content["children"]:
+                        del list_content["children"]
+            
+            cleaned_blocks.append(cleaned_block)
+        
+        return cleaned_blocks
+    
+    def _append_paragraph_block(self, blocks: list, text: str, lines: tuple = (0, 0)):
+        """Add paragraph block(s) to blocks list; each keeps the paragraph's source lines"""
+        text = text.strip()
+        if not text:
+            return
+        
+        # Split long paragraphs for Notion API limits
+        max_length = 2000  # Conservative limit
+        if len(text) <= max_length:
+            blocks.append(self._with_lines(self._text_block("paragraph", text), *lines))
+        else:
+            # Split by sentences or at word boundaries
+            chunks = []
+            current_chunk = ""
+            sentences = re.split(r'([.!?]+\s+)', text)
+            
+            for sentence in sentences:
+                if len(current_chunk) + len(sentence) <= max_length:
+                    current_chunk += sentence
+                else:
+                    if current_chunk:
+                        chunks.append(current_chunk.strip())
+                    current_chunk = sentence
+            
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            
+            for chunk in chunks:
+                blocks.append(self._with_lines(self._text_block("paragraph", chunk), *lines))
+    
+    def _parser_backend(self, name: str):
+        """The backend for a parser name, or None for the built-in parser"""
+        if name == BUILTIN_PARSER:
+            return None
+        from md2notion_parsers import get_parser
+        backend = get_parser(name)
+        if self.track_lines and not backend.tracks_lines:
+            raise ValueError(f"The {name} parser does not report source lines")
+        return backend
+    
+    def _emit_nodes(self, nodes: List[Dict[str, Any]], blocks: list, base: int):
+        """Append the Notion blocks for a parser backend's block nodes
+        
+        Nodes are built with the same block builders and inline parsing as
+        the built-in parser's blocks; base is the source line of the parsed
+        text's first line.
+        """
+        for node in nodes:
+            kind = node["type"]
+            lines = (base + node["lines"][0], base + node["lines"][1]) if node.get("lines") else (0, 0)
+            if kind == "paragraph":
+                self._append_paragraph_block(blocks, node["text"], lines)
+                continue
+            if kind == "heading":
+                # Notion has three heading levels
+                block = self._text_block(f"heading_{min(node['level'], 3)}", node["text"].strip())
+            elif kind == "divider":
+                block = {"object": "block", "type": "divider", "divider": {}}
+            elif kind == "code":
+                block = self._code_block(node["text"], node.get("language", ""))
+            elif kind == "table":
+                width = len(node["header"])
+                if not width:
+                    continue
+                block = self._table_block(node["header"], [self._normalize_row(row, width) for row in node["rows"]])
+            elif kind in ("list_item", "quote"):
+                block_type = "quote" if kind == "quote" else \
+                    f"{'numbered' if node.get('ordered') else 'bulleted'}_list_item"
+                block = self._text_block(block_type, node["text"].strip())
+                children = []
+                self._emit_nodes(node["children"], children, base)
+                if children:
+                    block[block_type]["children"] = children
+            else:
+                continue
+            blocks.append(self._with_lines(block, *lines))
+    
+    def convert_markdown_to_blocks(self, markdown_content: str, first_line: int = 1,
+                                   parser: Optional[str] = None) -> list:
+        """Convert Markdown content to Notion blocks
+        
+        first_line is the source line number of the content's first line, for
+        the line ranges recorded with track_lines. parser picks the Markdown
+        parser for this call and defaults to self.parser; block equations are
+        split off before any parser sees the text.
+        """
+        backend = self._parser_backend(parser or self.parser)
+        blocks = []
+        
+        # Split by block equations first (support both $$...$$ and \[...\] formats)
+        parts = BLOCK_EQUATION_PATTERN.split(markdown_content)
+        
+        part_line = first_line
+        for part in parts:
+            # Source line of the part's first non-blank line
+            base = part_line + part[:len(part) - len(part.lstrip())].count('\n')
+            part_line += part.count('\n')
+            part = part.strip()
+            if not part:
+                continue
+                
+            if part.startswith('$$'):
+                # Block equation ($$...$$ format)
+                latex = part[2:-2].strip().replace('\n', '\\')
+                blocks.append(self._with_lines(self._equation_block(latex), base, base + part.count('\n')))
+            elif part.startswith('\\[') and part.endswith('\\]'):
+                # Block equation (\[...\] format)
+                latex = part[2:-2].strip().replace('\n', '\\')
+                blocks.append(self._with_lines(self._equation_block(latex), base, base + part.count('\n')))
+            elif backend is not None:
+                self._emit_nodes(backend.parse(part), blocks, base)
+            else:
+                # Process text content line by line
+                lines = part.split('\n')
+                paragraph_lines = []
+                i = 0
+                
+                while i < len(lines):
+                    line = lines[i]
+                    line_strip = line.strip()
+                    
+                    # A blank line ends the current paragraph
+                    if not line_strip:
+                        if paragraph_lines:
+                            self._append_paragraph_block(blocks, '\n'.join(paragraph_lines),
+                                                         (base + i - len(paragraph_lines), base + i - 1))
+                            paragraph_lines = []
+                        i += 1
+                        continue
+                    
+                    # Check for heading
+                    heading_match = HEADING_PATTERN.match(line)
+                    if heading_match:
+                        if paragraph_lines:
+                            self._append_paragraph_block(blocks, '\n'.join(paragraph_lines),
+                                                         (base + i - len(paragraph_lines), base + i - 1))
+                            paragraph_lines = []
+                        level = len(heading_match.group(1))
+                        blocks.append(self._with_lines(
+                            self._text_block(f"heading_{level}", heading_match.group(2).strip()), base + i, base + i
+                        ))
+                        i += 1
+                        continue
+                    
+                    # Check for divider
+                    if DIVIDER_PATTERN.match(line_strip):
+                        if paragraph_lines:
+                            self._append_paragraph_block(blocks, '\n'.join(paragraph_lines),
+                                                         (base + i - len(paragraph_lines), base + i - 1))
+                            paragraph_lines = []
+                        blocks.append(self._with_lines({"object": "block", "type": "divider", "divider": {}},
+                                                       base + i, base + i))
+                        i += 1
+                        continue
+                    
+                    # Check for table
+                    if line_strip.startswith('|') and line_strip.endswith('|'):
+                        if paragraph_lines:
+                            self._append_paragraph_block(blocks, '\n'.join(paragraph_lines),
+                                                         (base + i - len(paragraph_lines), base + i - 1))
+                            paragraph_lines = []
+                        table_start = i
+                        table_blocks, i = self._parse_table(lines, i)
+                        blocks.extend(self._with_lines(block, base + table_start, base + i - 1)
+                                      for block in table_blocks)
+                        continue
+                    
+                    # Check for list items
+                    is_list, _, _, _ = self._is_list_item(line)
+                    if is_list:
+                        if paragraph_lines:
+                            self._append_paragraph_block(blocks, '\n'.join(paragraph_lines),
+                                                         (base + i - len(paragraph_lines), base + i - 1))
+                            paragraph_lines = []
+                        i = self._process_list_group(lines, i, blocks, base)
+                    else:
+                        paragraph_lines.append(line)
+                        i += 1
+                
+                # Add remaining paragraphs
+                if paragraph_lines:
+                    self._append_paragraph_block(blocks, '\n'.join(paragraph_lines),
+                                                 (base + i - len(paragraph_lines), base + i - 1))
+        
+        return self._clean_blocks_recursively(blocks)
+    
+    def iter_blocks(self, lines: Iterable[str], chunk_size: int = STREAM_CHUNK_SIZE,
+                    parser: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Convert Markdown given as lines, yielding blocks as they become final
+        
+        Lines are buffered until, past chunk_size characters, an unindented
+        line follows a blank line outside code fences and block equations;
+        the buffer is then converted on its own. Memory stays bounded by the
+        chunk size and the largest single block, and the blocks are the same
+        as convert_markdown_to_blocks('\n'.join(lines), parser=parser).
+        Parsers whose blocks can run on across such boundaries get the whole
+        document at once instead.
+        """
+        parser = parser or self.parser
+        if not _chunkable(parser):
+            yield from self.convert_markdown_to_blocks('\n'.join(lines), parser=parser)
+            return
+        
+        buffer = []
+        buffer_line = 1
+        size = 0
+        check_at = chunk_size
+        has_equation_marker = False
+        fence = None
+        previous_blank = False
+        
+        for line in lines:
+            if (size >= check_at and previous_blank and line[:1].strip() and (fence is None or has_equation_marker)
+                    and not line.startswith(('$$', '\\['))):
+                text = '\n'.join(buffer)
+                # Equations cut fences short, which the line by line tracking misses
+                if not (has_equation_marker and (_equation_may_continue(text) or _ends_in_fence(text))):
+                    yield from self.convert_markdown_to_blocks(text, buffer_line, parser)
+                    buffer_line += len(buffer)
+                    buffer = []
+                    size = 0
+                    check_at = chunk_size
+                    has_equation_marker = False
+                    fence = None
+                else:
+                    # Look again only after another chunk, keeping the scan linear
+                    check_at = size + chunk_size
+            
+            buffer.append(line)
+            size += len(line) + 1
+            if '$$' in line or '\\[' in line:
+                has_equation_marker = True
+            fence = _fence_after(line, fence)
+            previous_blank = not line.strip()
+        
+        if buffer:
+            yield from self.convert_markdown_to_blocks('\n'.join(buffer), buffer_line, parser)
+    
+    def iter_file_blocks(self, path: str, chunk_size: int = STREAM_CHUNK_SIZE,
+                         parser: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the blocks of a Markdown file without loading it whole"""
+        return self.iter_blocks(iter_file_lines(path), chunk_size, parser)
+    
+    def _payload_block(self, block: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the block without temporary (underscore-prefixed) fields"""
+        payload = {k: v for k, v in block.items() if not k.startswith('_')}
+        content = payload.get(payload.get("type"))
+        if self.track_lines and isinstance(content, dict) and content.get("children"):
+            # Nested blocks carry their source lines too
+            payload[payload["type"]] = dict(content, children=[self._payload_block(child)
+                                                               for child in content["children"]])
+        return payload
+
+
+def iter_file_lines(path: str) -> Iterator[str]:
+    """Yield the lines of a UTF-8 file without reading it into one string
+    
+    The file is memory-mapped and each line is decoded on its own, so only
+    the current line lives in Python memory. Like text-mode open(), '\\r\\n'
+    endings are normalized; lone '\\r' line endings are not.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # Empty files cannot be mapped
+            yield ''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            start = 0
+            released = 0
+            while start <= size:
+                end = data.find(b'\n', start)
+                if end == -1:
+                    end = size
+                line = data[start:end].decode('utf-8')
+                yield line[:-1] if line.endswith('\r') else line
+                start = end + 1
+                if RELEASE_MAPPED_PAGES and start - released >= MMAP_RELEASE_SIZE:
+                    # Drop pages already read so resident memory stays flat
+                    boundary = start - start % mmap.PAGESIZE
+                    data.madvise(mmap.MADV_DONTNEED, released, boundary - released)
+                    released = boundary
+
+
+def _chunkable(parser: str) -> bool:
+    """Check whether a parser gives the same blocks for chunks cut at blank lines as for the whole"""
+    if parser == BUILTIN_PARSER:
+        return True
+    from md2notion_parsers import get_parser
+    return get_parser(parser).chunkable
+
+
+def _fence_after(line: str, fence: Optional[str]) -> Optional[str]:
+    """The marker of the code fence open after line, given the one open before it
+    
+    As in CommonMark, a fence opened by n backticks or tildes is only closed
+    by a line of at least n of the same character with nothing after them.
+    """
+    match = FENCE_LINE_PATTERN.match(line)
+    if match is None:
+        return fence
+    marker, rest = match.groups()
+    if fence is None:
+        # The info string of a backtick fence cannot contain backticks
+        return None if marker[0] == '`' and '`' in rest else marker
+    if marker[0] == fence[0] and len(marker) >= len(fence) and not rest.strip():
+        return None
+    return fence
+
+
+def _ends_in_fence(text: str) -> bool:
+    """Check whether text ends inside a code fence, with its block equations split off"""
+    equations = [match.span() for match in BLOCK_EQUATION_PATTERN.finditer(text)]
+    return _code_fences(text, equations)[1]
+
+
+def _code_fences(text: str, equations: List[Tuple[int, int]]) -> Tuple[List[Tuple[int, int]], bool]:
+    """Spans of the code fences in text, and whether the last one is still open at its end
+    
+    equations are the spans of the block equations in text. They are split
+    off before any parser sees the text, so a fence ends at the next one,
+    and fence markers inside an equation do not count.
+    """
+    starts = [start for start, _ in equations]
+    fences = []
+    fence = None
+    fence_start = 0
+    part = -1
+    for match in FENCE_LINE_PATTERN.finditer(text):
+        index = bisect.bisect_right(starts, match.start()) - 1
+        if index != part:
+            if fence is not None:
+                fences.append((fence_start, starts[part + 1]))
+                fence = None
+            part = index
+        if index >= 0 and match.start() < equations[index][1]:
+            continue
+        after = _fence_after(match.group(), fence)
+        if fence is None and after is not None:
+            fence_start = match.start()
+        elif fence is not None and after is None:
+            fences.append((fence_start, match.end()))
+        fence = after
+    if fence is None:
+        return fences, False
+    if part + 1 < len(starts):
+        fences.append((fence_start, starts[part + 1]))
+        return fences, False
+    fences.append((fence_start, len(text)))
+    return fences, True
+
+
+def _equation_may_continue(text: str) -> bool:
+    """Check whether more input could change the block equations found in text
+    
+    That is the case when a '$$' or '\\[' outside every match may still find
+    its closing marker, or when a '$$' match could grow into a longer
+    multi-line form once a closing '$$' line arrives.
+    """
+    position = 0
+    for match in BLOCK_EQUATION_PATTERN.finditer(text):
+        # One extra character catches a marker straddling the match start
+        gap = text[position:match.start() + 1]
+        if '$$' in gap or '\\[' in gap:
+            return True
+        # The pattern first tries the longest whitespace run after '$$'; if that
+        # found no closing line yet, later input may still provide one
+        opening = MULTILINE_EQUATION_OPEN.match(match.group())
+        if opening and not MULTILINE_EQUATION_CLOSE.match(match.group(), opening.end()):
+            return True
+        position = match.end()
+    tail = text[position:]
+    return '$$' in tail or '\\[' in tail
+
+
+def split_markdown_chunks(markdown_content: str, target_size: int) -> List[str]:
+    """Split a document at boundaries where conversion state is empty
+    
+    A boundary is placed at the start of a line that follows a blank line,
+    is not indented, and lies outside code fences and block equations. A
+    blank line ends any paragraph, list or table, so converting the chunks
+    one by one yields exactly the blocks of the whole.
+    
+    Only candidate lines near each target offset are inspected, so splitting
+    costs a few regex scans rather than a Python-level pass over every line.
+    """
+    if len(markdown_content) <= target_size:
+        return [markdown_content]
+    
+    spans = [match.span() for match in BLOCK_EQUATION_PATTERN.finditer(markdown_content)]
+    span_starts = [start for start, _ in spans]
+    fences, _ = _code_fences(markdown_content, spans)
+    fence_starts = [start for start, _ in fences]
+    
+    def is_boundary(line_start: int) -> bool:
+        # A stray marker would make the next chunk open with an "equation"
+        if markdown_content.startswith(('$$', '\\['), line_start):
+            return False
+        index = bisect.bisect_right(span_starts, line_start) - 1
+        if index >= 0 and spans[index][0] < line_start < spans[index][1]:
+            return False
+        # Likewise when the text before the line already opens with one
+        part_start = spans[index][1] if index >= 0 else 0
+        if part_start < line_start and EQUATION_PART_PREFIX.match(markdown_content, part_start, line_start):
+            return False
+        index = bisect.bisect_right(fence_starts, line_start) - 1
+        return index < 0 or not fences[index][0] < line_start < fences[index][1]
+    
+    chunks = []
+    chunk_start = 0
+    search_from = target_size
+    while True:
+        match = BLANK_LINES_PATTERN.search(markdown_content, search_from)
+        if match is None:
+            break
+        if is_boundary(match.end()):
+            chunks.append(markdown_content[chunk_start:match.end()])
+            chunk_start = match.end()
+            search_from = chunk_start + target_size
+        else:
+            search_from = match.end()
+    
+    chunks.append(markdown_content[chunk_start:])
+    return chunks
+
+
+def _convert_chunk(markdown_content: str, first_line: int = 1, page_titles=None, track_lines: bool = False,
+                   parser: str = BUILTIN_PARSER) -> list:
+    # The result is a large tree of fresh dicts; cyclic GC only slows that down
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        converter = MarkdownConverter()
+        converter.page_titles = page_titles
+        converter.track_lines = track_lines
+        converter.parser = parser
+        return converter.convert_markdown_to_blocks(markdown_content, first_line)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def convert_markdown_parallel(markdown_content: str, workers: Optional[int] = None,
+                              chunk_size: Optional[int] = None, page_titles=None,
+                              track_lines: bool = False, on_chunk=None, parser: str = BUILTIN_PARSER) -> list:
+    """Convert a large document on several CPU cores
+    
+    The document is split with split_markdown_chunks, the chunks are converted
+    in a process pool and the results are concatenated in order, which gives
+    the same blocks as MarkdownConverter().convert_markdown_to_blocks.
+    page_titles is sent to the workers for [[Page Title]] links,
+    track_lines records source lines numbered across the whole document and
+    parser names the Markdown parser the workers use. on_chunk(chunk, blocks)
+    is called in this process as each chunk's blocks arrive, in document order.
+    Parsers that cannot be chunked convert the whole document in this process.
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        # A few chunks per worker keeps the pool busy when chunk costs differ
+        chunk_size = max(PARALLEL_MIN_CHUNK_SIZE, len(markdown_content) // (workers * 4) + 1)
+    
+    chunks = split_markdown_chunks(markdown_content, chunk_size) if _chunkable(parser) else [markdown_content]
+    first_lines = [1]
+    for chunk in chunks[:-1]:
+        first_lines.append(first_lines[-1] + chunk.count('\n'))
+    convert = functools.partial(_convert_chunk, page_titles=page_titles, track_lines=track_lines, parser=parser)
+    
+    def collect(results: Iterable[list]) -> list:
+        blocks = []
+        for chunk, chunk_blocks in zip(chunks, results):
+            if on_chunk is not None:
+                on_chunk(chunk, chunk_blocks)
+            blocks.extend(chunk_blocks)
+        return blocks
+    
+    if workers <= 1 or len(chunks) <= 1:
+        return collect(map(convert, chunks, first_lines))
+    
+    # Loaded here: the process pool machinery costs more to import than the rest of the module
+    from concurrent.futures import ProcessPoolExecutor
+    
+    # Results are unpickled in this process as they arrive; keep GC out of it
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            return collect(executor.map(convert, chunks, first_lines))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def extract_page_id_from_url(url: str) -> str:
+    """Extract the page ID from a Notion URL or ID, dashed or not
+    
+    Examples:
+    https://www.notion.so/z123z123d/Survey-latent-reasoning-22f97b0feb94808fbfa4c07162457633?source=copy_link
+    https://www.notion.so/My-Page-22f97b0feb94808fbfa4c07162457633
+    22f97b0f-eb94-808f-bfa4-c07162457633
+    
+    The query string is only searched when the path holds no ID, so view
+    IDs (?v=...) do not shadow the page ID. Returns 32 lowercase hex digits.
+    """
+    path, _, query = url.strip().partition('?')
+    match = PAGE_ID_PATTERN.search(path) or PAGE_ID_PATTERN.search(query)
+    if not match:
+        raise ValueError(f"Could not extract page ID from URL: {url}")
+    return "".join(match.groups()).lower()
+
+
+def normalize_page_id(page_id: str) -> str:
+    """Canonical form of a page ID for lookups: undashed lowercase hex"""
+    return page_id.replace("-", "").lower()
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Notion to Markdown exporter
+
+Exports a Notion page (optionally with its child pages) back to Markdown.
+Child block lists are fetched breadth-first: as soon as a list of blocks is
+known, the children of its nested blocks are requested, up to a fixed window
+of lists fetched ahead of rendering, bounded by a concurrency limit and
+following pagination. Markdown is written out in document order as soon as
+each top-level block and its subtree are available, so large pages stream
+instead of being held in memory.
+"""
+
+import argparse
+import asyncio
+import logging
+import re
+import sys
+import textwrap
+from pathlib import Path
+from typing import List, Dict, Any, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+# Block types rendered from their rich_text with a Markdown prefix
+TEXT_PREFIXES = {
+    "paragraph": "",
+    "heading_1": "# ",
+    "heading_2": "## ",
+    "heading_3": "### ",
+    "quote": "> ",
+}
+
+LIST_TYPES = {"bulleted_list_item", "numbered_list_item", "to_do"}
+
+# Pages rendered elsewhere; their children are not part of this page's Markdown
+PAGE_TYPES = {"child_page", "child_database"}
+
+# Child block lists fetched ahead of rendering
+DEFAULT_PREFETCH = 64
+
+# Inline characters the importer would read as markup, and line starts it would read as blocks
+INLINE_MARKUP_PATTERN = re.compile(r'([\\`*_~$])')
+LINE_START_MARKUP_PATTERN = re.compile(r'^([ \t]*)(?:(#|>|-(?=\s|-|$)|\+(?=\s|$))|(\d+)(?=[.)](?:\s|$)))',
+                                       re.MULTILINE)
+
+
+def notion_url(object_id: str) -> str:
+    """Public URL of a page or database from its ID"""
+    return f"https://www.notion.so/{object_id.replace('-', '')}"
+
+
+def rich_text_to_markdown(rich_text: List[Dict[str, Any]]) -> str:
+    """Render Notion rich text back to inline Markdown"""
+    parts = []
+    for item in rich_text:
+        if item.get("type") == "equation":
+            parts.append(f"${item['equation']['expression']}$")
+            continue
+        if item.get("type") == "mention" and (item.get("mention") or {}).get("type") == "page" and item.get("plain_text"):
+            # Page mentions go back to the [[Page Title]] links they are imported from
+            parts.append(f"[[{item['plain_text']}]]")
+            continue
+        
+        content = item.get("plain_text")
+        if content is None:
+            content = item.get("text", {}).get("content", "")
+        if not content:
+            continue
+        
+        annotations = item.get("annotations") or {}
+        # Keep surrounding whitespace outside the markers, as Markdown requires
+        stripped = content.strip()
+        leading = content[:len(content) - len(content.lstrip())]
+        trailing = content[len(content.rstrip()):]
+        if stripped:
+            if annotations.get("code"):
+                stripped = f"`{stripped}`"
+            else:
+                stripped = _escape_markdown(stripped)
+            if annotations.get("bold"):
+                stripped = f"**{stripped}**"
+            if annotations.get("italic"):
+                stripped = f"*{stripped}*"
+            if annotations.get("strikethrough"):
+                stripped = f"~~{stripped}~~"
+            link = (item.get("text") or {}).get("link") or ({"url": item["href"]} if item.get("href") else None)
+            if link and link.get("url"):
+                stripped = f"[{stripped}]({link['url']})"
+        parts.append(leading + stripped + trailing)
+    return "".join(parts)
+
+
+def _escape_markdown(text: str) -> str:
+    """Backslash-escape the characters of plain text that would read as inline markup"""
+    return INLINE_MARKUP_PATTERN.sub(r"\\\1", text)
+
+
+def _escape_line_starts(text: str) -> str:
+    """Escape block markers (headings, quotes, list items) at the start of paragraph lines"""
+    def escape(match):
+        if match.group(2):
+            return match.group(1) + "\\" + match.group(2)
+        # The delimiter after the number is what makes an ordered list item
+        return match.group(1) + match.group(3) + "\\"
+    return LINE_START_MARKUP_PATTERN.sub(escape, text)
+
+
+def rich_text_to_plain(rich_text: List[Dict[str, Any]]) -> str:
+    """Plain text of rich text, without any Markdown markers"""
+    return "".join(item.get("plain_text", item.get("text", {}).get("content", "")) for item in rich_text)
+
+
+def _escape_cell(text: str) -> str:
+    return text.replace("|", "\\|").replace("\n", " ")
+
+
+def _table_to_markdown(rows: List[List[str]]) -> str:
+    if not rows:
+        return ""
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    lines = ["| " + " | ".join(_escape_cell(cell) for cell in rows[0]) + " |",
+             "| " + " | ".join("---" for _ in range(width)) + " |"]
+    lines.extend("| " + " | ".join(_escape_cell(cell) for cell in row) + " |" for row in rows[1:])
+    return "\n".join(lines)
+
+
+async def _cancel_all(futures: List[asyncio.Future]):
+    """Cancel futures no longer needed and wait for them, so failed ones are retrieved"""
+    for future in futures:
+        future.cancel()
+    await asyncio.gather(*futures, return_exceptions=True)
+
+
+def _safe_filename(title: str) -> str:
+    name = re.sub(r'[\\/:*?"<>|\s]+', "-", title).strip("-.")
+    return name or "Untitled"
+
+
+class NotionExporter:
+    """Export Notion pages to Markdown with concurrent breadth-first fetching"""
+    
+    def __init__(self, client, max_concurrency: int = 3, max_prefetch: int = DEFAULT_PREFETCH):
+        self.notion = client
+        self.max_prefetch = max_prefetch
+        self._limit = asyncio.Semaphore(max_concurrency)
+        self._children: Dict[str, asyncio.Future] = {}
+        self.requests = 0
+    
+    async def _list_all(self, method, **kwargs) -> List[Dict[str, Any]]:
+        """Collect every page of a paginated list endpoint"""
+        results = []
+        cursor = None
+        while True:
+            params = dict(kwargs, page_size=100)
+            if cursor:
+                params["start_cursor"] = cursor
+            async with self._limit:
+                response = await method(**params)
+            self.requests += 1
+            results.extend(response.get("results", []))
+            if not response.get("has_more"):
+                return results
+            cursor = response.get("next_cursor")
+    
+    async def _fetch_children(self, block_id: str) -> List[Dict[str, Any]]:
+        blocks = await self._list_all(self.notion.blocks.children.list, block_id=block_id)
+        # Breadth-first: queue the next level as soon as this one is known, while
+        # the window has room; the rest are fetched when they are rendered
+        for block in blocks:
+            if len(self._children) >= self.max_prefetch:
+                break
+            if block.get("has_children") and block.get("type") not in PAGE_TYPES:
+                self.children_of(block["id"])
+        return blocks
+    
+    def children_of(self, block_id: str) -> asyncio.Future:
+        """Future for the children of a block, fetched at most once"""
+        if block_id not in self._children:
+            self._children[block_id] = asyncio.ensure_future(self._fetch_children(block_id))
+        return self._children[block_id]
+    
+    async def _take_children(self, block_id: str) -> List[Dict[str, Any]]:
+        """Children of a block about to be rendered, no longer kept once it is"""
+        children = await self.children_of(block_id)
+        self._children.pop(block_id, None)
+        return children
+    
+    async def _child_rows(self, block: Dict[str, Any]) -> List[List[str]]:
+        children = await self._take_children(block["id"]) if block.get("has_children") else []
+        return [[rich_text_to_markdown(cell) for cell in row["table_row"]["cells"]]
+                for row in children if row.get("type") == "table_row"]
+    
+    async def _database_to_markdown(self, database_id: str) -> str:
+        """Render an inline database as a Markdown table"""
+        async with self._limit:
+            database = await self.notion.databases.retrieve(database_id=database_id)
+        self.requests += 1
+        properties = database.get("properties")
+        if not properties and database.get("data_sources") and hasattr(self.notion, "data_sources"):
+            # Newer API versions keep the schema and rows on the database's data source
+            source_id = database["data_sources"][0]["id"]
+            async with self._limit:
+                source = await self.notion.data_sources.retrieve(data_source_id=source_id)
+            self.requests += 1
+            properties = source.get("properties") or {}
+            pages = await self._list_all(self.notion.data_sources.query, data_source_id=source_id)
+        else:
+            properties = properties or {}
+            pages = await self._list_all(self.notion.databases.query, database_id=database_id)
+        names = sorted(properties, key=lambda name: properties[name].get("type") != "title")
+        
+        rows = [names]
+        for page in pages:
+            row = []
+            for name in names:
+                value = page.get("properties", {}).get(name, {})
+                prop_type = value.get("type")
+                if prop_type in ("title", "rich_text"):
+                    row.append(rich_text_to_markdown(value.get(prop_type) or []))
+                elif prop_type == "number":
+                    number = value.get("number")
+                    row.append("" if number is None else f"{number:g}")
+                elif prop_type == "checkbox":
+                    row.append("yes" if value.get("checkbox") else "no")
+                elif prop_type == "date":
+                    row.append((value.get("date") or {}).get("start", ""))
+                elif prop_type == "select":
+                    row.append((value.get("select") or {}).get("name", ""))
+                elif prop_type == "multi_select":
+                    row.append(", ".join(option["name"] for option in value.get("multi_select", [])))
+                else:
+                    row.append("")
+            rows.append(row)
+        return _table_to_markdown(rows)
+    
+    async def render_block(self, block: Dict[str, Any], depth: int = 0, number: int = 1) -> str:
+        """Render one block and its subtree to Markdown"""
+        block_type = block.get("type")
+        content = block.get(block_type, {})
+        
+        if block_type in TEXT_PREFIXES:
+            text = rich_text_to_markdown(content.get("rich_text", []))
+            if block_type == "paragraph":
+                text = _escape_line_starts(text)
+            body = TEXT_PREFIXES[block_type] + text
+        elif block_type in LIST_TYPES:
+            if block_type == "bulleted_list_item":
+                marker = "- "
+            elif block_type == "numbered_list_item":
+                marker = f"{number}. "
+            else:
+                marker = "- [x] " if content.get("checked") else "- [ ] "
+            body = marker + rich_text_to_markdown(content.get("rich_text", []))
+        elif block_type == "equation":
+            body = f"$$\n{content.get('expression', '')}\n$$"
+        elif block_type == "divider":
+            body = "---"
+        elif block_type == "code":
+            language = content.get("language", "")
+            body = f"```{'' if language == 'plain text' else language}\n{rich_text_to_plain(content.get('rich_text', []))}\n```"
+        elif block_type == "table":
+            body = _table_to_markdown(await self._child_rows(block))
+        elif block_type == "child_page":
+            body = f"[{content.get('title', 'Untitled')}]({notion_url(block['id'])})"
+        elif block_type == "child_database":
+            body = await self._database_to_markdown(block["id"])
+        elif isinstance(content, dict) and "rich_text" in content:
+            body = rich_text_to_markdown(content["rich_text"])
+        else:
+            body = f"<!-- unsupported block: {block_type} -->"
+        # Every line of a nested block, code and equations included, belongs to its list item
+        body = textwrap.indent(body, "  " * depth)
+        
+        if block.get("has_children") and block_type not in PAGE_TYPES and block_type != "table":
+            children = await self._take_children(block["id"])
+            nested = await self.render_blocks(children, depth + 1)
+            if nested:
+                body += "\n" + nested
+        return body
+    
+    async def render_blocks(self, blocks: List[Dict[str, Any]], depth: int = 0) -> str:
+        """Render sibling blocks, keeping list items together"""
+        rendered = []
+        number = 0
+        previous_type = None
+        for block in blocks:
+            block_type = block.get("type")
+            number = number + 1 if block_type == "numbered_list_item" and previous_type == block_type else 1
+            text = await self.render_block(block, depth, number)
+            separator = "\n" if block_type in LIST_TYPES and previous_type in LIST_TYPES or depth else "\n\n"
+            rendered.append((separator if rendered else "") + text)
+            previous_type = block_type
+        return "".join(rendered)
+    
+    async def export_page(self, page_id: str, out: TextIO, output_dir: Optional[Path] = None) -> int:
+        """Stream a page's Markdown to out; returns the number of top-level blocks
+        
+        With output_dir set, child pages are exported recursively to their own
+        files in that directory and linked from the parent.
+        """
+        blocks = await self._take_children(page_id)
+        subpages = []
+        previous_type = None
+        number = 0
+        
+        try:
+            for index, block in enumerate(blocks):
+                block_type = block.get("type")
+                number = number + 1 if block_type == "numbered_list_item" and previous_type == block_type else 1
+                if block_type == "child_page" and output_dir is not None:
+                    title = block["child_page"].get("title") or "Untitled"
+                    filename = f"{_safe_filename(title)}-{block['id'].replace('-', '')[:8]}.md"
+                    subpages.append(asyncio.ensure_future(self._export_to_file(block["id"], output_dir / filename,
+                                                                               output_dir)))
+                    text = f"[{title}]({filename})"
+                else:
+                    text = await self.render_block(block, 0, number)
+                
+                if index:
+                    out.write("\n" if block_type in LIST_TYPES and previous_type in LIST_TYPES else "\n\n")
+                out.write(text)
+                out.flush()
+                previous_type = block_type
+            
+            if blocks:
+                out.write("\n")
+            if subpages:
+                await asyncio.gather(*subpages)
+        except BaseException:
+            # Leave no child page export or prefetch running, or failed without being awaited
+            prefetched = list(self._children.values())
+            self._children.clear()
+            await _cancel_all(subpages + prefetched)
+            raise
+        return len(blocks)
+    
+    async def _export_to_file(self, page_id: str, path: Path, output_dir: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            count = await self.export_page(page_id, f, output_dir)
+        logger.info(f"Exported {count} blocks to {path}")
+
+
+async def export_main(argv: List[str]):
+    """Command-line entry point for `md2notion export`"""
+    from md2notion_cli import create_notion_client, extract_page_id_from_url, get_token_from_env
+    
+    parser = argparse.ArgumentParser(
+        prog="md2notion export",
+        description="Export a Notion page to Markdown"
+    )
+    parser.add_argument('page_id', help='Notion page ID or URL')
+    parser.add_argument('--output', '-o', help='Output Markdown file (defaults to stdout)')
+    parser.add_argument('--recursive', '-r', action='store_true',
+                        help='Also export child pages into files next to the output file')
+    parser.add_argument('--token', help='Notion API token (or set NOTION_TOKEN env var)')
+    parser.add_argument('--concurrency', type=int, default=3,
+                        help='Maximum concurrent Notion requests (default: 3)')
+    args = parser.parse_args(argv)
+    
+    try:
+        token = args.token or get_token_from_env()
+        page_id = extract_page_id_from_url(args.page_id)
+    except ValueError as e:
+        logger.error(f"Configuration error: {str(e)}")
+        sys.exit(1)
+    
+    exporter = NotionExporter(create_notion_client(token), max_concurrency=args.concurrency)
+    
+    if args.output:
+        output_path = Path(args.output)
+        output_dir = output_path.parent if args.recursive else None
+        with open(output_path, "w", encoding="utf-8") as f:
+            count = await exporter.export_page(page_id, f, output_dir)
+        logger.info(f"Exported {count} blocks to {output_path} using {exporter.requests} requests")
+    else:
+        if args.recursive:
+            parser.error("--recursive requires --output")
+        count = await exporter.export_page(page_id, sys.stdout)
+        logger.info(f"Exported {count} blocks using {exporter.requests} requests")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Source line -> Notion block ID maps
+
+With --line-map, every converted block carries the range of source lines it
+came from, and after the upload the ID Notion returned for each block is
+written next to the Markdown file. An edit to lines 400-420 can then be
+applied to exactly the blocks that cover those lines, without fetching or
+diffing the page.
+
+Top-level blocks cover their nested blocks' lines. Nested blocks that are
+sent inline with their parent come back without IDs, so only blocks that
+were appended on their own (top-level blocks and deeper levels appended as
+follow-ups) are in the map.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SIDECAR_SUFFIX = ".md2notion-map.json"
+
+
+def _position(entry: Dict[str, Any]) -> tuple:
+    # Source order, with a block before the nested blocks inside its range
+    return entry["lines"][0], -entry["lines"][1]
+
+
+def sidecar_path(markdown_file: str) -> Path:
+    """Where the line map of a Markdown file is kept"""
+    path = Path(markdown_file)
+    return path.with_name(path.name + SIDECAR_SUFFIX)
+
+
+class LineMap:
+    """Block IDs by source line range, for one uploaded document"""
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.page_id: Optional[str] = None
+        self.url: Optional[str] = None
+        self.entries: List[Dict[str, Any]] = []
+    
+    @classmethod
+    def load(cls, path: Path) -> "LineMap":
+        line_map = cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        line_map.page_id = data.get("page_id")
+        line_map.url = data.get("url")
+        line_map.entries = data.get("blocks", [])
+        return line_map
+    
+    def add(self, lines: List[int], block_id: str, parent_id: str, kind: str = "block"):
+        self.entries.append({"lines": list(lines), "id": block_id, "parent_id": parent_id, "kind": kind})
+    
+    def blocks_for(self, first: int, last: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Entries whose lines overlap first..last, outermost blocks first"""
+        last = first if last is None else last
+        return sorted((entry for entry in self.entries if entry["lines"][0] <= last and entry["lines"][1] >= first),
+                      key=_position)
+    
+    def save(self):
+        """Write the map atomically, ordered by source position"""
+        self.entries.sort(key=_position)
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"page_id": self.page_id, "url": self.url, "blocks": self.entries}, f, indent=2)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Structured, non-blocking logging for md2notion servers
+
+configure_logging() puts a QueueHandler on the root logger, so a log call on
+a request thread or the event loop only builds the record and puts it on a
+queue; a QueueListener thread formats it as one JSON object per line and
+writes it out. Each record carries the correlation ID of the request it was
+logged for, which follows the request into background loop tasks through
+contextvars. Routine high-volume events can be sampled, while warnings and
+errors are always kept.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+import uuid
+from typing import Dict, Optional
+
+# Routine events logged per request or per batch, the ones worth sampling
+HIGH_VOLUME_EVENTS = ("http_request", "upload_batch", "table_rows")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("md2notion_request_id", default=None)
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+def new_request_id() -> str:
+    """A short random correlation ID"""
+    return uuid.uuid4().hex[:16]
+
+
+def set_request_id(request_id: Optional[str] = None) -> str:
+    """Set the correlation ID for the current thread or task and return it"""
+    request_id = request_id or new_request_id()
+    request_id_var.set(request_id)
+    return request_id
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current correlation ID"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of records per event; warnings and above always pass"""
+    
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, "event", None), 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with extra= fields as top-level keys"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Queue records with their message resolved but their fields intact"""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock handler copies the record and flattens it into a formatted
+        # string; the listener's JsonFormatter needs the fields, and this is
+        # the root's only handler, so just resolve in place what should not
+        # cross threads: message arguments and the traceback object
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(level: str = "INFO", json_format: bool = True, stream=None,
+                      sample_rate: float = 1.0,
+                      sample_rates: Optional[Dict[str, float]] = None) -> logging.handlers.QueueListener:
+    """Route root logging through a queue to a background writer thread
+    
+    sample_rate applies to HIGH_VOLUME_EVENTS; sample_rates sets rates for
+    individual events. Returns the started listener, which is stopped (and
+    the queue flushed) by shutdown_logging() or at exit.
+    """
+    global _listener
+    shutdown_logging()
+    rates = {event: sample_rate for event in HIGH_VOLUME_EVENTS}
+    rates.update(sample_rates or {})
+    
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if json_format else
+                        logging.Formatter('%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s'))
+    listener = logging.handlers.QueueListener(queue.SimpleQueue(), output, respect_handler_level=True)
+    
+    handler = _QueueHandler(listener.queue)
+    handler.addFilter(SamplingFilter(rates))
+    handler.addFilter(RequestIdFilter())
+    
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    
+    listener.start()
+    _listener = listener
+    return listener
+
+
+@atexit.register
+def shutdown_logging():
+    """Write out queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        listener, _listener = _listener, None
+        listener.stop()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Prometheus metrics for md2notion
+
+A small, dependency-free implementation of counters, gauges and histograms
+with labels, rendered in the Prometheus text exposition format. Updates take
+a lock per metric, so they are safe from request threads and event loops
+alike and cost about a microsecond.
+"""
+
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Seconds; from a fast API call up to a large document upload
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Notion object IDs in request paths, so endpoints stay low-cardinality labels
+OBJECT_ID_PATTERN = re.compile(r'[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}')
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+    
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+    
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set"""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+    
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, per label set"""
+    
+    kind = "gauge"
+    
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+    
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+    
+    def replace(self, values: Dict[Tuple[str, ...], float]):
+        """Swap in a complete set of label values, e.g. from a periodic snapshot"""
+        with self._lock:
+            self._values = dict(values)
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set"""
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values: Dict[Tuple[str, ...], list] = {}
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+    
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def count(self, **labels) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[2] if state else 0
+    
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render(registry: Optional[List[_Metric]] = None) -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in registry if registry is not None else REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def endpoint_label(path: str) -> str:
+    """Request path with object IDs replaced, e.g. blocks/{id}/children"""
+    return OBJECT_ID_PATTERN.sub("{id}", path.split("?", 1)[0]).strip("/")
+
+
+# Notion API traffic (md2notion_throttle)
+NOTION_REQUESTS = Counter("md2notion_notion_requests_total", "Notion API calls by method, endpoint and status",
+                          ["method", "endpoint", "status"])
+NOTION_REQUEST_SECONDS = Histogram("md2notion_notion_request_seconds", "Notion API call latency",
+                                   ["method", "endpoint"])
+NOTION_RETRIES = Counter("md2notion_notion_retries_total", "Notion API calls retried after a 429 response")
+NOTION_THROTTLED = Counter("md2notion_notion_throttled_total", "Notion API 429 responses")
+
+# Conversion and upload (md2notion_cli, md2notion_service)
+CONVERSION_SECONDS = Histogram("md2notion_conversion_seconds", "Markdown to block conversion time")
+BLOCKS_UPLOADED = Counter("md2notion_blocks_uploaded_total", "Blocks sent to Notion, including nested children")
+BYTES_UPLOADED = Counter("md2notion_uploaded_bytes_total",
+                         "JSON bytes of block payloads successfully appended to Notion")
+CACHE_REQUESTS = Counter("md2notion_cache_requests_total", "Lookups in md2notion caches by result",
+                         ["cache", "result"])
+
+# Web app
+HTTP_REQUEST_SECONDS = Histogram("md2notion_http_request_seconds", "Web request latency",
+                                 ["endpoint", "status"])
+ACTIVE_JOBS = Gauge("md2notion_active_jobs", "Jobs currently running in the web app")
+QUEUED_JOBS = Gauge("md2notion_queued_jobs", "Jobs waiting per tenant", ["tenant"])
+CONCURRENCY_WINDOW = Gauge("md2notion_concurrency_window", "Adaptive Notion request window per tenant", ["tenant"])
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache lookup; the hit rate is hits / all lookups"""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Markdown parser backends
+
+MarkdownConverter's built-in parser ("regex") handles the Markdown subset
+this tool grew up with. The backends here parse with a CommonMark parser
+instead and reduce its tokens to a short list of block nodes, which
+MarkdownConverter turns into Notion blocks with the same block builders and
+inline (style, link, equation) parsing as its own parser:
+
+    {"type": "heading", "level": 2, "text": "...", "lines": (0, 0)}
+    {"type": "paragraph", "text": "...", "lines": (2, 4)}
+    {"type": "list_item", "ordered": False, "text": "...", "children": [...], "lines": ...}
+    {"type": "quote", "text": "...", "children": [...], "lines": ...}
+    {"type": "code", "language": "python", "text": "...", "lines": ...}
+    {"type": "table", "header": ["..."], "rows": [["..."]], "lines": ...}
+    {"type": "divider", "lines": ...}
+
+Text stays inline Markdown source. Lines are 0-based, inclusive offsets into
+the parsed text, or None when the backend does not know them. Backends are
+chunkable when converting a document in pieces cut before unindented lines
+after blank lines (outside fences) gives the blocks of the whole. Block
+equations ($$...$$, \\[...\\]) are split off before a backend sees the text.
+
+The parsers are optional and imported when a backend is first used:
+pip install md2notion[markdown-it] or md2notion[mistune].
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _container(kind: str, children: List[Dict[str, Any]], lines: Optional[Tuple[int, int]]) -> Dict[str, Any]:
+    """A list item or quote node: its first paragraph is its text, the rest its children"""
+    text = ""
+    if children and children[0]["type"] == "paragraph":
+        text = children[0]["text"]
+        children = children[1:]
+    return {"type": kind, "text": text, "children": children, "lines": lines}
+
+
+class MarkdownItBackend:
+    """CommonMark with GFM tables and strikethrough, parsed by markdown-it-py"""
+    
+    name = "markdown-it"
+    tracks_lines = True
+    chunkable = True
+    
+    def __init__(self):
+        try:
+            from markdown_it import MarkdownIt
+        except ImportError:
+            raise ImportError("markdown-it-py package not found. Please install it with: pip install markdown-it-py")
+        self._md = MarkdownIt("commonmark").enable(["table", "strikethrough"])
+    
+    def parse(self, text: str) -> List[Dict[str, Any]]:
+        nodes, _ = self._nodes(self._md.parse(text), 0, None, text.split("\n"))
+        return nodes
+    
+    @staticmethod
+    def _lines(token, source: List[str]) -> Optional[Tuple[int, int]]:
+        if not token.map:
+            return None
+        # List item and quote maps run on over trailing blank lines, which
+        # would make ranges depend on where the text was cut into chunks
+        start, end = token.map[0], token.map[1] - 1
+        while end > start and end < len(source) and not source[end].strip():
+            end -= 1
+        return start, end
+    
+    def _nodes(self, tokens: list, i: int, close: Optional[str],
+               source: List[str]) -> Tuple[List[Dict[str, Any]], int]:
+        """Nodes from tokens[i] up to the token of type close; returns them and the index after it"""
+        nodes = []
+        while i < len(tokens):
+            token = tokens[i]
+            kind = token.type
+            if kind == close:
+                return nodes, i + 1
+            lines = self._lines(token, source)
+            
+            if kind == "heading_open":
+                nodes.append({"type": "heading", "level": int(token.tag[1:]), "text": tokens[i + 1].content,
+                              "lines": lines})
+                i += 3
+            elif kind == "paragraph_open":
+                nodes.append({"type": "paragraph", "text": tokens[i + 1].content, "lines": lines})
+                i += 3
+            elif kind in ("bullet_list_open", "ordered_list_open"):
+                items, i = self._nodes(tokens, i + 1, kind[:-len("open")] + "close", source)
+                for item in items:
+                    item["ordered"] = kind == "ordered_list_open"
+                nodes.extend(items)
+            elif kind == "list_item_open":
+                children, i = self._nodes(tokens, i + 1, "list_item_close", source)
+                nodes.append(_container("list_item", children, lines))
+            elif kind == "blockquote_open":
+                children, i = self._nodes(tokens, i + 1, "blockquote_close", source)
+                nodes.append(_container("quote", children, lines))
+            elif kind in ("fence", "code_block"):
+                language = token.info.split()[0] if token.info.strip() else ""
+                nodes.append({"type": "code", "language": language, "text": token.content.rstrip("\n"),
+                              "lines": lines})
+                i += 1
+            elif kind == "table_open":
+                rows = []
+                i += 1
+                while tokens[i].type != "table_close":
+                    if tokens[i].type == "tr_open":
+                        rows.append([])
+                    elif tokens[i].type == "inline":
+                        rows[-1].append(tokens[i].content)
+                    i += 1
+                nodes.append({"type": "table", "header": rows[0], "rows": rows[1:], "lines": lines})
+                i += 1
+            elif kind == "hr":
+                nodes.append({"type": "divider", "lines": lines})
+                i += 1
+            elif kind == "html_block":
+                nodes.append({"type": "paragraph", "text": token.content, "lines": lines})
+                i += 1
+            else:
+                i += 1
+        return nodes, i
+
+
+class MistuneBackend:
+    """CommonMark with GFM tables and strikethrough, parsed by mistune 3 (no source lines)"""
+    
+    name = "mistune"
+    tracks_lines = False
+    # Quotes and lists parse differently depending on what follows them,
+    # even past a blank line, so documents are not converted in chunks
+    chunkable = False
+    
+    def __init__(self):
+        try:
+            import mistune
+            from mistune.plugins.formatting import strikethrough
+            from mistune.plugins.table import table
+        except ImportError:
+            raise ImportError("mistune package not found. Please install it with: pip install mistune")
+        
+        class SourceInline(mistune.InlineParser):
+            """Leaves inline text as Markdown source, for MarkdownConverter to parse"""
+            
+            def __call__(self, text, env):
+                return [{"type": "text", "raw": text}]
+        
+        self._md = mistune.Markdown(renderer=None, inline=SourceInline(), plugins=[table, strikethrough])
+    
+    def parse(self, text: str) -> List[Dict[str, Any]]:
+        tokens, _ = self._md.parse(text)
+        return self._nodes(tokens)
+    
+    @staticmethod
+    def _text(token: Dict[str, Any]) -> str:
+        """Inline Markdown source of a token, kept whole by SourceInline"""
+        return "".join(child["raw"] for child in token["children"])
+    
+    def _nodes(self, tokens: List[Dict[str, Any]], ordered: bool = False) -> List[Dict[str, Any]]:
+        nodes = []
+        for token in tokens:
+            kind = token["type"]
+            if kind == "heading":
+                nodes.append({"type": "heading", "level": token["attrs"]["level"], "text": self._text(token),
+                              "lines": None})
+            elif kind in ("paragraph", "block_text"):
+                nodes.append({"type": "paragraph", "text": self._text(token), "lines": None})
+            elif kind == "block_html":
+                nodes.append({"type": "paragraph", "text": token["raw"].rstrip("\n"), "lines": None})
+            elif kind == "list":
+                nodes.extend(self._nodes(token["children"], token["attrs"]["ordered"]))
+            elif kind == "list_item":
+                item = _container("list_item", self._nodes(token["children"]), None)
+                item["ordered"] = ordered
+                nodes.append(item)
+            elif kind == "block_quote":
+                nodes.append(_container("quote", self._nodes(token["children"]), None))
+            elif kind == "block_code":
+                info = (token.get("attrs") or {}).get("info") or ""
+                nodes.append({"type": "code", "language": info.split()[0] if info.strip() else "",
+                              "text": token["raw"].rstrip("\n"), "lines": None})
+            elif kind == "table":
+                rows = []
+                for part in token["children"]:
+                    part_rows = [part] if part["type"] == "table_head" else part["children"]
+                    # GFM keeps \| escaped in cell source; the cell text is a literal pipe
+                    rows.extend([self._text(cell).replace("\\|", "|") for cell in row["children"]] for row in part_rows)
+                nodes.append({"type": "table", "header": rows[0], "rows": rows[1:], "lines": None})
+            elif kind == "thematic_break":
+                nodes.append({"type": "divider", "lines": None})
+        return nodes
+
+
+# Parser backends by name, besides the built-in "regex" parser
+PARSERS = {
+    MarkdownItBackend.name: MarkdownItBackend,
+    MistuneBackend.name: MistuneBackend,
+}
+
+_backends: Dict[str, Any] = {}
+
+
+def get_parser(name: str):
+    """The shared backend instance for a parser name"""
+    if name not in _backends:
+        if name not in PARSERS:
+            raise ValueError(f"Unknown Markdown parser: {name} (choose from regex, {', '.join(PARSERS)})")
+        _backends[name] = PARSERS[name]()
+    return _backends[name]
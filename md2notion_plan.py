@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Offline upload plans
+
+--plan converts documents and runs them through the same upload code as a
+real run, against a client that records each request instead of sending it.
+The report gives, per file and in total, the blocks uploaded, the requests
+(and how many of them are follow-ups for nested children and table rows),
+the payload bytes and how long the requests take at a requests-per-second
+budget, and lists the blocks and requests Notion would reject.
+"""
+
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional
+
+from md2notion_cli import dumps_json
+from md2notion_core import (
+    MAX_EQUATION_LENGTH,
+    MAX_REQUEST_BYTES,
+    MAX_RICH_TEXT_ITEMS,
+    MAX_RICH_TEXT_LENGTH,
+    MAX_URL_LENGTH,
+)
+
+# Parent of the planned pages; never sent anywhere
+PLAN_PARENT_ID = "0" * 32
+
+# Database rows are paced by the converter's rate limiter; planning
+# accounts for the rate instead of waiting for it
+PLAN_RATE = 1e9
+
+
+def _count_blocks(payloads: Iterable[Dict[str, Any]]) -> int:
+    total = 0
+    for payload in payloads:
+        total += 1
+        content = payload.get(payload.get("type"))
+        if isinstance(content, dict):
+            total += _count_blocks(content.get("children", []))
+    return total
+
+
+def _preview(payload: Dict[str, Any], length: int = 40) -> str:
+    content = payload.get(payload.get("type"))
+    items = content.get("rich_text", []) if isinstance(content, dict) else []
+    text = "".join((item.get("text") or {}).get("content", "") for item in items)
+    if not text and isinstance(content, dict):
+        text = content.get("expression", "")
+    text = " ".join(text.split())
+    return text if len(text) <= length else text[:length - 1] + "…"
+
+
+def rich_text_violations(items: List[Dict[str, Any]]) -> List[str]:
+    """Ways a rich text array exceeds Notion's limits"""
+    problems = []
+    if len(items) > MAX_RICH_TEXT_ITEMS:
+        problems.append(f"{len(items)} rich text items (limit {MAX_RICH_TEXT_ITEMS})")
+    for item in items:
+        text = item.get("text") or {}
+        if len(text.get("content", "")) > MAX_RICH_TEXT_LENGTH:
+            problems.append(f"text of {len(text['content'])} characters (limit {MAX_RICH_TEXT_LENGTH})")
+        url = (text.get("link") or {}).get("url", "")
+        if len(url) > MAX_URL_LENGTH:
+            problems.append(f"link URL of {len(url)} characters (limit {MAX_URL_LENGTH})")
+        expression = (item.get("equation") or {}).get("expression", "")
+        if len(expression) > MAX_EQUATION_LENGTH:
+            problems.append(f"equation of {len(expression)} characters (limit {MAX_EQUATION_LENGTH})")
+    return problems
+
+
+def block_violations(payload: Dict[str, Any]) -> List[str]:
+    """Ways a block payload (not its children) exceeds Notion's limits"""
+    content = payload.get(payload.get("type"))
+    if not isinstance(content, dict):
+        return []
+    problems = rich_text_violations(content.get("rich_text", []))
+    for cell in content.get("cells", []):
+        problems.extend(rich_text_violations(cell))
+    if payload.get("type") == "equation" and len(content.get("expression", "")) > MAX_EQUATION_LENGTH:
+        problems.append(f"equation of {len(content['expression'])} characters (limit {MAX_EQUATION_LENGTH})")
+    return problems
+
+
+class RecordingClient:
+    """Stands in for the Notion client: records requests and answers with made-up IDs"""
+    
+    def __init__(self):
+        self.requests: List[Dict[str, Any]] = []
+        self.violations: List[str] = []
+        self._next_id = 0
+        self._pages = {PLAN_PARENT_ID}
+        self.pages = SimpleNamespace(create=self._create_page, retrieve=self._retrieve_page)
+        self.databases = SimpleNamespace(create=self._create_database)
+        self.blocks = SimpleNamespace(children=SimpleNamespace(append=self._append))
+    
+    def _new_id(self) -> str:
+        self._next_id += 1
+        return f"{self._next_id:032x}"
+    
+    def _record(self, endpoint: str, body: Dict[str, Any], follow_up: bool = False, blocks: int = 0) -> int:
+        size = len(dumps_json(body))
+        self.requests.append({"endpoint": endpoint, "bytes": size, "follow_up": follow_up, "blocks": blocks})
+        number = len(self.requests)
+        if size > MAX_REQUEST_BYTES:
+            self.violations.append(f"request {number} ({endpoint}) has a body of {size / 1024:.0f} KB "
+                                   f"(limit {MAX_REQUEST_BYTES // 1024} KB)")
+        return number
+    
+    def _check_blocks(self, number: int, payloads: Iterable[Dict[str, Any]], path: str = ""):
+        for position, payload in enumerate(payloads, start=1):
+            where = f"{path}{position}"
+            for problem in block_violations(payload):
+                self.violations.append(f"request {number}, block {where} ({payload.get('type')}): "
+                                       f"{problem}: \"{_preview(payload)}\"")
+            content = payload.get(payload.get("type"))
+            if isinstance(content, dict) and content.get("children"):
+                self._check_blocks(number, content["children"], f"{where}.")
+    
+    async def _append(self, block_id: str, children: list, after: Optional[str] = None):
+        body = {"children": children, **({"after": after} if after else {})}
+        number = self._record("blocks.children.append", body, follow_up=block_id not in self._pages,
+                              blocks=_count_blocks(children))
+        self._check_blocks(number, children)
+        return {"results": [{"id": self._new_id()} for _ in children]}
+    
+    async def _create_page(self, parent: Dict[str, Any], properties: Dict[str, Any]):
+        row = "database_id" in parent
+        number = self._record("pages.create", {"parent": parent, "properties": properties}, follow_up=row)
+        for name, value in properties.items():
+            for problem in rich_text_violations(value.get("title", value.get("rich_text", [])) or []):
+                self.violations.append(f"request {number}, property {name}: {problem}")
+        page_id = self._new_id()
+        if not row:
+            self._pages.add(page_id)
+        return {"id": page_id, "url": f"https://www.notion.so/{page_id}"}
+    
+    async def _retrieve_page(self, page_id: str):
+        self._record("pages.retrieve", {})
+        return {"id": page_id, "url": f"https://www.notion.so/{page_id}"}
+    
+    async def _create_database(self, parent: Dict[str, Any], **body):
+        self._record("databases.create", {"parent": parent, **body})
+        return {"id": self._new_id()}
+    
+    async def search(self, **body):
+        self._record("search", body)
+        return {"results": [], "has_more": False, "next_cursor": None}
+
+
+def _summarize(name: str, requests: List[Dict[str, Any]], violations: List[str],
+               requests_per_second: float) -> Dict[str, Any]:
+    return {
+        "file": name,
+        "blocks": sum(request["blocks"] for request in requests),
+        "requests": len(requests),
+        "follow_ups": sum(1 for request in requests if request["follow_up"]),
+        "bytes": sum(request["bytes"] for request in requests),
+        "seconds": len(requests) / requests_per_second,
+        "violations": violations,
+    }
+
+
+async def plan_uploads(converter, paths: List[Path], requests_per_second: float,
+                       title: Optional[str] = None) -> Dict[str, Any]:
+    """Upload each file as a new page with a recording client and summarize the requests
+    
+    The converter is taken over for planning: its client is replaced and
+    its row rate lifted. Returns {"files": [...], "total": {...}} with one
+    summary per file; requests made once for all files (the title index
+    sweep of link_pages) only count towards the total.
+    """
+    client = RecordingClient()
+    converter.notion = client
+    converter.requests_per_second = PLAN_RATE
+    
+    await converter.warm_page_titles()
+    files = []
+    for path in paths:
+        start, seen = len(client.requests), len(client.violations)
+        await converter.upload_file_to_notion(str(path), PLAN_PARENT_ID, title)
+        files.append(_summarize(str(path), client.requests[start:], client.violations[seen:], requests_per_second))
+    
+    return {"files": files, "total": _summarize("Total", client.requests, client.violations, requests_per_second)}
+
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+    return f"{seconds // 60}m {seconds % 60}s"
+
+
+def format_plan(plan: Dict[str, Any], requests_per_second: float) -> str:
+    """Human-readable plan table, followed by any limit violations"""
+    width = max([len(entry["file"]) for entry in plan["files"]] + [len("File")])
+    lines = [f"{'File':<{width}}  {'Blocks':>8}  {'Requests':>8}  {'Follow-ups':>10}  {'Bytes':>10}  {'Time':>8}"]
+    for entry in plan["files"] + [plan["total"]]:
+        lines.append(f"{entry['file']:<{width}}  {entry['blocks']:>8}  {entry['requests']:>8}  "
+                     f"{entry['follow_ups']:>10}  {_format_bytes(entry['bytes']):>10}  "
+                     f"{_format_duration(entry['seconds']):>8}")
+    lines.append(f"\nTime is for the requests at {requests_per_second:g} requests/s.")
+    
+    if plan["total"]["violations"]:
+        lines.append(f"\n⚠️  {len(plan['total']['violations'])} problem(s) Notion would reject:")
+        for entry in plan["files"]:
+            lines.extend(f"  {entry['file']}: {problem}" for problem in entry["violations"])
+    else:
+        lines.append("No blocks exceed Notion's limits.")
+    return "\n".join(lines)
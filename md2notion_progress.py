@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Live progress for CLI uploads
+
+UploadProgress follows one upload: how much of the source has been
+converted, the batches sent and (estimated) remaining, the current blocks/s
+and requests/s, time spent waiting on the token's throttle, and an ETA. On
+a terminal it redraws one status line a few times a second; otherwise it
+logs a progress line every few seconds. finish() returns the same numbers
+as a dict for a final machine-readable report.
+"""
+
+import asyncio
+import logging
+import math
+import sys
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Status line redraws on a terminal, and log lines otherwise, this often
+TTY_INTERVAL = 0.5
+LOG_INTERVAL = 10.0
+# Current rates are measured over this many seconds
+RATE_WINDOW = 5.0
+
+
+def count_blocks(block: Dict[str, Any]) -> int:
+    """Blocks an upload sends for a converted block: itself, nested blocks and overflow rows"""
+    content = block.get(block.get("type"))
+    count = 1 + len(block.get("_pending_rows", ()))
+    if isinstance(content, dict):
+        count += sum(count_blocks(child) for child in content.get("children", []))
+    return count
+
+
+def _format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "?"
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+    return f"{seconds // 60}m {seconds % 60}s"
+
+
+class UploadProgress:
+    """Conversion and upload progress of one CLI run"""
+    
+    def __init__(self, total_bytes: int, controller=None, stream=None, tty: Optional[bool] = None,
+                 copies: int = 1, clock: Callable[[], float] = time.monotonic):
+        """Follow an upload of a source of total_bytes bytes
+        
+        controller is the token's AdaptiveConcurrency, whose request and wait
+        counters are reported. copies is the number of pages the document is
+        uploaded to.
+        """
+        self.total_bytes = total_bytes
+        self.controller = controller
+        self.stream = stream or sys.stderr
+        self.tty = (hasattr(self.stream, "isatty") and self.stream.isatty()) if tty is None else tty
+        self.copies = copies
+        self.clock = clock
+        self.bytes_converted = 0
+        self.blocks_converted = 0
+        self.blocks_sent = 0
+        self.batches_sent = 0
+        self._started: Optional[float] = None
+        self._base = self._controller_totals()
+        self._samples = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._width = 0
+        self._summary: Optional[Dict[str, Any]] = None
+    
+    def _controller_totals(self) -> Dict[str, float]:
+        if self.controller is None:
+            return {"requests": 0, "throttled": 0, "wait_seconds": 0.0}
+        stats = self.controller.stats()
+        return {key: stats[key] for key in ("requests", "throttled", "wait_seconds")}
+    
+    def start(self, display: bool = True):
+        """Start the clock and, with display inside an event loop, the periodic status"""
+        self._started = self.clock()
+        self._base = self._controller_totals()
+        self._samples.append((self._started, 0, 0))
+        if not display:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._task = asyncio.ensure_future(self._refresh())
+    
+    def converted(self, size: int, blocks: int):
+        """Record converted source bytes and the blocks they became"""
+        self.bytes_converted += size
+        self.blocks_converted += blocks
+    
+    def track_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        """Count source bytes as a streamed conversion reads lines"""
+        for line in lines:
+            self.bytes_converted += len(line.encode("utf-8")) + 1
+            yield line
+    
+    def track_blocks(self, blocks: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Count blocks as a streamed conversion yields them"""
+        for block in blocks:
+            self.blocks_converted += count_blocks(block)
+            yield block
+    
+    def sent(self, blocks: int):
+        """Record one append request and the blocks in it"""
+        self.blocks_sent += blocks
+        self.batches_sent += 1
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Current numbers; rates are over the last RATE_WINDOW seconds"""
+        now = self.clock()
+        totals = self._controller_totals()
+        requests = totals["requests"] - self._base["requests"]
+        
+        self._samples.append((now, self.blocks_sent, requests))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= RATE_WINDOW:
+            self._samples.popleft()
+        then, blocks_then, requests_then = self._samples[0]
+        span = now - then
+        blocks_rate = (self.blocks_sent - blocks_then) / span if span > 0 else 0.0
+        requests_rate = (requests - requests_then) / span if span > 0 else 0.0
+        
+        converted = min(self.bytes_converted, self.total_bytes) if self.total_bytes else self.bytes_converted
+        fraction = converted / self.total_bytes if self.total_bytes else 1.0
+        blocks_remaining = None
+        batches_remaining = None
+        eta = None
+        if fraction > 0:
+            expected = self.blocks_converted / fraction * self.copies
+            blocks_remaining = max(0, int(round(expected)) - self.blocks_sent)
+            if self.batches_sent:
+                batches_remaining = math.ceil(blocks_remaining / (self.blocks_sent / self.batches_sent))
+            if blocks_remaining == 0:
+                eta = 0.0
+            elif blocks_rate > 0:
+                eta = blocks_remaining / blocks_rate
+        
+        return {
+            "elapsed_seconds": round(now - self._started, 3),
+            "bytes_total": self.total_bytes,
+            "bytes_converted": converted,
+            "blocks_converted": self.blocks_converted,
+            "blocks_uploaded": self.blocks_sent,
+            "batches_sent": self.batches_sent,
+            "batches_remaining": batches_remaining,
+            "requests": requests,
+            "throttled": totals["throttled"] - self._base["throttled"],
+            "throttle_wait_seconds": round(totals["wait_seconds"] - self._base["wait_seconds"], 3),
+            "blocks_per_second": round(blocks_rate, 1),
+            "requests_per_second": round(requests_rate, 2),
+            "eta_seconds": None if eta is None else round(eta, 1),
+        }
+    
+    def render(self, snapshot: Dict[str, Any]) -> str:
+        """One-line status for a snapshot"""
+        total = snapshot["bytes_total"]
+        percent = 100.0 * snapshot["bytes_converted"] / total if total else 100.0
+        remaining = snapshot["batches_remaining"]
+        return (
+            f"Converted {percent:3.0f}% ({snapshot['bytes_converted'] / 1e6:.1f}/{total / 1e6:.1f} MB) | "
+            f"batches {snapshot['batches_sent']} sent, {'?' if remaining is None else f'~{remaining}'} left | "
+            f"{snapshot['blocks_per_second']:.0f} blocks/s, {snapshot['requests_per_second']:.1f} req/s | "
+            f"throttled {snapshot['throttled']} ({snapshot['throttle_wait_seconds']:.1f}s waiting) | "
+            f"ETA {_format_duration(snapshot['eta_seconds'])}"
+        )
+    
+    def show(self):
+        """Draw the status line, or log it when not on a terminal"""
+        snapshot = self.snapshot()
+        line = self.render(snapshot)
+        if self.tty:
+            self.stream.write("\r" + line.ljust(self._width))
+            self.stream.flush()
+            self._width = len(line)
+        else:
+            logger.info(line, extra={"event": "upload_progress", **snapshot})
+    
+    async def _refresh(self):
+        interval = TTY_INTERVAL if self.tty else LOG_INTERVAL
+        while True:
+            await asyncio.sleep(interval)
+            self.show()
+    
+    def finish(self) -> Dict[str, Any]:
+        """Stop the display and return the final numbers, averaged over the whole run
+        
+        Later calls return the same numbers.
+        """
+        if self._summary is not None:
+            return self._summary
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.tty and self._width:
+            self.stream.write("\n")
+            self.stream.flush()
+        summary = self.snapshot()
+        elapsed = summary["elapsed_seconds"]
+        summary["blocks_per_second"] = round(summary["blocks_uploaded"] / elapsed, 1) if elapsed > 0 else 0.0
+        summary["requests_per_second"] = round(summary["requests"] / elapsed, 2) if elapsed > 0 else 0.0
+        summary["eta_seconds"] = 0.0
+        summary["batches_remaining"] = 0
+        self._summary = summary
+        return summary
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Publish Markdown files as entries of a Notion database
+
+Each file becomes a page in the database. Its YAML front matter (the block
+between --- lines at the top) is mapped to the database properties with the
+same names, converted to each property's type, and the rest of the file is
+the page body. The database schema is fetched once and cached, and files
+publish concurrently: page creations are held to a request rate, and every
+request shares the token's adaptive concurrency window.
+"""
+
+import argparse
+import asyncio
+import datetime
+import logging
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from md2notion_cache import normalize_title, schema_cache
+from md2notion_core import (
+    BUILTIN_PARSER,
+    CHECKBOX_VALUES,
+    MAX_RICH_TEXT_LENGTH,
+    extract_page_id_from_url,
+    normalize_page_id,
+)
+from md2notion_parsers import PARSERS
+from md2notion_throttle import token_key
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+MARKDOWN_SUFFIXES = {".md", ".markdown"}
+
+# --- at the very top, up to a closing --- (or ...) line
+FRONT_MATTER_PATTERN = re.compile(r'\A---[ \t]*\r?\n(.*?)^(?:---|\.\.\.)[ \t]*(?:\r?\n|\Z)', re.DOTALL | re.MULTILINE)
+
+
+def _parse_scalar(text: str) -> Any:
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "'\"":
+        return text[1:-1]
+    if text.lower() in ("true", "false"):
+        return text.lower() == "true"
+    if text in ("", "~", "null"):
+        return None
+    for number_type in (int, float):
+        try:
+            return number_type(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _parse_simple_yaml(text: str) -> Dict[str, Any]:
+    """Flat key: value front matter with inline or dash lists, without PyYAML"""
+    meta: Dict[str, Any] = {}
+    key = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if stripped == "-" or stripped.startswith("- "):
+            if key is None:
+                raise ValueError(f"List item without a key in front matter: {line}")
+            if not isinstance(meta[key], list):
+                meta[key] = []
+            meta[key].append(_parse_scalar(stripped[1:]))
+            continue
+        name, separator, value = stripped.partition(":")
+        if not separator:
+            raise ValueError(f"Unsupported front matter line (install PyYAML for full YAML): {line}")
+        key = name.strip()
+        value = value.strip()
+        if value.startswith("[") and value.endswith("]"):
+            meta[key] = [_parse_scalar(item) for item in value[1:-1].split(",") if item.strip()]
+        else:
+            meta[key] = _parse_scalar(value)
+    return meta
+
+
+def split_front_matter(content: str) -> Tuple[Dict[str, Any], str]:
+    """Front matter fields and the Markdown body after them
+    
+    Uses PyYAML when it is installed; otherwise flat key: value pairs and
+    lists are understood. Content without front matter is returned whole.
+    """
+    match = FRONT_MATTER_PATTERN.match(content)
+    if not match:
+        return {}, content
+    if yaml is not None:
+        meta = yaml.safe_load(match.group(1)) or {}
+    else:
+        meta = _parse_simple_yaml(match.group(1))
+    if not isinstance(meta, dict):
+        raise ValueError("Front matter must be a mapping of field names to values")
+    return meta, content[match.end():]
+
+
+def iter_markdown_files(paths: Iterable[str]) -> List[Path]:
+    """Markdown files named directly or found under directories, in sorted order"""
+    files = []
+    for name in paths:
+        path = Path(name)
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*")
+                                if p.is_file() and p.suffix.lower() in MARKDOWN_SUFFIXES
+                                and not any(part.startswith(".") for part in p.relative_to(path).parts)))
+        else:
+            files.append(path)
+    return files
+
+
+def _as_list(value: Any) -> list:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return [value]
+
+
+def _date_string(value: Any) -> str:
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value).strip().replace(" ", "T")
+
+
+async def database_schema(notion, token: str, database_id: str) -> Dict[str, str]:
+    """Property name -> type of a database, fetched once per cache TTL"""
+    key = (token_key(token), normalize_page_id(database_id))
+    schema = schema_cache.get(key)
+    if schema is None:
+        database = await notion.databases.retrieve(database_id=database_id)
+        properties = database.get("properties")
+        if not properties and database.get("data_sources"):
+            # Newer API versions keep the properties on the database's data source
+            source = await notion.data_sources.retrieve(data_source_id=database["data_sources"][0]["id"])
+            properties = source.get("properties")
+        schema = {name: prop["type"] for name, prop in (properties or {}).items()}
+        schema_cache.set(key, schema)
+        logger.info(f"Fetched schema of database {database_id}: {len(schema)} properties")
+    return schema
+
+
+class UserDirectory:
+    """Workspace users by ID, email and name, listed once on first use"""
+    
+    def __init__(self, notion):
+        self.notion = notion
+        self._ids: Optional[Dict[str, str]] = None
+        self._lock = None
+    
+    async def load(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._ids is not None:
+                return
+            ids = {}
+            cursor = None
+            while True:
+                response = await self.notion.users.list(**({"start_cursor": cursor} if cursor else {}))
+                for user in response.get("results", []):
+                    ids[normalize_page_id(user["id"])] = user["id"]
+                    for name in (user.get("name"), (user.get("person") or {}).get("email")):
+                        if name:
+                            ids.setdefault(normalize_title(name), user["id"])
+                cursor = response.get("next_cursor")
+                if not response.get("has_more") or not cursor:
+                    break
+            self._ids = ids
+    
+    def get(self, value: str) -> Optional[str]:
+        value = str(value)
+        return self._ids.get(normalize_page_id(value)) or self._ids.get(normalize_title(value))
+
+
+class DatabasePublisher:
+    """Publish Markdown files as pages of one database"""
+    
+    def __init__(self, converter, database_id: str):
+        self.converter = converter
+        self.database_id = database_id
+        self.schema: Dict[str, str] = {}
+        self.users = UserDirectory(converter.notion)
+        self.failed: Dict[str, str] = {}
+        self._names: Dict[str, str] = {}
+        self._unknown_fields = set()
+    
+    async def prepare(self):
+        """Fetch (or reuse) the database schema"""
+        self.schema = await database_schema(self.converter.notion, self.converter.token, self.database_id)
+        self._names = {normalize_title(name): name for name in self.schema}
+        if "title" not in self.schema.values():
+            raise ValueError(f"Database {self.database_id} has no title property")
+    
+    def _property(self, name: str, value: Any) -> Optional[Dict[str, Any]]:
+        """Property payload of one front matter value, or None if it cannot be set"""
+        prop_type = self.schema[name]
+        rich_text = self.converter._create_rich_text
+        if prop_type in ("title", "rich_text"):
+            if isinstance(value, (list, tuple)):
+                value = ", ".join(str(item) for item in value)
+            text = "" if value is None else str(value)
+            return {prop_type: [rich_text(text[:MAX_RICH_TEXT_LENGTH])] if text else []}
+        if prop_type == "number":
+            return {"number": None if value in (None, "") else float(str(value).replace(",", ""))}
+        if prop_type == "checkbox":
+            checked = value if isinstance(value, bool) else CHECKBOX_VALUES.get(str(value).strip().lower())
+            if checked is None:
+                raise ValueError(f"'{value}' is not a checkbox value for {name}")
+            return {"checkbox": checked}
+        if prop_type in ("select", "status"):
+            return {prop_type: {"name": str(value)} if value not in (None, "") else None}
+        if prop_type == "multi_select":
+            return {"multi_select": [{"name": str(item)} for item in _as_list(value)]}
+        if prop_type == "date":
+            if isinstance(value, dict):
+                return {"date": {key: _date_string(item) for key, item in value.items() if item}}
+            return {"date": {"start": _date_string(value)} if value not in (None, "") else None}
+        if prop_type in ("url", "email", "phone_number"):
+            return {prop_type: str(value) if value not in (None, "") else None}
+        if prop_type == "people":
+            people = []
+            for person in _as_list(value):
+                user_id = self.users.get(person)
+                if user_id is None:
+                    raise ValueError(f"No workspace user matches '{person}' for {name}")
+                people.append({"object": "user", "id": user_id})
+            return {"people": people}
+        if prop_type == "relation":
+            return {"relation": [{"id": extract_page_id_from_url(str(item))} for item in _as_list(value)]}
+        return None
+    
+    async def properties(self, meta: Dict[str, Any], title: str) -> Dict[str, Any]:
+        """Database properties from front matter; a title field names the page"""
+        title_name = next(name for name, prop_type in self.schema.items() if prop_type == "title")
+        fields = {}
+        for field, value in meta.items():
+            name = self._names.get(normalize_title(str(field)))
+            if name is None and normalize_title(str(field)) == "title":
+                name = title_name
+            if name is None:
+                if field not in self._unknown_fields:
+                    self._unknown_fields.add(field)
+                    logger.warning(f"Front matter field '{field}' matches no property of database {self.database_id}")
+                continue
+            fields[name] = value
+        
+        if any(self.schema[name] == "people" for name in fields):
+            await self.users.load()
+        
+        properties = {title_name: self._property(title_name, title)}
+        for name, value in fields.items():
+            payload = self._property(name, value)
+            if payload is None:
+                logger.warning(f"Property {name} of type {self.schema[name]} cannot be set from front matter")
+                continue
+            properties[name] = payload
+        return properties
+    
+    async def publish_file(self, path: Path, limiter=None) -> str:
+        """Create the database page for one file and upload its body; returns the URL"""
+        with open(path, "r", encoding="utf-8") as f:
+            meta, body = split_front_matter(f.read())
+        properties = await self.properties(meta, path.stem)
+        blocks = self.converter._convert(body)
+        
+        if limiter is not None:
+            await limiter.acquire()
+        new_page = await self.converter.notion.pages.create(
+            parent={"database_id": self.database_id},
+            properties=properties
+        )
+        self.converter._remember_page(new_page)
+        await self.converter._upload_document(blocks, new_page["id"])
+        logger.info(f"Published {path} ({len(blocks)} blocks): {new_page.get('url')}")
+        return new_page.get("url")
+    
+    async def publish(self, paths: List[Path]) -> Dict[str, str]:
+        """Publish files concurrently; returns path -> URL for those that succeeded
+        
+        At most max_concurrency files are in flight, and pages are created at
+        most requests_per_second. A file that fails is logged and recorded in
+        failed; the others still publish.
+        """
+        from md2notion_cli import ImportProgress, RateLimiter
+        
+        await self.prepare()
+        await self.converter.warm_page_titles()
+        published: Dict[str, str] = {}
+        if not paths:
+            return published
+        
+        limiter = RateLimiter(self.converter.requests_per_second)
+        progress = ImportProgress(f"Database {self.database_id} pages", len(paths), log_every=1)
+        progress.start()
+        pending = iter(paths)
+        
+        async def worker():
+            for path in pending:
+                try:
+                    published[str(path)] = await self.publish_file(path, limiter)
+                except Exception as e:
+                    logger.error(f"Failed to publish {path}: {str(e)}")
+                    self.failed[str(path)] = str(e)
+                progress.advance()
+        
+        await asyncio.gather(*[worker() for _ in range(min(self.converter.max_concurrency, len(paths)))])
+        return published
+
+
+async def publish_main(argv: List[str]):
+    """Command-line entry point for `md2notion publish`"""
+    from md2notion_cli import MarkdownToNotionConverter, get_token_from_env
+    
+    parser = argparse.ArgumentParser(
+        prog="md2notion publish",
+        description="Publish Markdown files as pages of a Notion database, with front matter as properties"
+    )
+    parser.add_argument('paths', nargs='+', help='Markdown files or directories of them')
+    parser.add_argument('--database', required=True, help='Notion database ID or URL')
+    parser.add_argument('--token', help='Notion API token (or set NOTION_TOKEN env var)')
+    parser.add_argument('--concurrency', type=int, default=3,
+                        help='Files published at once (default: 3)')
+    parser.add_argument('--rps', type=float, default=3.0,
+                        help='Pages created per second (default: 3)')
+    parser.add_argument('--link-pages', action='store_true',
+                        help='Turn [[Page Title]] links into mentions of the pages with those titles')
+    parser.add_argument('--parser', choices=[BUILTIN_PARSER, *PARSERS], default=BUILTIN_PARSER,
+                        help='Markdown parser (default: regex)')
+    args = parser.parse_args(argv)
+    
+    try:
+        token = args.token or get_token_from_env()
+        database_id = extract_page_id_from_url(args.database)
+    except ValueError as e:
+        logger.error(f"Configuration error: {str(e)}")
+        sys.exit(1)
+    
+    files = iter_markdown_files(args.paths)
+    missing = [str(path) for path in files if not path.is_file()]
+    if missing:
+        logger.error(f"Markdown file not found: {', '.join(missing)}")
+        sys.exit(1)
+    
+    converter = MarkdownToNotionConverter(token, max_concurrency=args.concurrency,
+                                          requests_per_second=args.rps, link_pages=args.link_pages,
+                                          parser=args.parser)
+    publisher = DatabasePublisher(converter, database_id)
+    published = await publisher.publish(files)
+    
+    print(f"\n✅ Published {len(published)} of {len(files)} files to the database")
+    for path, url in published.items():
+        print(f"📄 {path}: {url}")
+    if publisher.failed:
+        sys.exit(1)
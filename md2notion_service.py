@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Shared upload service for long-running md2notion servers
+
+The web app handles each HTTP request on its own worker thread. Work that
+benefits from sharing state across requests runs on one BackgroundLoop
+instead of a fresh event loop per request. AppendCoalescer queues appends
+per page and merges snippets that arrive within a short window into one
+batched upload, so a bot appending many small messages to the same page
+costs one append instead of one page lookup and one append per message.
+FairScheduler shares the job slots between tenants (integration tokens) with
+deficit-weighted round robin, so one team's bulk upload cannot starve the
+others. ConversionPool runs the CPU-bound Markdown conversion in worker
+processes with size and time limits, so a large or pathological document
+cannot stall the shared loop.
+"""
+
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from md2notion_core import MarkdownConverter, iter_file_lines
+from md2notion_metrics import CONVERSION_SECONDS
+from md2notion_throttle import token_key
+
+logger = logging.getLogger(__name__)
+
+# Seconds an append waits for more snippets to the same page
+DEFAULT_COALESCE_WINDOW = 0.25
+
+# Job slots shared by all tenants, and the most one tenant may hold
+DEFAULT_MAX_ACTIVE_JOBS = 4
+DEFAULT_TENANT_ACTIVE_JOBS = 2
+
+# Conversion worker processes, and the limits for each document
+DEFAULT_CONVERSION_WORKERS = 2
+DEFAULT_MAX_DOCUMENT_BYTES = 10 * 1024 * 1024
+DEFAULT_CONVERSION_TIMEOUT = 30.0
+# Conversions tracked at once, each with a cancellation flag
+CONVERSION_SLOTS = 256
+# A worker still busy this long after its deadline is killed with its pool
+CONVERSION_KILL_GRACE = 5.0
+
+
+class BackgroundLoop:
+    """An event loop running in a daemon thread, shared by request handlers"""
+    
+    def __init__(self, name: str = "md2notion-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The loop, started on first use"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True).start()
+            return self._loop
+    
+    def submit(self, coro):
+        """Schedule a coroutine and return a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the loop and wait for its result"""
+        return self.submit(coro).result(timeout)
+    
+    def call(self, function: Callable, *args, timeout: Optional[float] = None):
+        """Call a function on the loop thread, e.g. to read state it owns"""
+        async def call():
+            return function(*args)
+        return self.run(call(), timeout)
+
+
+class DocumentTooLarge(ValueError):
+    """A document exceeds the conversion size limit"""
+
+
+class ConversionTimeout(TimeoutError):
+    """A conversion ran past its time budget or was cancelled"""
+
+
+# Cancellation flags shared with the conversion workers, one per slot, and
+# the process ID of the worker running each slot's job
+_cancel_flags = None
+_worker_pids = None
+
+
+def _init_conversion_worker(flags, pids):
+    global _cancel_flags, _worker_pids
+    _cancel_flags = flags
+    _worker_pids = pids
+
+
+def _convert_job(slot: int, source: str, is_path: bool, deadline: float) -> list:
+    _worker_pids[slot] = os.getpid()
+    # Streaming conversion yields between chunks, which is where the worker
+    # notices cancellation or a passed deadline
+    lines = iter_file_lines(source) if is_path else source.split("\n")
+    blocks = []
+    for block in MarkdownConverter().iter_blocks(lines):
+        if _cancel_flags[slot]:
+            raise ConversionTimeout("Conversion cancelled")
+        if time.time() > deadline:
+            raise ConversionTimeout("Conversion exceeded its time budget")
+        blocks.append(block)
+    return blocks
+
+
+class ConversionPool:
+    """Convert Markdown in a fixed set of worker processes
+    
+    Documents over max_bytes are refused before any work is done. Each job
+    has timeout seconds; when it runs out, or the caller is cancelled, the
+    caller gets ConversionTimeout right away and the worker stops at its
+    next chunk boundary. A worker stuck inside one chunk for longer than
+    CONVERSION_KILL_GRACE past its deadline is killed together with its
+    pool, which is replaced for later jobs.
+    """
+    
+    def __init__(self, workers: int = DEFAULT_CONVERSION_WORKERS, max_bytes: int = DEFAULT_MAX_DOCUMENT_BYTES,
+                 timeout: float = DEFAULT_CONVERSION_TIMEOUT):
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        # forkserver avoids forking the threads of a running server
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+        self._flags = self._context.Array("b", CONVERSION_SLOTS, lock=False)
+        self._pids = self._context.Array("i", CONVERSION_SLOTS, lock=False)
+        self._free_slots = list(range(CONVERSION_SLOTS))
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=self._context,
+                    initializer=_init_conversion_worker, initargs=(self._flags, self._pids)
+                )
+            return self._executor
+    
+    def _take_slot(self) -> int:
+        with self._lock:
+            if not self._free_slots:
+                raise RuntimeError("Too many conversions in flight")
+            slot = self._free_slots.pop()
+            self._flags[slot] = 0
+            self._pids[slot] = 0
+            return slot
+    
+    def _free_slot(self, slot: int):
+        with self._lock:
+            self._free_slots.append(slot)
+    
+    async def convert(self, markdown_content: Optional[str] = None, path: Optional[str] = None) -> list:
+        """Convert Markdown text, or the file at path, into blocks"""
+        size = os.path.getsize(path) if path is not None else len(markdown_content.encode("utf-8"))
+        if size > self.max_bytes:
+            raise DocumentTooLarge(f"Document is {size} bytes; the limit is {self.max_bytes}")
+        
+        executor = self._get_executor()
+        slot = self._take_slot()
+        source = path if path is not None else markdown_content
+        future = executor.submit(_convert_job, slot, source, path is not None, time.time() + self.timeout)
+        future.add_done_callback(lambda _: self._free_slot(slot))
+        try:
+            with CONVERSION_SECONDS.time():
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            self._flags[slot] = 1
+            if not future.cancel():
+                asyncio.get_running_loop().call_later(CONVERSION_KILL_GRACE, self._kill_if_stuck,
+                                                      executor, future, slot)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise ConversionTimeout(f"Conversion took longer than {self.timeout:g}s") from None
+    
+    def _kill_if_stuck(self, executor: ProcessPoolExecutor, future, slot: int):
+        if future.done():
+            return
+        logger.error("Conversion worker ignored its deadline; restarting the conversion pool")
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        # The executor cannot stop a running task; the job's worker reported
+        # its process ID, and losing it breaks (and so ends) the whole pool
+        pid = self._pids[slot]
+        if pid:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _PageQueue:
+    """Pending appends to one page, drained by a single task
+    
+    Each item is (converter, conversion, result): conversion resolves to the
+    snippet's blocks, or to None when its conversion failed.
+    """
+    
+    def __init__(self):
+        self.items: List[Tuple[Any, asyncio.Future, asyncio.Future]] = []
+        self.task: Optional[asyncio.Task] = None
+
+
+class AppendCoalescer:
+    """Merge appends to the same page into ordered, batched uploads
+    
+    Snippets are converted by their caller, so conversion errors stay with
+    that caller. A snippet takes its place in the page's queue before it is
+    converted, and a page's appends are uploaded by one task at a time, in
+    submission order however long each conversion takes; everything that
+    arrives while a batch is collected or uploaded goes into the next batch. If a batched upload fails, every
+    caller in that batch gets the error, since Notion does not report
+    which blocks of a request were written. With a scheduler, each batch
+    upload is one job of the token's tenant; snippets waiting to be
+    batched hold no job slot.
+    """
+    
+    def __init__(self, window: float = DEFAULT_COALESCE_WINDOW, conversions: Optional[ConversionPool] = None,
+                 scheduler: Optional["FairScheduler"] = None):
+        self.window = window
+        # Without a pool, snippets are converted on the calling loop
+        self.conversions = conversions
+        self.scheduler = scheduler
+        self._pages: Dict[Tuple[str, str], _PageQueue] = {}
+        self.appends = 0
+        self.batches = 0
+    
+    async def append(self, converter, markdown_content: str, page_id: str) -> str:
+        """Append Markdown to a page; returns the page URL once it is uploaded"""
+        key = (token_key(converter.token), page_id)
+        queue = self._pages.get(key)
+        if queue is None:
+            queue = self._pages[key] = _PageQueue()
+        
+        # Reserve the snippet's place before converting, so the page gets
+        # snippets in submission order rather than conversion order
+        loop = asyncio.get_running_loop()
+        conversion, future = loop.create_future(), loop.create_future()
+        queue.items.append((converter, conversion, future))
+        self.appends += 1
+        if queue.task is None:
+            queue.task = asyncio.ensure_future(self._drain(key, queue))
+        try:
+            blocks = await self._convert(converter, markdown_content)
+        except BaseException:
+            conversion.set_result(None)
+            raise
+        conversion.set_result(blocks)
+        return await future
+    
+    async def _convert(self, converter, markdown_content: str) -> list:
+        if self.conversions is not None:
+            return await self.conversions.convert(markdown_content)
+        with CONVERSION_SECONDS.time():
+            return converter.convert_markdown_to_blocks(markdown_content)
+    
+    async def _drain(self, key: Tuple[str, str], queue: _PageQueue):
+        page_id = key[1]
+        batch = []
+        try:
+            while queue.items:
+                # Give snippets arriving right behind this one a chance to join
+                await asyncio.sleep(self.window)
+                batch, queue.items = queue.items, []
+                await asyncio.wait([conversion for _, conversion, _ in batch])
+                uploads = [(converter, conversion.result(), future) for converter, conversion, future in batch
+                           if conversion.result() is not None]
+                if uploads:
+                    await self._upload_batch(page_id, uploads)
+                batch = []
+        except BaseException as e:
+            # Including cancellation: the batch's callers would otherwise wait forever
+            self._fail(batch, e)
+            raise
+        finally:
+            queue.task = None
+            if queue.items:
+                # Snippets queued behind a failed drain get a new one
+                queue.task = asyncio.ensure_future(self._drain(key, queue))
+            else:
+                del self._pages[key]
+    
+    @staticmethod
+    def _fail(batch: list, error: BaseException):
+        for _, _, future in batch:
+            if future.done():
+                continue
+            if isinstance(error, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(error)
+    
+    async def _upload_batch(self, page_id: str, batch: list):
+        converter = batch[0][0]
+        blocks = [block for _, snippet_blocks, _ in batch for block in snippet_blocks]
+        self.batches += 1
+        
+        async def upload():
+            page_url = await converter._page_url(page_id)
+            await converter._upload_blocks(blocks, page_id)
+            return page_url
+        
+        try:
+            if self.scheduler is not None:
+                page_url = await self.scheduler.run(token_key(converter.token), upload)
+            else:
+                page_url = await upload()
+        except Exception as e:
+            converter._forget_page(page_id)
+            logger.error(f"Failed to append {len(batch)} snippet(s) to {page_id}: {str(e)}")
+            self._fail(batch, e)
+            return
+        
+        logger.info(f"Appended {len(batch)} snippet(s) ({len(blocks)} blocks) to {page_id}")
+        for _, _, future in batch:
+            if not future.done():
+                future.set_result(page_url)
+
+
+class _Job:
+    def __init__(self, factory: Callable[[], Awaitable], cost: float, future: asyncio.Future):
+        self.factory = factory
+        self.cost = cost
+        self.future = future
+        self.enqueued = time.monotonic()
+        # The submitter's context (request ID and the like) the job runs in
+        self.context = contextvars.copy_context()
+
+
+class _Tenant:
+    def __init__(self):
+        self.queue = deque()
+        self.running = 0
+        self.deficit = 0.0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.average_wait = 0.0
+
+
+class FairScheduler:
+    """Deficit-weighted round robin of jobs across tenants
+    
+    At most max_active jobs run at once, and at most tenant_active of them
+    for one tenant. Free slots go to tenants in turn; each turn adds quantum
+    to the tenant's deficit, and its next job starts once the deficit covers
+    the job's cost, so a tenant submitting large jobs gets fewer starts than
+    one submitting small ones. Request rates per token are budgeted by the
+    token's concurrency controller (see md2notion_throttle).
+    """
+    
+    def __init__(self, max_active: int = DEFAULT_MAX_ACTIVE_JOBS,
+                 tenant_active: int = DEFAULT_TENANT_ACTIVE_JOBS, quantum: float = 1.0):
+        self.max_active = max_active
+        self.tenant_active = tenant_active
+        self.quantum = quantum
+        self.active = 0
+        self._tenants: Dict[str, _Tenant] = {}
+        self._order = deque()
+    
+    async def run(self, tenant: str, factory: Callable[[], Awaitable], cost: float = 1.0):
+        """Queue a job for a tenant and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        state = self._tenants.setdefault(tenant, _Tenant())
+        state.queue.append(_Job(factory, max(cost, 0.0), future))
+        if tenant not in self._order:
+            self._order.append(tenant)
+        self._dispatch()
+        return await future
+    
+    def _dispatch(self):
+        while self.active < self.max_active:
+            picked = self._next_job()
+            if picked is None:
+                return
+            tenant, job = picked
+            state = self._tenants[tenant]
+            self.active += 1
+            state.running += 1
+            state.started += 1
+            wait = time.monotonic() - job.enqueued
+            state.average_wait = wait if state.started == 1 else 0.8 * state.average_wait + 0.2 * wait
+            # A task copies the current context, which here is the one of the
+            # job that just finished; start it from the submitter's instead
+            job.context.run(asyncio.ensure_future, self._run_job(tenant, job))
+    
+    def _next_job(self) -> Optional[Tuple[str, _Job]]:
+        if not any(self._tenants[name].running < self.tenant_active for name in self._order):
+            return None
+        while True:
+            name = self._order[0]
+            self._order.rotate(-1)
+            state = self._tenants[name]
+            if state.running >= self.tenant_active:
+                continue
+            state.deficit += self.quantum
+            if state.deficit < state.queue[0].cost:
+                continue
+            job = state.queue.popleft()
+            state.deficit -= job.cost
+            if not state.queue:
+                state.deficit = 0.0
+                self._order.remove(name)
+            return name, job
+    
+    async def _run_job(self, tenant: str, job: _Job):
+        state = self._tenants[tenant]
+        try:
+            result = await job.factory()
+        except Exception as e:
+            state.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            # A cancelled job (or factory) must not leave its caller waiting
+            if not job.future.done():
+                job.future.cancel()
+            state.completed += 1
+            state.running -= 1
+            self.active -= 1
+            self._dispatch()
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth, running jobs and wait times per tenant"""
+        now = time.monotonic()
+        return {
+            name: {
+                "queued": len(state.queue),
+                "running": state.running,
+                "completed": state.completed,
+                "failed": state.failed,
+                "oldest_wait": now - state.queue[0].enqueued if state.queue else 0.0,
+                "average_wait": state.average_wait,
+            }
+            for name, state in self._tenants.items()
+        }
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Adaptive request concurrency for md2notion
+
+Every Notion request made through a client from create_notion_client passes
+through an AdaptiveConcurrency controller shared by all clients using the
+same integration token in this process. The controller keeps an in-flight
+window that grows additively while requests succeed quickly and shrinks
+multiplicatively on 429 responses or when latency climbs well above the
+best latency seen, so several jobs sharing a token back off together
+instead of triggering throttling storms. Rate-limited requests wait for
+Retry-After (which pauses every request for the token) and are retried.
+
+A controller can also take a budget shared with other processes (see
+md2notion_worker.SharedRateBudget): every request then reserves a start
+time from it, and Retry-After pauses are passed on to it.
+"""
+
+import asyncio
+import email.utils
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from md2notion_metrics import (
+    NOTION_REQUESTS,
+    NOTION_REQUEST_SECONDS,
+    NOTION_RETRIES,
+    NOTION_THROTTLED,
+    endpoint_label,
+)
+
+logger = logging.getLogger(__name__)
+
+# Window limits; Notion averages about 3 requests/s per integration
+DEFAULT_INITIAL_WINDOW = 3
+DEFAULT_MIN_WINDOW = 1
+DEFAULT_MAX_WINDOW = 16
+DEFAULT_MAX_RETRIES = 5
+
+
+def _retry_after(error: Exception, attempt: int) -> float:
+    """Seconds to wait before retrying a rate-limited request"""
+    headers = getattr(error, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return min(2.0 ** attempt, 30.0)
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Check whether an API error is a 429 response"""
+    return getattr(error, "status", None) == 429 or getattr(error, "code", None) == "rate_limited"
+
+
+class AdaptiveConcurrency:
+    """AIMD window bounding in-flight requests, safe to share across event loops"""
+    
+    def __init__(self, initial: int = DEFAULT_INITIAL_WINDOW, minimum: int = DEFAULT_MIN_WINDOW,
+                 maximum: int = DEFAULT_MAX_WINDOW, decrease: float = 0.5,
+                 latency_factor: float = 3.0, max_retries: int = DEFAULT_MAX_RETRIES,
+                 requests_per_second: Optional[float] = None):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.max_retries = max_retries
+        # Optional steady rate budget on top of the window
+        self.requests_per_second = requests_per_second
+        # Optional rate budget shared with other processes: reserve() returns a
+        # wall-clock start time, block(seconds) pauses every process
+        self.budget = None
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        # Seconds requests spent waiting for a slot, the rate budget or Retry-After
+        self.wait_seconds = 0.0
+        self.latency: Optional[float] = None
+        self.base_latency: Optional[float] = None
+        self._window = float(initial)
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self._blocked_until = 0.0
+        self._next_start = 0.0
+        self._last_decrease = 0.0
+    
+    @property
+    def window(self) -> int:
+        """Current number of requests allowed in flight"""
+        return max(self.minimum, int(self._window))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the controller state for dashboards"""
+        with self._lock:
+            return {
+                "window": self.window,
+                "in_flight": self.in_flight,
+                "queued": len(self._waiters),
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "wait_seconds": self.wait_seconds,
+                "latency": self.latency,
+            }
+    
+    async def acquire(self):
+        """Wait for a slot in the window, the rate budget and any Retry-After pause"""
+        loop = asyncio.get_running_loop()
+        entered = time.monotonic()
+        with self._lock:
+            if self.in_flight < self.window and not self._waiters:
+                self.in_flight += 1
+                future = None
+            else:
+                future = loop.create_future()
+                self._waiters.append((loop, future))
+        
+        if future is not None:
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._lock:
+                    try:
+                        self._waiters.remove((loop, future))
+                    except ValueError:
+                        pass
+                # A slot granted just before cancellation must not leak
+                if future.done() and not future.cancelled():
+                    self.release()
+                raise
+        
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._blocked_until)
+            if self.requests_per_second:
+                # Reserve the next start time so concurrent callers space out
+                start = max(start, self._next_start)
+                self._next_start = start + 1.0 / self.requests_per_second
+        delay = start - now
+        try:
+            if self.budget is not None:
+                shared_start = await loop.run_in_executor(None, self.budget.reserve)
+                delay = max(delay, shared_start - time.time())
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self.release()
+            raise
+        with self._lock:
+            self.wait_seconds += time.monotonic() - entered
+    
+    def release(self):
+        """Return a slot and hand free slots to waiting requests"""
+        with self._lock:
+            self.in_flight -= 1
+            self._wake()
+    
+    def _wake(self):
+        # Called with the lock held
+        while self._waiters and self.in_flight < self.window:
+            loop, future = self._waiters.popleft()
+            if future.cancelled() or loop.is_closed():
+                continue
+            self.in_flight += 1
+            loop.call_soon_threadsafe(self._grant, future)
+    
+    def _grant(self, future: asyncio.Future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+    
+    def _decrease(self, now: float) -> bool:
+        # At most one decrease per round trip, so one burst of 429s halves once
+        if now - self._last_decrease < (self.latency or 1.0):
+            return False
+        self._window = max(float(self.minimum), self._window * self.decrease)
+        self._last_decrease = now
+        return True
+    
+    def record_success(self, latency: float):
+        """Additive increase, unless latency shows the API is struggling"""
+        with self._lock:
+            self.requests += 1
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            # The baseline drifts up slowly so one lucky response cannot pin it
+            self.base_latency = latency if self.base_latency is None else min(latency, self.base_latency * 1.05)
+            if self.latency > self.latency_factor * self.base_latency:
+                if self._decrease(time.monotonic()):
+                    logger.debug(f"Latency {self.latency:.2f}s; concurrency window now {self.window}")
+            else:
+                self._window = min(float(self.maximum), self._window + 1.0 / self._window)
+            self._wake()
+    
+    def record_throttled(self, retry_after: float):
+        """Multiplicative decrease and a pause for every request on the token"""
+        with self._lock:
+            self.requests += 1
+            self.throttled += 1
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+            if self._decrease(now):
+                logger.info(f"Rate limited; concurrency window now {self.window}, retrying in {retry_after:.1f}s")
+    
+    async def request(self, send, *args, **kwargs):
+        """Send one request within the window, retrying when rate limited"""
+        method = str(kwargs.get("method", args[1] if len(args) > 1 else ""))
+        endpoint = endpoint_label(str(kwargs.get("path", args[0] if args else "")))
+        attempt = 0
+        while True:
+            await self.acquire()
+            started = time.monotonic()
+            try:
+                result = await send(*args, **kwargs)
+            except Exception as e:
+                status = str(getattr(e, "status", None) or "error")
+                NOTION_REQUESTS.inc(method=method, endpoint=endpoint, status=status)
+                NOTION_REQUEST_SECONDS.observe(time.monotonic() - started, method=method, endpoint=endpoint)
+                if is_rate_limited(e):
+                    NOTION_THROTTLED.inc()
+                if not is_rate_limited(e) or attempt >= self.max_retries:
+                    raise
+                NOTION_RETRIES.inc()
+                retry_after = _retry_after(e, attempt)
+                self.record_throttled(retry_after)
+                if self.budget is not None:
+                    await asyncio.get_running_loop().run_in_executor(None, self.budget.block, retry_after)
+                attempt += 1
+                continue
+            else:
+                latency = time.monotonic() - started
+                NOTION_REQUESTS.inc(method=method, endpoint=endpoint, status="ok")
+                NOTION_REQUEST_SECONDS.observe(latency, method=method, endpoint=endpoint)
+                self.record_success(latency)
+                return result
+            finally:
+                self.release()
+
+
+_controllers: Dict[str, AdaptiveConcurrency] = {}
+_controllers_lock = threading.Lock()
+
+
+def token_key(token: str) -> str:
+    """Short fingerprint identifying a token without revealing it"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:12]
+
+
+def concurrency_controller(token: str) -> AdaptiveConcurrency:
+    """The controller shared by every client using token in this process"""
+    key = token_key(token)
+    with _controllers_lock:
+        if key not in _controllers:
+            _controllers[key] = AdaptiveConcurrency()
+        return _controllers[key]
+
+
+def concurrency_stats() -> Dict[str, Dict[str, Any]]:
+    """Controller state per token fingerprint, for dashboards"""
+    with _controllers_lock:
+        controllers = dict(_controllers)
+    return {key: controller.stats() for key, controller in controllers.items()}
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Watch mode for md2notion
+
+Keeps a directory of Markdown files mirrored to Notion. Each file is mapped
+to a child page of a parent page; the mapping and a hash of every uploaded
+top-level block are kept in a state file inside the watched directory. When a
+file changes, only the block ranges whose hashes changed are deleted and
+re-inserted, so editor autosaves cost a handful of requests instead of a full
+re-upload.
+"""
+
+import asyncio
+import difflib
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set
+
+from md2notion_core import MAX_BLOCKS_PER_REQUEST
+
+logger = logging.getLogger(__name__)
+
+STATE_FILENAME = ".md2notion-sync.json"
+MARKDOWN_SUFFIXES = {".md", ".markdown"}
+
+
+def block_hash(block: Dict[str, Any]) -> str:
+    """Stable hash of a converted block, including temporary fields"""
+    payload = json.dumps(block, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def is_markdown_file(path: Path) -> bool:
+    """Check whether a path looks like a Markdown document we should sync"""
+    return path.suffix.lower() in MARKDOWN_SUFFIXES and not path.name.startswith(".")
+
+
+class SyncState:
+    """Persistent file -> page mapping with per-block hashes and IDs"""
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+    
+    def save(self):
+        """Write the state atomically so a crash never leaves a torn file"""
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+
+class DirectorySync:
+    """Mirror Markdown files under a directory to child pages of a Notion page"""
+    
+    def __init__(self, converter, directory: str, parent_page_id: str):
+        self.converter = converter
+        self.directory = Path(directory).resolve()
+        self.parent_page_id = parent_page_id
+        self.state = SyncState(self.directory / STATE_FILENAME)
+    
+    def _key(self, path: Path) -> str:
+        return path.resolve().relative_to(self.directory).as_posix()
+    
+    async def sync_file(self, path: Path):
+        """Bring the page mapped to path up to date with the file"""
+        key = self._key(path)
+        entry = self.state.files.get(key)
+        
+        if not path.exists():
+            if entry:
+                logger.info(f"{key} was removed; its page {entry['page_id']} is left in place")
+                del self.state.files[key]
+                self.state.save()
+            return
+        
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        
+        content_hash = hashlib.sha1(content.encode("utf-8")).hexdigest()
+        if entry and entry.get("content_hash") == content_hash:
+            return
+        
+        blocks = self.converter.convert_markdown_to_blocks(content)
+        hashes = [block_hash(block) for block in blocks]
+        
+        if entry is None:
+            new_page = await self.converter.create_page(self.parent_page_id, path.stem)
+            block_ids = await self.converter._upload_blocks(blocks, new_page["id"])
+            entry = {"page_id": new_page["id"], "url": new_page.get("url")}
+            logger.info(f"Created page for {key}: {new_page.get('url')}")
+        else:
+            try:
+                block_ids = await self._patch_page(entry, blocks, hashes)
+            except Exception:
+                # Keep the blocks the page has now, as recorded by _patch_page
+                self.state.save()
+                raise
+        
+        entry.update({"content_hash": content_hash, "hashes": hashes, "block_ids": block_ids})
+        self.state.files[key] = entry
+        self.state.save()
+    
+    async def _patch_page(self, entry: Dict[str, Any], blocks: list, hashes: List[str]) -> List[str]:
+        """Replace only the changed block ranges of an already mapped page
+        
+        Notion can insert after a given block but not before the first one, so
+        blocks going to the top are inserted after the old first block, which
+        is deleted (and, if it is unchanged, re-created) afterwards. If a
+        request fails, entry is left describing the blocks the page has at
+        that point, so the next sync patches from there.
+        """
+        page_id = entry["page_id"]
+        old_hashes = entry.get("hashes", [])
+        old_ids = entry.get("block_ids", [])
+        
+        opcodes = difflib.SequenceMatcher(None, old_hashes, hashes, autojunk=False).get_opcodes()
+        if old_ids and opcodes[0][0] == "insert":
+            # The unchanged first block must follow the new ones: replace it with them and a copy of itself
+            _, _, _, _, j2 = opcodes[0]
+            _, _, i2, _, k2 = opcodes[1]
+            opcodes[:2] = [("replace", 0, 1, 0, j2 + 1)] + ([("equal", 1, i2, j2 + 1, k2)] if i2 > 1 else [])
+        
+        new_ids: List[str] = []
+        new_hashes: List[str] = []
+        requests = 0
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == "equal":
+                new_ids.extend(old_ids[i1:i2])
+                new_hashes.extend(hashes[j1:j2])
+                continue
+            
+            pending = dict(zip(old_ids[i1:i2], old_hashes[i1:i2]))
+            anchor = old_ids[i1] if not new_ids and i2 > i1 and j2 > j1 else None
+            try:
+                for block_id in old_ids[i1:i2]:
+                    if block_id != anchor:
+                        await self.converter.notion.blocks.delete(block_id=block_id)
+                        del pending[block_id]
+                        requests += 1
+                
+                if j2 > j1:
+                    after = new_ids[-1] if new_ids else anchor
+                    inserted = await self.converter._upload_blocks(blocks[j1:j2], page_id, after=after)
+                    new_ids.extend(inserted)
+                    new_hashes.extend(hashes[j1:j2])
+                    requests += -(-(j2 - j1) // MAX_BLOCKS_PER_REQUEST)
+                
+                if anchor is not None:
+                    await self.converter.notion.blocks.delete(block_id=anchor)
+                    del pending[anchor]
+                    requests += 1
+            except Exception:
+                # The anchor is still first; other undeleted blocks follow the new ones
+                first = [anchor] if anchor in pending else []
+                rest = [block_id for block_id in pending if block_id != anchor]
+                entry.update({
+                    "content_hash": None,
+                    "block_ids": first + new_ids + rest + old_ids[i2:],
+                    "hashes": [pending[b] for b in first] + new_hashes + [pending[b] for b in rest] + old_hashes[i2:],
+                })
+                raise
+        
+        logger.info(f"Patched page {page_id}: {requests} requests for {len(hashes)} blocks")
+        return new_ids
+    
+    def markdown_files(self) -> List[Path]:
+        """All Markdown files currently under the watched directory"""
+        return sorted(
+            path for path in self.directory.rglob("*")
+            if path.is_file() and is_markdown_file(path)
+        )
+    
+    async def sync_all(self):
+        """Sync every file, e.g. on start-up to catch edits made while stopped"""
+        for path in self.markdown_files():
+            await self._sync_logged(path)
+    
+    async def _sync_logged(self, path: Path):
+        try:
+            await self.sync_file(path)
+        except Exception as e:
+            # Keep watching; the next save of the file retries the sync
+            logger.error(f"Failed to sync {path}: {str(e)}")
+
+
+class PollingWatcher:
+    """Detect changed files by comparing mtimes and sizes at an interval"""
+    
+    def __init__(self, directory: Path, interval: float = 1.0):
+        self.directory = directory
+        self.interval = interval
+        self._snapshot = self._scan()
+    
+    def _scan(self) -> Dict[Path, tuple]:
+        snapshot = {}
+        for path in self.directory.rglob("*"):
+            if is_markdown_file(path):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+    
+    async def wait_events(self, timeout: Optional[float]) -> Set[Path]:
+        """Return changed paths, waiting at most timeout seconds (None: forever)"""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            snapshot = self._scan()
+            changed = {
+                path for path in set(snapshot) | set(self._snapshot)
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            if changed:
+                return changed
+            if deadline is None:
+                await asyncio.sleep(self.interval)
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return set()
+            await asyncio.sleep(min(self.interval, remaining))
+    
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Detect changed files through Linux inotify (requires inotify_simple)"""
+    
+    def __init__(self, directory: Path):
+        from inotify_simple import INotify, flags
+        
+        self.directory = directory
+        self._flags = flags
+        self._mask = (flags.CLOSE_WRITE | flags.MOVED_TO | flags.MOVED_FROM
+                      | flags.CREATE | flags.DELETE)
+        self._inotify = INotify()
+        self._dirs: Dict[int, Path] = {}
+        for path in [directory, *(p for p in directory.rglob("*") if p.is_dir())]:
+            self._add_watch(path)
+    
+    def _add_watch(self, path: Path):
+        wd = self._inotify.add_watch(str(path), self._mask)
+        self._dirs[wd] = path
+    
+    async def wait_events(self, timeout: Optional[float]) -> Set[Path]:
+        """Return changed paths, waiting at most timeout seconds (None: forever)"""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - loop.time())
+            timeout_ms = None if remaining is None else int(remaining * 1000)
+            events = await loop.run_in_executor(None, self._inotify.read, timeout_ms)
+            changed = self._changed_paths(events)
+            if changed or not events or (deadline is not None and loop.time() >= deadline):
+                return changed
+    
+    def _changed_paths(self, events) -> Set[Path]:
+        changed = set()
+        for event in events:
+            parent = self._dirs.get(event.wd)
+            if parent is None:
+                continue
+            path = parent / event.name
+            if event.mask & self._flags.ISDIR:
+                if event.mask & (self._flags.CREATE | self._flags.MOVED_TO):
+                    # Files may land in a new directory before its watch exists
+                    for sub in [path, *(p for p in path.rglob("*") if p.is_dir())]:
+                        self._add_watch(sub)
+                    changed.update(p for p in path.rglob("*") if p.is_file() and is_markdown_file(p))
+                continue
+            if is_markdown_file(path):
+                changed.add(path)
+        return changed
+    
+    def close(self):
+        self._inotify.close()
+
+
+def create_watcher(directory: Path, poll_interval: float = 1.0):
+    """Use inotify where available, otherwise fall back to polling"""
+    try:
+        watcher = InotifyWatcher(directory)
+        logger.info("Watching for changes with inotify")
+        return watcher
+    except (ImportError, OSError) as e:
+        logger.info(f"inotify unavailable ({e}); polling every {poll_interval}s")
+        return PollingWatcher(directory, poll_interval)
+
+
+async def next_changes(watcher, debounce: float) -> Set[Path]:
+    """Wait for a change, then keep collecting until debounce seconds pass quietly"""
+    changed = set()
+    while not changed:
+        changed = await watcher.wait_events(None)
+    while True:
+        more = await watcher.wait_events(debounce)
+        if not more:
+            return changed
+        changed |= more
+
+
+async def watch_directory(converter, directory: str, parent_page_id: str,
+                          debounce: float = 2.0, poll_interval: float = 1.0):
+    """Mirror a directory to Notion until cancelled"""
+    sync = DirectorySync(converter, directory, parent_page_id)
+    await converter.warm_page_titles()
+    await sync.sync_all()
+    
+    watcher = create_watcher(sync.directory, poll_interval)
+    try:
+        while True:
+            changed = await next_changes(watcher, debounce)
+            logger.info(f"Syncing {len(changed)} changed file(s)")
+            for path in sorted(changed):
+                await sync._sync_logged(path)
+    finally:
+        watcher.close()
@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Queue-backed upload workers
+
+`md2notion enqueue` adds upload jobs (file path, target page, options) to a
+SQLite queue file and `md2notion worker` processes, on any number of
+machines, claim and run them. A claimed job is leased to its worker, which
+heartbeats while it uploads; a worker that dies stops heartbeating, and its
+job goes back to the queue once the lease expires, until it has been tried
+max_attempts times. A job remembers the page it created, so a retry empties
+and refills that page instead of creating another. An attempt that stops
+while creating the page cannot tell whether Notion made it; the retry
+creates a new page and warns that the target may hold a duplicate.
+
+Workers sharing a token also share its request budget through the queue:
+each request reserves the next start time from a per-token schedule kept in
+the database, and Retry-After pauses reach every worker, so adding machines
+raises throughput until Notion's rate limit is reached, not beyond it.
+
+The queue file and the Markdown files must be reachable under the same
+paths on every machine, and the filesystem must support SQLite's file
+locking. Lease and rate budget times are wall-clock times, so the machines'
+clocks need to be in sync. Tokens are not stored in the queue; each worker
+brings its own.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from md2notion_core import BUILTIN_PARSER, extract_page_id_from_url
+from md2notion_parsers import PARSERS
+from md2notion_throttle import concurrency_controller, token_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_POLL_SECONDS = 2.0
+
+# A job's page_id while its page is being created
+CREATING_PAGE = "creating"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    target TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    page_id TEXT,
+    url TEXT,
+    error TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, id);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL,
+    jobs_done INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS rate_budgets (
+    token TEXT PRIMARY KEY,
+    next_start REAL NOT NULL,
+    blocked_until REAL NOT NULL
+);
+"""
+
+# Options a job may carry; everything else about an upload is the worker's
+JOB_OPTIONS = ("title", "tables_as_databases", "split_pages", "link_pages", "parser")
+
+
+class JobQueue:
+    """Upload jobs in a SQLite file, claimed under leases"""
+    
+    def __init__(self, path: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS, clock: Callable[[], float] = time.time):
+        self.path = str(path)
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._lock = threading.Lock()
+        # Workers call in from executor threads; the lock serializes them
+        self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock:
+            self._db.executescript(SCHEMA)
+            # Queues created before jobs remembered their page
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+            if "page_id" not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN page_id TEXT")
+    
+    def close(self):
+        self._db.close()
+    
+    @contextmanager
+    def _transaction(self):
+        """Write transaction, taking the database lock up front so claims cannot race"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+    
+    def enqueue(self, jobs: List[Dict[str, Any]]) -> List[int]:
+        """Add jobs ({"path", "target", "options"}) and return their IDs"""
+        now = self.clock()
+        ids = []
+        with self._transaction() as db:
+            for job in jobs:
+                cursor = db.execute("INSERT INTO jobs (path, target, options, updated) VALUES (?, ?, ?, ?)",
+                                    (job["path"], job["target"], json.dumps(job.get("options") or {}), now))
+                ids.append(cursor.lastrowid)
+        return ids
+    
+    def _expire_leases(self, db: sqlite3.Connection, now: float):
+        # Jobs of workers that stopped heartbeating go back to the queue, or
+        # fail once they have used up their attempts
+        cursor = db.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "error = CASE WHEN attempts >= ? THEN 'Lease expired after ' || attempts || ' attempt(s)' "
+            "ELSE error END, worker = NULL, lease_until = NULL, updated = ? "
+            "WHERE status = 'running' AND lease_until < ?",
+            (self.max_attempts, self.max_attempts, now, now)
+        )
+        if cursor.rowcount:
+            logger.warning(f"Re-queued {cursor.rowcount} job(s) whose lease expired", extra={"event": "lease_expired"})
+    
+    def _beat(self, db: sqlite3.Connection, worker_id: str, now: float, done: int = 0):
+        db.execute("INSERT INTO workers (id, heartbeat, jobs_done) VALUES (?, ?, ?) "
+                   "ON CONFLICT (id) DO UPDATE SET heartbeat = excluded.heartbeat, "
+                   "jobs_done = jobs_done + excluded.jobs_done", (worker_id, now, done))
+    
+    def claim(self, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        """Lease the oldest queued job to a worker, or return None when there is none"""
+        now = self.clock()
+        with self._transaction() as db:
+            self._expire_leases(db, now)
+            self._beat(db, worker_id, now)
+            row = db.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                       "updated = ? WHERE id = ?", (worker_id, now + lease_seconds, now, row["id"]))
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        job["attempts"] += 1
+        return job
+    
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """Extend a job's lease; False when the worker no longer holds it"""
+        now = self.clock()
+        with self._transaction() as db:
+            self._beat(db, worker_id, now)
+            cursor = db.execute("UPDATE jobs SET lease_until = ?, updated = ? "
+                                "WHERE id = ? AND worker = ? AND status = 'running'",
+                                (now + lease_seconds, now, job_id, worker_id))
+        return cursor.rowcount == 1
+    
+    def set_page(self, job_id: int, worker_id: str, page_id: str) -> bool:
+        """Record the page a job created, for later attempts to upload into; False when the lease is lost"""
+        with self._transaction() as db:
+            cursor = db.execute("UPDATE jobs SET page_id = ?, updated = ? "
+                                "WHERE id = ? AND worker = ? AND status = 'running'",
+                                (page_id, self.clock(), job_id, worker_id))
+        return cursor.rowcount == 1
+    
+    def complete(self, job_id: int, worker_id: str, url: str) -> bool:
+        """Mark a job done; False when its lease had already expired"""
+        now = self.clock()
+        with self._transaction() as db:
+            self._beat(db, worker_id, now, done=1)
+            cursor = db.execute("UPDATE jobs SET status = 'done', url = ?, error = NULL, lease_until = NULL, "
+                                "updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                                (url, now, job_id, worker_id))
+        return cursor.rowcount == 1
+    
+    def fail(self, job_id: int, worker_id: str, error: str) -> bool:
+        """Record a failed attempt: the job is queued again until max_attempts"""
+        now = self.clock()
+        with self._transaction() as db:
+            self._beat(db, worker_id, now)
+            cursor = db.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "error = ?, worker = NULL, lease_until = NULL, updated = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (self.max_attempts, error, now, job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+    
+    def release(self, job_id: int, worker_id: str):
+        """Give a job back untried, for a worker shutting down"""
+        with self._transaction() as db:
+            db.execute("UPDATE jobs SET status = 'queued', attempts = attempts - 1, worker = NULL, "
+                       "lease_until = NULL, updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                       (self.clock(), job_id, worker_id))
+    
+    def counts(self) -> Dict[str, int]:
+        """Jobs per status, and workers that heartbeat within the default lease"""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+            workers = self._db.execute("SELECT COUNT(*) FROM workers WHERE heartbeat >= ?",
+                                       (self.clock() - DEFAULT_LEASE_SECONDS,)).fetchone()[0]
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        counts.update({status: count for status, count in rows})
+        counts["workers"] = workers
+        return counts
+    
+    def failed_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute("SELECT id, path, target, error FROM jobs WHERE status = 'failed' "
+                                    "ORDER BY id").fetchall()
+        return [dict(row) for row in rows]
+
+
+class SharedRateBudget:
+    """A token's request schedule kept in the queue, shared by every worker using it"""
+    
+    def __init__(self, queue: JobQueue, key: str, requests_per_second: float):
+        self.queue = queue
+        self.key = key
+        self.interval = 1.0 / requests_per_second
+    
+    def _state(self, db: sqlite3.Connection) -> tuple:
+        row = db.execute("SELECT next_start, blocked_until FROM rate_budgets WHERE token = ?", (self.key,)).fetchone()
+        return (row["next_start"], row["blocked_until"]) if row else (0.0, 0.0)
+    
+    def reserve(self) -> float:
+        """Reserve the next request slot and return its wall-clock start time"""
+        with self.queue._transaction() as db:
+            next_start, blocked_until = self._state(db)
+            start = max(time.time(), next_start, blocked_until)
+            db.execute("INSERT OR REPLACE INTO rate_budgets (token, next_start, blocked_until) VALUES (?, ?, ?)",
+                       (self.key, start + self.interval, blocked_until))
+        return start
+    
+    def block(self, seconds: float):
+        """Pause every worker's requests for seconds, as asked by Retry-After"""
+        with self.queue._transaction() as db:
+            next_start, blocked_until = self._state(db)
+            db.execute("INSERT OR REPLACE INTO rate_budgets (token, next_start, blocked_until) VALUES (?, ?, ?)",
+                       (self.key, next_start, max(blocked_until, time.time() + seconds)))
+
+
+class Worker:
+    """Claim jobs from a queue and upload them until stopped (or the queue is done)"""
+    
+    def __init__(self, queue: JobQueue, token: str, worker_id: Optional[str] = None, concurrency: int = 1,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, requests_per_second: float = 3.0,
+                 poll_seconds: float = DEFAULT_POLL_SECONDS):
+        """concurrency is the number of jobs this worker runs at once; every
+        request of every worker on the token counts against one shared
+        requests_per_second budget.
+        """
+        self.queue = queue
+        self.token = token
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.requests_per_second = requests_per_second
+        self.poll_seconds = poll_seconds
+        self.completed = 0
+        self.failed = 0
+        # Converters by options, so a title index is built once per worker
+        self._converters: Dict[str, Any] = {}
+    
+    async def _call(self, method, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+    
+    def _converter(self, options: Dict[str, Any]):
+        from md2notion_cli import MarkdownToNotionConverter
+        
+        settings = {name: options.get(name) for name in JOB_OPTIONS if name != "title"}
+        key = json.dumps(settings, sort_keys=True)
+        if key not in self._converters:
+            self._converters[key] = MarkdownToNotionConverter(
+                self.token, tables_as_databases=bool(settings["tables_as_databases"]),
+                requests_per_second=self.requests_per_second, split_level=settings["split_pages"],
+                link_pages=bool(settings["link_pages"]), parser=settings["parser"] or BUILTIN_PARSER
+            )
+        return self._converters[key]
+    
+    async def _upload(self, job: Dict[str, Any]) -> str:
+        """Upload a job's file to its page, created by the first attempt
+        
+        The new page's ID is stored on the job before any content is sent; a
+        later attempt empties that page and uploads into it again, so a
+        failure halfway does not leave a partial duplicate behind. The job is
+        marked CREATING_PAGE while the page is created, so an attempt that
+        stopped in between is reported rather than silently duplicated.
+        """
+        converter = self._converter(job["options"])
+        page_id = job.get("page_id")
+        if page_id and page_id != CREATING_PAGE:
+            deleted = await converter.clear_page(page_id)
+            logger.info(f"Job {job['id']}: resuming into page {page_id}, removed {deleted} block(s) "
+                        f"left by the last attempt")
+        else:
+            title = job["options"].get("title") or Path(job["path"]).stem
+            if page_id == CREATING_PAGE:
+                logger.warning(f"Job {job['id']}: the last attempt stopped while creating its page; "
+                               f"{job['target']} may hold a duplicate '{title}' page")
+            await self._call(self.queue.set_page, job["id"], self.worker_id, CREATING_PAGE)
+            page_id = (await converter.create_page(job["target"], title))["id"]
+            if not await self._call(self.queue.set_page, job["id"], self.worker_id, page_id):
+                logger.warning(f"Job {job['id']}: lease lost before page {page_id} was recorded; "
+                               f"the next attempt will create another page")
+        return await converter.upload_file_to_page(job["path"], page_id)
+    
+    async def run_job(self, job: Dict[str, Any]):
+        """Upload one claimed job, heartbeating while it runs"""
+        logger.info(f"Job {job['id']}: uploading {job['path']} (attempt {job['attempts']})",
+                    extra={"event": "job_start"})
+        upload = asyncio.ensure_future(self._upload(job))
+        try:
+            while not upload.done():
+                await asyncio.wait({upload}, timeout=self.lease_seconds / 3)
+                if not upload.done() and not await self._call(self.queue.heartbeat, job["id"], self.worker_id,
+                                                              self.lease_seconds):
+                    logger.warning(f"Job {job['id']}: lease lost; another worker will retry it")
+                    upload.cancel()
+                    await asyncio.gather(upload, return_exceptions=True)
+                    return
+            url = upload.result()
+        except asyncio.CancelledError:
+            upload.cancel()
+            await asyncio.gather(upload, return_exceptions=True)
+            await self._call(self.queue.release, job["id"], self.worker_id)
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Job {job['id']}: failed to upload {job['path']}: {str(e)}", extra={"event": "job_failed"})
+            await self._call(self.queue.fail, job["id"], self.worker_id, str(e))
+            return
+        
+        self.completed += 1
+        if await self._call(self.queue.complete, job["id"], self.worker_id, url):
+            logger.info(f"Job {job['id']}: uploaded to {url}", extra={"event": "job_done"})
+        else:
+            logger.warning(f"Job {job['id']}: uploaded to {url} after its lease expired; it may be uploaded twice")
+    
+    async def _runner(self, exit_when_done: bool):
+        while True:
+            job = await self._call(self.queue.claim, self.worker_id, self.lease_seconds)
+            if job is not None:
+                await self.run_job(job)
+                continue
+            if exit_when_done:
+                counts = await self._call(self.queue.counts)
+                if not counts["queued"] and not counts["running"]:
+                    return
+            await asyncio.sleep(self.poll_seconds)
+    
+    async def run(self, exit_when_done: bool = False):
+        """Work until cancelled; with exit_when_done, until no job is queued or running"""
+        controller = concurrency_controller(self.token)
+        controller.budget = SharedRateBudget(self.queue, token_key(self.token), self.requests_per_second)
+        logger.info(f"Worker {self.worker_id} started on {self.queue.path}", extra={"event": "worker_start"})
+        try:
+            await asyncio.gather(*[self._runner(exit_when_done) for _ in range(self.concurrency)])
+        finally:
+            controller.budget = None
+        logger.info(f"Worker {self.worker_id} finished: {self.completed} uploaded, {self.failed} failed")
+
+
+def format_counts(counts: Dict[str, int]) -> str:
+    return (f"{counts['queued']} queued, {counts['running']} running, {counts['done']} done, "
+            f"{counts['failed']} failed; {counts['workers']} active worker(s)")
+
+
+def enqueue_main(argv: List[str]):
+    """Command-line entry point for `md2notion enqueue`"""
+    from md2notion_publish import iter_markdown_files
+    
+    parser = argparse.ArgumentParser(
+        prog="md2notion enqueue",
+        description="Add upload jobs for Markdown files to a worker queue"
+    )
+    parser.add_argument('queue', help='Queue file (SQLite), created if missing')
+    parser.add_argument('paths', nargs='+', help='Markdown files or directories of them')
+    parser.add_argument('--page_id', required=True, help='Notion page ID or URL to create the pages under')
+    parser.add_argument('--title', help='Title for the new page (defaults to the file name)')
+    parser.add_argument('--tables-as-databases', action='store_true',
+                        help='Import tables as inline Notion databases instead of table blocks')
+    parser.add_argument('--split-pages', type=int, choices=[1, 2], metavar='LEVEL',
+                        help='Put each section under an H1 (1) or H1/H2 (2) heading on its own child page')
+    parser.add_argument('--link-pages', action='store_true',
+                        help='Turn [[Page Title]] links into mentions of the pages with those titles')
+    parser.add_argument('--parser', choices=[BUILTIN_PARSER, *PARSERS], default=BUILTIN_PARSER,
+                        help='Markdown parser (default: regex)')
+    args = parser.parse_args(argv)
+    
+    try:
+        target = extract_page_id_from_url(args.page_id)
+    except ValueError as e:
+        logger.error(f"Invalid page ID or URL: {str(e)}")
+        sys.exit(1)
+    files = iter_markdown_files(args.paths)
+    missing = [str(path) for path in files if not path.is_file()]
+    if missing or not files:
+        logger.error(f"Markdown file not found: {', '.join(missing) or ', '.join(args.paths)}")
+        sys.exit(1)
+    
+    options = {"title": args.title, "tables_as_databases": args.tables_as_databases,
+               "split_pages": args.split_pages, "link_pages": args.link_pages, "parser": args.parser}
+    queue = JobQueue(args.queue)
+    # Workers elsewhere find the files under the same absolute paths
+    ids = queue.enqueue([{"path": str(Path(path).resolve()), "target": target, "options": options}
+                         for path in files])
+    print(f"✅ Queued {len(ids)} job(s) in {args.queue}: {format_counts(queue.counts())}")
+
+
+async def worker_main(argv: List[str]):
+    """Command-line entry point for `md2notion worker`"""
+    from md2notion_cli import get_token_from_env
+    
+    parser = argparse.ArgumentParser(
+        prog="md2notion worker",
+        description="Upload jobs from a queue shared with other workers, on this or other machines"
+    )
+    parser.add_argument('queue', help='Queue file (SQLite) filled by `md2notion enqueue`')
+    parser.add_argument('--token', help='Notion API token (or set NOTION_TOKEN env var)')
+    parser.add_argument('--concurrency', type=int, default=2,
+                        help='Jobs this worker uploads at once (default: 2)')
+    parser.add_argument('--rps', type=float, default=3.0,
+                        help='Requests per second for the token, shared by all its workers (default: 3)')
+    parser.add_argument('--lease', type=float, default=DEFAULT_LEASE_SECONDS,
+                        help=f'Seconds a job stays claimed without a heartbeat (default: {DEFAULT_LEASE_SECONDS:g})')
+    parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f'Tries per job before it fails (default: {DEFAULT_MAX_ATTEMPTS})')
+    parser.add_argument('--exit-when-done', action='store_true',
+                        help='Exit once no job is queued or running instead of waiting for more')
+    parser.add_argument('--status', action='store_true', help='Print the queue status and exit')
+    args = parser.parse_args(argv)
+    
+    queue = JobQueue(args.queue, max_attempts=args.max_attempts)
+    if args.status:
+        print(f"{args.queue}: {format_counts(queue.counts())}")
+        for job in queue.failed_jobs():
+            print(f"❌ job {job['id']} {job['path']} -> {job['target']}: {job['error']}")
+        return
+    
+    try:
+        token = args.token or get_token_from_env()
+    except ValueError as e:
+        logger.error(f"Configuration error: {str(e)}")
+        sys.exit(1)
+    
+    worker = Worker(queue, token, concurrency=args.concurrency, lease_seconds=args.lease,
+                    requests_per_second=args.rps)
+    await worker.run(exit_when_done=args.exit_when_done)
+    print(f"\n✅ Worker done: {worker.completed} uploaded, {worker.failed} failed attempts; "
+          f"queue: {format_counts(queue.counts())}")
@@ -25,7 +25,11 @@ setup(
     long_description=read_readme(),
     long_description_content_type="text/markdown",
     url="https://github.com/yourusername/md2notion",
-    py_modules=["md2notion_cli"],
+    py_modules=["md2notion_cli", "md2notion_core", "md2notion_watch", "md2notion_export",
+                "md2notion_throttle", "md2notion_service", "md2notion_metrics",
+                "md2notion_logging", "md2notion_cache", "md2notion_publish",
+                "md2notion_plan", "md2notion_linemap", "md2notion_progress",
+                "md2notion_parsers", "md2notion_worker"],
     classifiers=[
         "Development Status :: 4 - Beta",
         "Intended Audience :: Developers",
@@ -42,6 +46,13 @@ setup(
     ],
     python_requires=">=3.7",
     install_requires=read_requirements(),
+    extras_require={
+        "watch": ["inotify_simple"],
+        "fast": ["orjson"],
+        "yaml": ["pyyaml"],
+        "markdown-it": ["markdown-it-py>=3"],
+        "mistune": ["mistune>=3,<4"],
+    },
     entry_points={
         "console_scripts": [
             "md2notion=md2notion_cli:main",
@@ -9,6 +9,7 @@ import os
 import sys
 import webbrowser
 import time
+from md2notion_logging import configure_logging
 from web.app import app
 
 def main():
@@ -38,6 +39,10 @@ def main():
     print("🌐 Opening browser automatically...")
     print("=" * 50)
     
+    configure_logging(os.environ.get('LOG_LEVEL', 'INFO'),
+                      json_format=os.environ.get('LOG_FORMAT', 'json') == 'json',
+                      sample_rate=float(os.environ.get('LOG_SAMPLE_RATE', 1.0)))
+    
     # Start server in background thread
     import threading
     
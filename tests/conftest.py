@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Shared test fixtures: an in-memory stand-in for the async Notion client
+"""
+
+import asyncio
+import sys
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_cli import MarkdownToNotionConverter
+
+
+class FakeNotion:
+    """Records every request and keeps each page's children in order
+    
+    Pages get sequential "page-N" IDs and blocks "block-N" IDs. Appends honour
+    `after`, and blocks.delete removes the block from its parent. A parent ID,
+    page title or block ID listed in `failures` makes requests touching it
+    raise RuntimeError with the given message. Database, user and search
+    lookups answer from `schema`, `users_list` and `search_pages`.
+    """
+    
+    def __init__(self):
+        self.pages = SimpleNamespace(create=self._create_page, retrieve=self._retrieve_page)
+        self.blocks = SimpleNamespace(children=SimpleNamespace(append=self._append, list=self._list_children),
+                                      delete=self._delete)
+        self.databases = SimpleNamespace(retrieve=self._retrieve_database)
+        self.users = SimpleNamespace(list=self._list_users)
+        self.calls = Counter()
+        self.requests = []
+        self.created = []
+        self.appends = []
+        self.children = {}
+        self.text = {}
+        self.failures = {}
+        self.schema = {}
+        self.users_list = []
+        self.search_pages = []
+        self._pages = 0
+        self._blocks = 0
+    
+    def _fail(self, *keys):
+        for key in keys:
+            if key in self.failures:
+                raise RuntimeError(self.failures[key])
+    
+    def texts(self, parent_id):
+        """Text of each child of a page or block, in page order"""
+        return [self.text[block_id] for block_id in self.children.get(parent_id, [])]
+    
+    async def _create_page(self, parent, properties, **kwargs):
+        await asyncio.sleep(0)
+        self.calls["pages.create"] += 1
+        parent_id = parent.get("page_id") or parent.get("database_id")
+        title_property = next((value for value in properties.values() if "title" in value), {"title": []})
+        title = "".join(item["text"]["content"] for item in title_property["title"])
+        self._fail(parent_id, title)
+        self._pages += 1
+        page_id = f"page-{self._pages}"
+        self.requests.append(("pages.create", parent_id))
+        self.created.append({"id": page_id, "parent": parent, "title": title, "properties": properties})
+        return {"id": page_id, "url": f"https://notion.so/{page_id}",
+                "properties": {"title": {"type": "title", "title": [{"plain_text": title}]}}}
+    
+    async def _retrieve_page(self, page_id):
+        self.calls["pages.retrieve"] += 1
+        return {"id": page_id, "url": f"https://notion.so/{page_id}"}
+    
+    async def _append(self, block_id, children, after=None):
+        await asyncio.sleep(0)
+        self.calls["blocks.children.append"] += 1
+        self._fail(block_id)
+        self.requests.append(("append", block_id, after, len(children)))
+        self.appends.append((block_id, children, after))
+        siblings = self.children.setdefault(block_id, [])
+        position = siblings.index(after) + 1 if after else len(siblings)
+        ids = []
+        for child in children:
+            self._blocks += 1
+            ids.append(f"block-{self._blocks}")
+            rich_text = child[child["type"]].get("rich_text", [])
+            self.text[ids[-1]] = rich_text[0]["text"]["content"] if rich_text else child["type"]
+        siblings[position:position] = ids
+        return {"results": [{"id": new_id} for new_id in ids]}
+    
+    async def _list_children(self, block_id, page_size=100, start_cursor=None):
+        self.calls["blocks.children.list"] += 1
+        ids = self.children.get(block_id, [])
+        start = int(start_cursor or 0)
+        more = start + page_size < len(ids)
+        return {"results": [{"id": child_id} for child_id in ids[start:start + page_size]],
+                "has_more": more, "next_cursor": str(start + page_size) if more else None}
+    
+    async def _delete(self, block_id):
+        self.calls["blocks.delete"] += 1
+        self._fail(block_id)
+        self.requests.append(("delete", block_id))
+        for siblings in self.children.values():
+            if block_id in siblings:
+                siblings.remove(block_id)
+    
+    async def _retrieve_database(self, database_id):
+        self.calls["databases.retrieve"] += 1
+        return {"id": database_id, "properties": self.schema}
+    
+    async def _list_users(self, start_cursor=None):
+        self.calls["users.list"] += 1
+        return {"results": self.users_list, "has_more": False, "next_cursor": None}
+    
+    async def search(self, filter, sort, page_size, start_cursor=None):
+        """Pages of search_pages, a list of (id, title) newest first"""
+        self.calls["search"] += 1
+        start = int(start_cursor or 0)
+        results = [{"id": page_id, "properties": {"Name": {"type": "title", "title": [{"plain_text": title}]}}}
+                   for page_id, title in self.search_pages[start:start + page_size]]
+        more = start + page_size < len(self.search_pages)
+        return {"results": results, "has_more": more, "next_cursor": str(start + page_size) if more else None}
+
+
+@pytest.fixture
+def notion():
+    return FakeNotion()
+
+
+@pytest.fixture
+def converter(notion):
+    converter = MarkdownToNotionConverter("test-token")
+    converter.notion = notion
+    return converter
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Page metadata and title index tests (no network access needed)
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_cache import PageTitleIndex, TTLCache, page_cache
+from md2notion_cli import MarkdownToNotionConverter
+from md2notion_metrics import CACHE_REQUESTS
+
+
+def test_entries_expire_and_are_evicted_least_recently_used():
+    now = [0.0]
+    cache = TTLCache("test", ttl=10, maxsize=2, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    
+    now[0] = 10.0
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+
+def test_appends_reuse_cached_page_url(converter, notion):
+    page_cache.clear()
+    hits = CACHE_REQUESTS.value(cache="page", result="hit")
+    
+    async def run():
+        first = await converter.append_markdown_to_notion("one", "abcd")
+        # Same page, spelled differently, from another converter with the same token
+        other = MarkdownToNotionConverter("test-token")
+        other.notion = notion
+        second = await other.append_markdown_to_notion("two", "ABCD")
+        return first, second
+    
+    assert asyncio.run(run()) == ("https://notion.so/abcd", "https://notion.so/abcd")
+    assert notion.calls["pages.retrieve"] == 1
+    assert CACHE_REQUESTS.value(cache="page", result="hit") == hits + 1
+    
+    # Another token does not share the cached entry
+    other_token = MarkdownToNotionConverter("other-token")
+    other_token.notion = notion
+    asyncio.run(other_token.append_markdown_to_notion("three", "abcd"))
+    assert notion.calls["pages.retrieve"] == 2
+
+
+def test_created_pages_are_cached_and_failed_appends_forget_the_page(converter, notion):
+    page_cache.clear()
+    
+    assert asyncio.run(converter.upload_markdown_to_notion("hello", "parent", "New")) == "https://notion.so/page-1"
+    assert asyncio.run(converter.append_markdown_to_notion("more", "page-1")) == "https://notion.so/page-1"
+    assert notion.calls["pages.retrieve"] == 0
+    
+    notion.failures["page-1"] = "object_not_found"
+    with pytest.raises(RuntimeError):
+        asyncio.run(converter.append_markdown_to_notion("more", "page-1"))
+    notion.failures.clear()
+    asyncio.run(converter.append_markdown_to_notion("more", "page-1"))
+    assert notion.calls["pages.retrieve"] == 1
+
+
+def test_title_index_warms_with_paginated_search(notion):
+    notion.search_pages = [("p1", "Home"), ("p2", "Notes  Archive"), ("p3", "home"), ("p4", "Untitled")]
+    index = PageTitleIndex()
+    
+    assert asyncio.run(index.warm(notion, page_size=2)) == 2
+    assert index.warmed
+    assert index.get(" HOME ") == "p1"
+    assert index.get("notes archive") == "p2"
+    assert index.get("Missing") is None
+
+
+def test_converter_resolves_links_without_per_link_requests(notion):
+    page_cache.clear()
+    converter = MarkdownToNotionConverter("test-token", link_pages=True)
+    converter.notion = notion
+    notion.search_pages = [("p1", "Home"), ("p2", "Notes")]
+    markdown = "\n\n".join(f"See [[Home]] and [[Notes]] ({n})" for n in range(50))
+    
+    async def run():
+        await converter.upload_markdown_to_notion(markdown, "parent", "Fresh Page")
+        await converter.append_markdown_to_notion("Back to [[fresh page]]", "page-1")
+    
+    asyncio.run(run())
+    assert notion.calls["search"] == 1
+    mentions = [item["mention"]["page"]["id"] for _, children, _ in notion.appends for block in children
+                for item in block["paragraph"]["rich_text"] if item["type"] == "mention"]
+    assert mentions == ["p1", "p2"] * 50 + ["page-1"]
+    assert converter.page_titles.get("Fresh Page") == "page-1"
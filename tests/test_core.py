@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Conversion engine tests (no network access needed)
+"""
+
+import copy
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_core import (
+    MarkdownConverter,
+    convert_markdown_parallel,
+    extract_page_id_from_url,
+    iter_file_lines,
+    split_markdown_chunks,
+)
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_core_converts_without_token():
+    blocks = MarkdownConverter().convert_markdown_to_blocks("# Title\n\n- item")
+    assert [block["type"] for block in blocks] == ["heading_1", "bulleted_list_item"]
+
+
+def test_imports_do_not_load_notion_client():
+    code = (
+        "import sys, md2notion_cli\n"
+        "md2notion_cli.MarkdownToNotionConverter('token').convert_markdown_to_blocks('text')\n"
+        "print('notion_client' in sys.modules, 'httpx' in sys.modules)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False False"
+
+
+def test_core_import_does_not_load_the_process_pool():
+    code = (
+        "import sys, md2notion_core\n"
+        "md2notion_core.convert_markdown_parallel('# Title', workers=1)\n"
+        "print('concurrent.futures.process' in sys.modules)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+
+def corpus_document():
+    files = sorted((ROOT / "tests" / "test_files").glob("*.md"))
+    return "\n".join(path.read_text(encoding="utf-8") for path in files * 3)
+
+
+def test_blank_line_ends_paragraph():
+    blocks = MarkdownConverter().convert_markdown_to_blocks("one\ntwo\n\nthree")
+    texts = [block["paragraph"]["rich_text"][0]["text"]["content"] for block in blocks]
+    assert texts == ["one\ntwo", "three"]
+
+
+def test_cleaning_blocks_leaves_the_originals_intact():
+    converter = MarkdownConverter()
+    blocks = [{"type": "bulleted_list_item", "bulleted_list_item": {"rich_text": [], "children": [
+        {"type": "numbered_list_item", "numbered_list_item": {"rich_text": [], "children": []}},
+    ]}}]
+    snapshot = copy.deepcopy(blocks)
+    cleaned = converter._clean_blocks_recursively(blocks)
+    assert blocks == snapshot
+    assert "children" not in cleaned[0]["bulleted_list_item"]["children"][0]["numbered_list_item"]
+
+
+def test_headings_keep_document_order():
+    blocks = MarkdownConverter().convert_markdown_to_blocks("intro\n# Title\nbody")
+    assert [block["type"] for block in blocks] == ["paragraph", "heading_1", "paragraph"]
+
+
+def test_chunks_convert_like_whole_document():
+    document = corpus_document()
+    converter = MarkdownConverter()
+    expected = converter.convert_markdown_to_blocks(document)
+    
+    for target_size in (1, 200, 2000):
+        chunks = split_markdown_chunks(document, target_size)
+        assert "".join(chunks) == document
+        assert len(chunks) > 1
+        merged = [block for chunk in chunks for block in converter.convert_markdown_to_blocks(chunk)]
+        assert merged == expected
+
+
+def test_chunks_do_not_split_code_fences():
+    # Fences close only on a marker of their own kind and at least their length;
+    # markers inside block equations do not count
+    document = "```\n~~~\n\ncode\n```\n\n~~~~\n```\n\n~~~\ncode\n~~~~\n\n$$\n```\n$$\n\nafter"
+    assert split_markdown_chunks(document, 1) == [
+        "```\n~~~\n\ncode\n```\n\n", "~~~~\n```\n\n~~~\ncode\n~~~~\n\n$$\n```\n$$\n\n", "after"
+    ]
+
+
+def test_parallel_conversion_matches_serial():
+    document = corpus_document()
+    expected = MarkdownConverter().convert_markdown_to_blocks(document)
+    assert convert_markdown_parallel(document, workers=2, chunk_size=500) == expected
+
+
+def test_streamed_lines_convert_like_whole_document():
+    document = corpus_document() + "\n\nstray $$ marker\n\n$$\n\nx = 1\n$$\n\ntail"
+    converter = MarkdownConverter()
+    expected = converter.convert_markdown_to_blocks(document)
+    
+    for chunk_size in (1, 200, 2000):
+        assert list(converter.iter_blocks(document.split("\n"), chunk_size)) == expected
+
+
+def test_file_lines_are_decoded_like_text_mode(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_bytes("# Tïtle\r\n\r\n中文 text\nlast\n".encode("utf-8"))
+    assert list(iter_file_lines(path)) == path.read_text(encoding="utf-8").split("\n")
+    
+    empty = tmp_path / "empty.md"
+    empty.write_bytes(b"")
+    assert list(iter_file_lines(empty)) == [""]
+
+
+def test_page_ids_are_extracted_from_urls_and_uuids():
+    page_id = "22f97b0feb94808fbfa4c07162457633"
+    for url in [
+        f"https://www.notion.so/z123z123d/Survey-latent-reasoning-{page_id}?source=copy_link",
+        f"https://www.notion.so/My-Page-{page_id}",
+        page_id,
+        "22F97B0F-EB94-808F-BFA4-C07162457633",
+        f"https://www.notion.so/team/{page_id}?v=0123456789abcdef0123456789abcdef",
+    ]:
+        assert extract_page_id_from_url(url) == page_id
+    
+    with pytest.raises(ValueError):
+        extract_page_id_from_url("https://www.notion.so/no-id-here")
+    with pytest.raises(ValueError):
+        extract_page_id_from_url(page_id + "0")
+
+
+def test_links_and_page_mentions():
+    converter = MarkdownConverter()
+    converter.page_titles = {"Home Page": "page-1"}
+    rich_text = converter.parse_style("[**docs**](https://example.com/a_b), [[Home Page]], [[Missing]], "
+                                      "[rel](./other.md) `[x](y)`")
+    
+    assert rich_text[0]["text"] == {"content": "docs", "link": {"url": "https://example.com/a_b"}}
+    assert rich_text[0]["annotations"]["bold"]
+    assert rich_text[2] == {"type": "mention", "mention": {"type": "page", "page": {"id": "page-1"}}}
+    assert rich_text[4]["text"] == {"content": "[[Missing]]"}
+    assert rich_text[6]["text"] == {"content": "rel"}
+    assert rich_text[-1]["text"] == {"content": "[x](y)"} and rich_text[-1]["annotations"]["code"]
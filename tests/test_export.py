@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Notion to Markdown export tests (no network access needed)
+"""
+
+import asyncio
+import gc
+import io
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_core import MarkdownConverter
+from md2notion_export import NotionExporter, rich_text_to_markdown
+
+
+class FakeBlockTree:
+    """Serves converted blocks through a paginated blocks.children.list"""
+    
+    def __init__(self, blocks, page_size=2):
+        self.page_size = page_size
+        self.tree = {}
+        self.counter = 0
+        self.calls = []
+        self.tree["page"] = self._store(blocks)
+        self.blocks = self
+        self.children = self
+    
+    def _store(self, blocks):
+        stored = []
+        for block in blocks:
+            self.counter += 1
+            block_id = f"b{self.counter}"
+            content = dict(block[block["type"]])
+            children = content.pop("children", [])
+            stored.append({"id": block_id, "type": block["type"], block["type"]: content,
+                           "has_children": bool(children)})
+            if children:
+                self.tree[block_id] = self._store(children)
+        return stored
+    
+    async def list(self, block_id, page_size=100, start_cursor=None):
+        self.calls.append(block_id)
+        await asyncio.sleep(0)
+        children = self.tree.get(block_id, [])
+        start = int(start_cursor or 0)
+        end = start + min(page_size, self.page_size)
+        return {"results": children[start:end], "has_more": end < len(children),
+                "next_cursor": str(end) if end < len(children) else None}
+
+
+def export(markdown):
+    client = FakeBlockTree(MarkdownConverter().convert_markdown_to_blocks(markdown))
+    out = io.StringIO()
+    exporter = NotionExporter(client)
+    asyncio.run(exporter.export_page("page", out))
+    # Rendered subtrees are not kept around
+    assert exporter._children == {}
+    return out.getvalue(), client
+
+
+def test_export_round_trip():
+    markdown = (
+        "Some **bold** and *italic* text with $x^2$\n"
+        "\n"
+        "- one\n"
+        "  - nested\n"
+        "- two\n"
+        "\n"
+        "---\n"
+        "\n"
+        "| a | b |\n"
+        "| --- | --- |\n"
+        "| 1 | x \\| y |\n"
+        "\n"
+        "$$\n"
+        "E = mc^2\n"
+        "$$\n"
+    )
+    exported, client = export(markdown)
+    assert exported == markdown
+    # Every block with children was listed exactly once, following pagination
+    assert client.calls.count("page") == 3
+
+
+def test_reexport_is_stable():
+    markdown = (Path(__file__).parent / "test_files" / "nested_lists.md").read_text(encoding="utf-8")
+    first, _ = export(markdown)
+    second, _ = export(first)
+    assert first == second
+
+
+def test_links_and_page_mentions_round_trip():
+    exported, _ = export("See [the docs](https://example.com/a_b) now\n")
+    assert exported == "See [the docs](https://example.com/a_b) now\n"
+    
+    mention = {"type": "mention", "mention": {"type": "page", "page": {"id": "p1"}},
+               "plain_text": "Home Page", "href": "https://www.notion.so/p1"}
+    assert rich_text_to_markdown([mention]) == "[[Home Page]]"
+
+
+def test_inline_database_rows_come_from_its_data_source():
+    class DataSources:
+        async def retrieve(self, data_source_id):
+            return {"properties": {"Count": {"type": "number"}, "Name": {"type": "title"}}}
+        
+        async def query(self, data_source_id, page_size=100, start_cursor=None):
+            assert data_source_id == "ds1"
+            return {"results": [{"properties": {
+                "Name": {"type": "title", "title": [{"plain_text": "a"}]},
+                "Count": {"type": "number", "number": 3},
+            }}], "has_more": False}
+    
+    class Databases:
+        async def retrieve(self, database_id):
+            return {"id": database_id, "data_sources": [{"id": "ds1"}]}
+    
+    client = FakeBlockTree([])
+    client.tree["page"] = [{"id": "db1", "type": "child_database", "child_database": {"title": "T"},
+                            "has_children": False}]
+    client.databases = Databases()
+    client.data_sources = DataSources()
+    out = io.StringIO()
+    asyncio.run(NotionExporter(client).export_page("page", out))
+    assert out.getvalue() == "| Name | Count |\n| --- | --- |\n| a | 3 |\n"
+
+
+def test_plain_text_markup_is_escaped():
+    for markdown in ("Costs \\$5 \\*each\\* in snake\\_case, not \\`code\\` or \\~\\~struck\\~\\~ \\\\ done\n",
+                     "\\# not a heading\n\n\\> not a quote\n\n\\- not a list\n\n1\\. not numbered\n"):
+        exported, _ = export(markdown)
+        assert exported == markdown
+    
+    text = [{"type": "text", "plain_text": "# 2*3 = $6_a"}]
+    assert rich_text_to_markdown(text) == "# 2\\*3 = \\$6\\_a"
+
+
+def test_nested_code_and_equations_are_indented_under_their_list_item():
+    client = FakeBlockTree([])
+    client.tree["page"] = [{"id": "li", "type": "bulleted_list_item", "has_children": True,
+                            "bulleted_list_item": {"rich_text": [{"plain_text": "item"}]}}]
+    client.tree["li"] = [
+        {"id": "code", "type": "code", "has_children": False,
+         "code": {"language": "python", "rich_text": [{"plain_text": "x = 1\n\ny = 2"}]}},
+        {"id": "eq", "type": "equation", "has_children": False, "equation": {"expression": "x^2"}},
+    ]
+    out = io.StringIO()
+    asyncio.run(NotionExporter(client).export_page("page", out))
+    assert out.getvalue() == "- item\n  ```python\n  x = 1\n\n  y = 2\n  ```\n  $$\n  x^2\n  $$\n"
+    
+    markdown = "- item\n  ```python\n  x = 1\n  ```\n- next\n"
+    blocks = MarkdownConverter().convert_markdown_to_blocks(markdown, parser="markdown-it")
+    out = io.StringIO()
+    asyncio.run(NotionExporter(FakeBlockTree(blocks)).export_page("page", out))
+    assert out.getvalue() == markdown
+
+
+def test_prefetch_stays_within_its_window():
+    markdown = "".join(f"- item {i}\n  - nested {i}\n    - deeper {i}\n" for i in range(40))
+    expected, _ = export(markdown)
+    
+    client = FakeBlockTree(MarkdownConverter().convert_markdown_to_blocks(markdown))
+    exporter = NotionExporter(client, max_prefetch=4)
+    held = []
+    list_children = client.list
+    
+    async def list_and_count(block_id, **kwargs):
+        held.append(len(exporter._children))
+        return await list_children(block_id, **kwargs)
+    
+    client.list = list_and_count
+    out = io.StringIO()
+    asyncio.run(exporter.export_page("page", out))
+    assert out.getvalue() == expected
+    # The window, plus the chain of lists being rendered that did not fit in it
+    assert max(held) <= 4 + 2
+    assert exporter._children == {}
+
+
+def test_failed_fetches_are_awaited():
+    client = FakeBlockTree(MarkdownConverter().convert_markdown_to_blocks("- a\n  - x\n- b\n  - y\n"))
+    list_children = client.list
+    
+    async def failing_list(block_id, **kwargs):
+        if block_id != "page":
+            raise RuntimeError(f"cannot list {block_id}")
+        return await list_children(block_id, **kwargs)
+    
+    client.list = failing_list
+    exporter = NotionExporter(client)
+    
+    async def run():
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        try:
+            await exporter.export_page("page", io.StringIO())
+        except RuntimeError:
+            pass
+        gc.collect()
+        return errors
+    
+    assert asyncio.run(run()) == []
+    assert exporter._children == {}
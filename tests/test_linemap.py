@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Source line tracking and line map tests (no network access needed)
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_cli import MarkdownToNotionConverter
+from md2notion_core import PARALLEL_MIN_CHUNK_SIZE, MarkdownConverter, convert_markdown_parallel
+from md2notion_linemap import LineMap, sidecar_path
+
+DOCUMENT = """# Title
+
+First paragraph
+still the first.
+
+* item
+  * nested
+    * deeper
+* second item
+
+$$
+E = mc^2
+$$
+
+| a | b |
+| --- | --- |
+| 1 | 2 |
+
+---
+Last line
+"""
+
+
+def lines_of(blocks):
+    return [(block["type"], block.get("_lines")) for block in blocks]
+
+
+def test_blocks_carry_their_source_lines():
+    converter = MarkdownConverter()
+    converter.track_lines = True
+    blocks = converter.convert_markdown_to_blocks(DOCUMENT)
+    
+    assert lines_of(blocks) == [
+        ("heading_1", [1, 1]),
+        ("paragraph", [3, 4]),
+        ("bulleted_list_item", [6, 8]),
+        ("bulleted_list_item", [9, 9]),
+        ("equation", [11, 13]),
+        ("table", [15, 17]),
+        ("divider", [19, 19]),
+        ("paragraph", [20, 20]),
+    ]
+    nested = blocks[2]["bulleted_list_item"]["children"][0]
+    assert nested["_lines"] == [7, 8]
+    assert nested["bulleted_list_item"]["children"][0]["_lines"] == [8, 8]
+    
+    # Untracked conversion is unchanged
+    assert "_lines" not in MarkdownConverter().convert_markdown_to_blocks(DOCUMENT)[0]
+
+
+def test_streamed_and_parallel_conversion_number_lines_across_chunks():
+    document = "\n\n".join(f"Paragraph {n}\nwith two lines" for n in range(300))
+    converter = MarkdownConverter()
+    converter.track_lines = True
+    expected = converter.convert_markdown_to_blocks(document)
+    assert expected[-1]["_lines"] == [898, 899]
+    
+    assert list(converter.iter_blocks(document.split("\n"), chunk_size=200)) == expected
+    assert convert_markdown_parallel(document, workers=1, chunk_size=500, track_lines=True) == expected
+
+
+def test_upload_writes_line_map(tmp_path, notion):
+    source = tmp_path / "doc.md"
+    source.write_text(DOCUMENT, encoding="utf-8")
+    line_map = LineMap(sidecar_path(str(source)))
+    converter = MarkdownToNotionConverter("test-token", line_map=line_map)
+    converter.notion = notion
+    
+    asyncio.run(converter.upload_file_to_notion(str(source), "parent"))
+    line_map.save()
+    
+    assert "_lines" not in json.dumps([children for _, children, _ in notion.appends])
+    saved = LineMap.load(tmp_path / "doc.md.md2notion-map.json")
+    assert saved.page_id == "page-1"
+    assert len(saved.entries) == 9
+    # The deeper list levels were appended as follow-ups and have their own IDs
+    hits = saved.blocks_for(7, 8)
+    assert [entry["lines"] for entry in hits] == [[6, 8], [7, 8]]
+    assert hits[1]["parent_id"] == hits[0]["id"]
+    assert [entry["lines"] for entry in saved.blocks_for(16)] == [[15, 17]]
+
+
+def test_markdown_it_line_map_is_the_same_streamed_or_parallel(tmp_path, notion):
+    pytest.importorskip("markdown_it")
+    source = tmp_path / "doc.md"
+    section = "- item\n\n  more of the item\n\n> quoted\n> text\n\n\n"
+    source.write_text(DOCUMENT + section * (PARALLEL_MIN_CHUNK_SIZE // len(section) + 100), encoding="utf-8")
+    
+    maps = []
+    for workers in (1, 2):
+        line_map = LineMap(sidecar_path(str(source)))
+        converter = MarkdownToNotionConverter("test-token", conversion_workers=workers, line_map=line_map,
+                                              parser="markdown-it")
+        converter.notion = notion
+        asyncio.run(converter.upload_file_to_notion(str(source), "parent"))
+        maps.append(sorted(entry["lines"] for entry in line_map.entries))
+    
+    streamed, parallel = maps
+    assert streamed == parallel
+    # Ranges stop at the item's last text line, not the blank lines after it
+    assert [21, 23] in streamed and [25, 26] in streamed
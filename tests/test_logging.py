@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Structured logging tests
+"""
+
+import io
+import json
+import logging
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_logging import configure_logging, set_request_id, shutdown_logging
+from md2notion_service import BackgroundLoop
+
+
+def capture(**options):
+    """Log JSON into a buffer; the returned function flushes, restores and parses it"""
+    root = logging.getLogger()
+    saved = (list(root.handlers), root.level)
+    stream = io.StringIO()
+    configure_logging(stream=stream, **options)
+    
+    def finish():
+        shutdown_logging()
+        root.handlers[:] = saved[0]
+        root.setLevel(saved[1])
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+    return finish
+
+
+def test_records_are_json_with_request_id_and_fields():
+    finish = capture()
+    logger = logging.getLogger("md2notion.test")
+    set_request_id("req-1")
+    logger.info("Uploaded %d blocks", 3, extra={"event": "upload_finished", "page_id": "abc"})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("Upload failed")
+    set_request_id("req-2")
+    logger.debug("not logged at INFO")
+    entries = finish()
+    
+    assert len(entries) == 2
+    assert entries[0]["message"] == "Uploaded 3 blocks"
+    assert entries[0]["request_id"] == "req-1"
+    assert entries[0]["page_id"] == "abc"
+    assert entries[0]["level"] == "INFO"
+    assert entries[1]["level"] == "ERROR"
+    assert "ValueError: boom" in entries[1]["exception"]
+
+
+def test_sampling_drops_routine_events_but_keeps_warnings():
+    finish = capture(sample_rate=0.0)
+    logger = logging.getLogger("md2notion.test")
+    for _ in range(50):
+        logger.info("GET / 200", extra={"event": "http_request"})
+    logger.warning("GET / 500", extra={"event": "http_request"})
+    logger.info("other event")
+    entries = finish()
+    
+    assert [entry["message"] for entry in entries] == ["GET / 500", "other event"]
+
+
+def test_request_id_follows_work_onto_background_loop():
+    finish = capture()
+    loop = BackgroundLoop()
+    
+    async def job():
+        logging.getLogger("md2notion.test").info("in background")
+    
+    set_request_id("req-bg")
+    loop.run(job(), timeout=5)
+    entries = finish()
+    
+    assert entries[-1]["request_id"] == "req-bg"
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Prometheus metrics tests (no network access needed)
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_metrics import (
+    BYTES_UPLOADED,
+    NOTION_REQUESTS,
+    NOTION_RETRIES,
+    Counter,
+    Gauge,
+    Histogram,
+    endpoint_label,
+    render,
+)
+from md2notion_throttle import AdaptiveConcurrency
+
+
+class RateLimited(Exception):
+    status = 429
+    code = "rate_limited"
+    headers = {"retry-after": "0"}
+
+
+def test_render_uses_exposition_format():
+    registry = []
+    requests = Counter("test_requests_total", "Requests", ["status"])
+    depth = Gauge("test_depth", "Depth", ["tenant"])
+    latency = Histogram("test_seconds", "Latency", buckets=(0.1, 1.0))
+    registry.extend([requests, depth, latency])
+    
+    requests.inc(status="ok")
+    requests.inc(2, status='bad "quote"')
+    depth.replace({("a",): 3})
+    latency.observe(0.05)
+    latency.observe(0.5)
+    
+    text = render(registry)
+    assert "# TYPE test_requests_total counter" in text
+    assert 'test_requests_total{status="ok"} 1' in text
+    assert 'test_requests_total{status="bad \\"quote\\""} 2' in text
+    assert 'test_depth{tenant="a"} 3' in text
+    assert 'test_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_seconds_bucket{le="1"} 2' in text
+    assert 'test_seconds_bucket{le="+Inf"} 2' in text
+    assert "test_seconds_count 2" in text
+    assert text.endswith("\n")
+
+
+def test_endpoint_label_hides_object_ids():
+    assert endpoint_label("blocks/0123456789abcdef0123456789abcdef/children") == "blocks/{id}/children"
+    assert endpoint_label("pages/01234567-89ab-cdef-0123-456789abcdef") == "pages/{id}"
+
+
+def test_controller_counts_requests_and_retries():
+    controller = AdaptiveConcurrency()
+    path = "blocks/0123456789abcdef0123456789abcdef/children"
+    labels = {"method": "patch", "endpoint": "blocks/{id}/children"}
+    ok_before = NOTION_REQUESTS.value(status="ok", **labels)
+    throttled_before = NOTION_REQUESTS.value(status="429", **labels)
+    retries_before = NOTION_RETRIES.value()
+    attempts = []
+    
+    async def send(path, method):
+        attempts.append(path)
+        if len(attempts) == 1:
+            raise RateLimited()
+        return {}
+    
+    asyncio.run(controller.request(send, path=path, method="patch"))
+    assert NOTION_REQUESTS.value(status="ok", **labels) == ok_before + 1
+    assert NOTION_REQUESTS.value(status="429", **labels) == throttled_before + 1
+    assert NOTION_RETRIES.value() == retries_before + 1
+
+
+def test_uploaded_bytes_count_sent_payloads_only(converter, notion):
+    notion.failures["broken"] = "unavailable"
+    blocks = converter.convert_markdown_to_blocks("# Title\n\nSome text")
+    before = BYTES_UPLOADED.value()
+    
+    asyncio.run(converter._upload_blocks(blocks, "page"))
+    with pytest.raises(RuntimeError):
+        asyncio.run(converter._upload_blocks(blocks, "broken"))
+    assert BYTES_UPLOADED.value() == before + sum(len(children.json) for _, children, _ in notion.appends)
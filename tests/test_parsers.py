@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Parser backend tests (the CommonMark backends need markdown-it-py or mistune)
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_core import MarkdownConverter, convert_markdown_parallel
+
+# Markdown the built-in parser and CommonMark read the same way
+SHARED = """# Title
+
+A paragraph with **bold**, *italic*, `code`, [a link](https://example.com) and $x^2$.
+It continues here.
+
+- One
+  - Nested $a$
+- Two
+
+1. First
+2. Second
+
+| Name | Value |
+|------|-------|
+| pipe | `a \\| b` |
+
+---
+
+$$
+E = mc^2
+$$
+
+Closing words.
+"""
+
+COMMONMARK = """#### Deep heading
+
+> Quoted *text*
+
+```py
+print("hi")
+```
+
+- Loose item
+  
+  Second paragraph
+"""
+
+
+# Lines whose blocks start, run on or end differently from parser to parser
+FUZZ_LINES = ["> quote", "> more quote", "| a | b |", "| --- | --- |", "| 1 | 2 |", "- item", "  - nested",
+              "1. one", "2. two", "+ plus item", "Plain *text*", "# Heading", "    indented", "---", "$$", "x^2",
+              "$$ y $$", "```python", "```", "~~~", "````", "code ~~~ inside", "", "", ""]
+
+
+def fuzzed_documents(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "\n".join(rng.choice(FUZZ_LINES) for _ in range(rng.randint(20, 120))), rng.randint(20, 200)
+
+
+@pytest.fixture(params=["markdown-it", "mistune"])
+def backend(request):
+    pytest.importorskip({"markdown-it": "markdown_it", "mistune": "mistune"}[request.param])
+    return request.param
+
+
+def test_backends_match_the_builtin_parser_on_shared_markdown(backend):
+    converter = MarkdownConverter()
+    assert converter.convert_markdown_to_blocks(SHARED, parser=backend) == converter.convert_markdown_to_blocks(SHARED)
+    # The choice is per call; the converter keeps its own parser
+    assert converter.parser == "regex"
+
+
+def test_commonmark_blocks(backend):
+    blocks = MarkdownConverter().convert_markdown_to_blocks(COMMONMARK, parser=backend)
+    assert [block["type"] for block in blocks] == ["heading_3", "quote", "code", "bulleted_list_item"]
+    assert blocks[1]["quote"]["rich_text"][1]["annotations"]["italic"] is True
+    assert blocks[2]["code"]["language"] == "python"
+    assert blocks[2]["code"]["rich_text"][0]["text"]["content"] == 'print("hi")'
+    child = blocks[3]["bulleted_list_item"]["children"][0]
+    assert child["type"] == "paragraph" and child["paragraph"]["rich_text"][0]["text"]["content"] == "Second paragraph"
+
+
+def test_streamed_and_parallel_conversion_use_the_parser(backend):
+    document = "\n\n".join([SHARED, COMMONMARK] * 40)
+    converter = MarkdownConverter()
+    expected = converter.convert_markdown_to_blocks(document, parser=backend)
+    assert list(converter.iter_blocks(document.split("\n"), chunk_size=512, parser=backend)) == expected
+    assert convert_markdown_parallel(document, workers=1, chunk_size=2048, parser=backend) == expected
+
+
+@pytest.mark.parametrize("parser", ["regex", "markdown-it", "mistune"])
+def test_streamed_and_parallel_conversion_match_the_whole_document(parser):
+    if parser != "regex":
+        pytest.importorskip({"markdown-it": "markdown_it", "mistune": "mistune"}[parser])
+    converter = MarkdownConverter()
+    for document, chunk_size in fuzzed_documents(200):
+        expected = converter.convert_markdown_to_blocks(document, parser=parser)
+        assert list(converter.iter_blocks(document.split("\n"), chunk_size, parser)) == expected, document
+        assert convert_markdown_parallel(document, workers=1, chunk_size=chunk_size, parser=parser) == expected, document
+
+
+def test_source_lines_need_a_backend_that_reports_them():
+    pytest.importorskip("markdown_it")
+    converter = MarkdownConverter()
+    converter.track_lines = True
+    blocks = converter.convert_markdown_to_blocks(COMMONMARK, first_line=10, parser="markdown-it")
+    assert [block["_lines"] for block in blocks] == [[10, 10], [12, 12], [14, 16], [18, 20]]
+    
+    pytest.importorskip("mistune")
+    with pytest.raises(ValueError):
+        converter.convert_markdown_to_blocks(COMMONMARK, parser="mistune")
+
+
+def test_markdown_it_line_ranges_do_not_depend_on_chunking():
+    pytest.importorskip("markdown_it")
+    corpus = sorted((Path(__file__).parent / "test_files").glob("*.md"))
+    document = "\n".join([path.read_text(encoding="utf-8") for path in corpus] * 3 + [SHARED, COMMONMARK] * 20)
+    converter = MarkdownConverter()
+    converter.track_lines = True
+    expected = converter.convert_markdown_to_blocks(document, parser="markdown-it")
+    # Items followed by blank lines end on their last text line
+    assert blocks_ending_on_blank_lines(expected, document.split("\n")) == []
+    
+    assert list(converter.iter_blocks(document.split("\n"), chunk_size=1024, parser="markdown-it")) == expected
+    assert convert_markdown_parallel(document, workers=2, chunk_size=2048, track_lines=True,
+                                     parser="markdown-it") == expected
+
+
+def blocks_ending_on_blank_lines(blocks, lines):
+    ends = []
+    for block in blocks:
+        content = block[block["type"]]
+        if block.get("_lines") and not lines[block["_lines"][1] - 1].strip():
+            ends.append(block["_lines"])
+        if isinstance(content, dict) and block["type"] != "table":
+            ends.extend(blocks_ending_on_blank_lines(content.get("children", []), lines))
+    return ends
+
+
+def test_unknown_parser_is_rejected():
+    with pytest.raises(ValueError):
+        MarkdownConverter().convert_markdown_to_blocks("text", parser="pandoc")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Offline upload plan tests
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_cli import MarkdownToNotionConverter
+from md2notion_plan import format_plan, plan_uploads
+
+
+def plan(tmp_path, files, **options):
+    paths = []
+    for name, content in files.items():
+        path = tmp_path / name
+        path.write_text(content, encoding="utf-8")
+        paths.append(path)
+    converter = MarkdownToNotionConverter("plan-token", **options)
+    return asyncio.run(plan_uploads(converter, paths, requests_per_second=2))
+
+
+def test_plan_counts_requests_follow_ups_and_bytes(tmp_path):
+    nested = "* a\n  * b\n    * c\n"
+    table = "| n |\n| --- |\n" + "".join(f"| {n} |\n" for n in range(150))
+    result = plan(tmp_path, {"nested.md": nested, "table.md": table, "plain.md": "Hello\n"})
+    nested_plan, table_plan, plain_plan = result["files"]
+    
+    # Page, skeleton append, then the deeper list level as a follow-up
+    assert (nested_plan["requests"], nested_plan["follow_ups"], nested_plan["blocks"]) == (3, 1, 3)
+    # The table block and 100 of its 151 rows, then the other 51 rows in a follow-up
+    assert (table_plan["requests"], table_plan["follow_ups"], table_plan["blocks"]) == (3, 1, 152)
+    assert plain_plan["requests"] == 2 and plain_plan["seconds"] == 1.0
+    
+    total = result["total"]
+    assert total["requests"] == 8
+    assert total["bytes"] == sum(entry["bytes"] for entry in result["files"]) > 0
+    assert "at 2 requests/s" in format_plan(result, 2)
+
+
+def test_plan_flags_blocks_notion_would_reject(tmp_path):
+    result = plan(tmp_path, {"long.md": "Fine\n\n" + "x" * 2500 + "\n"})
+    
+    violations = result["files"][0]["violations"]
+    assert len(violations) == 1
+    assert "block 2 (paragraph)" in violations[0] and "2500 characters" in violations[0]
+    assert "problem(s) Notion would reject" in format_plan(result, 3)
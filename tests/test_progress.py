@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Upload progress tests (no network access needed)
+"""
+
+import asyncio
+import io
+import logging
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_cli import MarkdownToNotionConverter
+from md2notion_progress import UploadProgress, count_blocks
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+    
+    def __call__(self):
+        return self.now
+
+
+class FakeController:
+    def __init__(self):
+        self.counters = {"requests": 5, "throttled": 1, "wait_seconds": 2.0}
+    
+    def stats(self):
+        return dict(self.counters)
+
+
+def test_snapshot_rates_and_eta():
+    clock, controller = FakeClock(), FakeController()
+    progress = UploadProgress(1000, controller, stream=io.StringIO(), tty=False, clock=clock)
+    progress.start()
+    
+    # A quarter of the source became 50 blocks; 40 are uploaded in 2 requests
+    progress.converted(250, 50)
+    progress.sent(20)
+    progress.sent(20)
+    controller.counters.update(requests=7, throttled=2, wait_seconds=3.5)
+    clock.now += 2.0
+    snapshot = progress.snapshot()
+    
+    assert snapshot["bytes_converted"] == 250
+    assert snapshot["batches_sent"] == 2
+    # 200 blocks expected in total at this ratio: 160 left, in batches of 20
+    assert snapshot["batches_remaining"] == 8
+    assert snapshot["requests"] == 2 and snapshot["throttled"] == 1
+    assert snapshot["throttle_wait_seconds"] == 1.5
+    assert snapshot["blocks_per_second"] == 20.0
+    assert snapshot["requests_per_second"] == 1.0
+    assert snapshot["eta_seconds"] == 8.0
+    
+    line = progress.render(snapshot)
+    assert "25%" in line and "~8 left" in line and "ETA 0m 8s" in line
+
+
+def test_status_line_redraws_on_a_terminal_and_logs_otherwise(caplog):
+    stream = io.StringIO()
+    progress = UploadProgress(100, stream=stream, tty=True, clock=FakeClock())
+    progress.start()
+    progress.show()
+    progress.show()
+    assert stream.getvalue().count("\r") == 2
+    progress.finish()
+    assert stream.getvalue().endswith("\n")
+    
+    stream = io.StringIO()
+    progress = UploadProgress(100, stream=stream, tty=False, clock=FakeClock())
+    progress.start()
+    with caplog.at_level(logging.INFO, logger="md2notion_progress"):
+        progress.show()
+    assert stream.getvalue() == ""
+    assert caplog.records[-1].event == "upload_progress"
+
+
+def test_streamed_upload_reports_every_block(tmp_path, notion):
+    path = tmp_path / "doc.md"
+    path.write_text("# Title\n\n" + "\n\n".join(f"Paragraph {n}" for n in range(150)) +
+                    "\n\n- item\n  - nested\n", encoding="utf-8")
+    converter = MarkdownToNotionConverter("test-token")
+    converter.notion = notion
+    clock = FakeClock()
+    converter.progress = UploadProgress(path.stat().st_size, stream=io.StringIO(), tty=False, clock=clock)
+    
+    async def upload():
+        converter.progress.start(display=False)
+        await converter.upload_file_to_notion(str(path), "parent")
+        clock.now += 4.0
+        return converter.progress.finish()
+    
+    summary = asyncio.run(upload())
+    expected = sum(count_blocks(block) for block in converter.convert_markdown_to_blocks(path.read_text()))
+    assert summary["bytes_converted"] == summary["bytes_total"]
+    assert summary["blocks_converted"] == summary["blocks_uploaded"] == expected == 153
+    assert summary["batches_remaining"] == 0 and summary["eta_seconds"] == 0.0
+    assert summary["blocks_per_second"] == round(153 / 4.0, 1)
+    # finish() is idempotent
+    assert converter.progress.finish() is summary
+
+
+def test_database_rows_are_reported_as_uploaded(notion):
+    async def create_database(**kwargs):
+        return {"id": "db-1"}
+    
+    notion.databases.create = create_database
+    markdown = "# Title\n\n| Name | Count |\n| --- | --- |\n" + "".join(f"| row {n} | {n} |\n" for n in range(30))
+    converter = MarkdownToNotionConverter("test-token", tables_as_databases=True, requests_per_second=1000)
+    converter.notion = notion
+    converter.progress = UploadProgress(len(markdown.encode("utf-8")), stream=io.StringIO(), tty=False,
+                                        clock=FakeClock())
+    
+    async def upload():
+        converter.progress.start(display=False)
+        converter.progress.converted(len(markdown.encode("utf-8")), sum(count_blocks(block) for block in blocks))
+        await converter.upload_blocks_to_notion(blocks, "parent")
+        return converter.progress.snapshot()
+    
+    blocks = converter.convert_markdown_to_blocks(markdown)
+    snapshot = asyncio.run(upload())
+    assert sum(page["parent"].get("database_id") == "db-1" for page in notion.created) == 30
+    assert snapshot["blocks_uploaded"] == snapshot["blocks_converted"] == 1 + 1 + 1 + 30
+    assert snapshot["eta_seconds"] == 0.0
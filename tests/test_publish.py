@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Database publishing tests (no network access needed)
+"""
+
+import asyncio
+import datetime
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+import md2notion_publish
+from md2notion_cache import schema_cache
+from md2notion_cli import MarkdownToNotionConverter
+from md2notion_publish import DatabasePublisher, iter_markdown_files, split_front_matter
+
+POST = """---
+title: Adopt SQLite
+tags: [storage, decisions]
+owner: ada@example.com
+date: 2024-03-01
+published: yes
+draft_notes: not a property
+---
+# Context
+
+We need a queue.
+"""
+
+
+def test_front_matter_is_split_from_the_body():
+    meta, body = split_front_matter(POST)
+    assert meta["title"] == "Adopt SQLite"
+    assert meta["tags"] == ["storage", "decisions"]
+    assert meta["date"] in ("2024-03-01", datetime.date(2024, 3, 1))
+    assert body.startswith("# Context")
+    
+    assert split_front_matter("# No front matter\n---\n") == ({}, "# No front matter\n---\n")
+
+
+def test_front_matter_without_pyyaml(monkeypatch):
+    monkeypatch.setattr(md2notion_publish, "yaml", None)
+    meta, body = split_front_matter("---\ntags:\n  - a\n  - b\ncount: 3\nowner: 'Ada'\n---\nBody\n")
+    assert meta == {"tags": ["a", "b"], "count": 3, "owner": "Ada"}
+    assert body == "Body\n"
+
+
+def test_directory_publishes_with_one_schema_fetch(tmp_path, notion):
+    schema_cache.clear()
+    for n in range(4):
+        (tmp_path / f"{n:04d}-adr.md").write_text(POST, encoding="utf-8")
+    (tmp_path / "0009-no-front-matter.md").write_text("Just text\n", encoding="utf-8")
+    (tmp_path / "0010-bad-owner.md").write_text("---\nowner: nobody\n---\nText\n", encoding="utf-8")
+    
+    converter = MarkdownToNotionConverter("test-token", requests_per_second=1000)
+    converter.notion = notion
+    notion.schema = {"Name": {"type": "title"}, "Tags": {"type": "multi_select"}, "Owner": {"type": "people"},
+                     "Date": {"type": "date"}, "Published": {"type": "checkbox"}}
+    notion.users_list = [{"id": "user-1", "name": "Ada", "person": {"email": "ada@example.com"}}]
+    publisher = DatabasePublisher(converter, "db-1")
+    published = asyncio.run(publisher.publish(iter_markdown_files([str(tmp_path)])))
+    
+    assert len(published) == 5
+    assert list(publisher.failed) == [str(tmp_path / "0010-bad-owner.md")]
+    assert notion.calls["databases.retrieve"] == 1 and notion.calls["users.list"] == 1
+    
+    properties = notion.created[0]["properties"]
+    assert notion.created[0]["parent"] == {"database_id": "db-1"}
+    assert properties["Name"]["title"][0]["text"]["content"] == "Adopt SQLite"
+    assert properties["Tags"] == {"multi_select": [{"name": "storage"}, {"name": "decisions"}]}
+    assert properties["Owner"] == {"people": [{"object": "user", "id": "user-1"}]}
+    assert properties["Date"] == {"date": {"start": "2024-03-01"}}
+    assert properties["Published"] == {"checkbox": True}
+    assert "draft_notes" not in properties
+    
+    untitled = [page["properties"] for page in notion.created if "Tags" not in page["properties"]]
+    assert untitled[0]["Name"]["title"][0]["text"]["content"] == "0009-no-front-matter"
+    
+    # A second run against the same database reuses the cached schema
+    asyncio.run(DatabasePublisher(converter, "db-1").publish([tmp_path / "0009-no-front-matter.md"]))
+    assert notion.calls["databases.retrieve"] == 1
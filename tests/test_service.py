@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Web upload service tests (no network access needed)
+"""
+
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_cache import page_cache
+from md2notion_cli import MarkdownToNotionConverter
+from md2notion_core import MarkdownConverter
+from md2notion_logging import request_id_var, set_request_id
+from md2notion_service import (
+    AppendCoalescer,
+    BackgroundLoop,
+    ConversionPool,
+    ConversionTimeout,
+    DocumentTooLarge,
+    FairScheduler,
+)
+
+ROOT = Path(__file__).parent.parent
+
+
+def make_converter(notion):
+    converter = MarkdownToNotionConverter("test-token")
+    converter.notion = notion
+    return converter
+
+
+def test_appends_to_same_page_are_merged_in_order(notion):
+    page_cache.clear()
+    coalescer = AppendCoalescer(window=0.01)
+    
+    async def run():
+        snippets = [coalescer.append(make_converter(notion), f"message {n}", "page") for n in range(5)]
+        other = coalescer.append(make_converter(notion), "elsewhere", "other")
+        return await asyncio.gather(*snippets, other)
+    
+    urls = asyncio.run(run())
+    assert urls == ["https://notion.so/page"] * 5 + ["https://notion.so/other"]
+    assert notion.calls["pages.retrieve"] == 2
+    page_appends = [children for block_id, children, _ in notion.appends if block_id == "page"]
+    assert len(page_appends) == 1
+    texts = [block["paragraph"]["rich_text"][0]["text"]["content"] for block in page_appends[0]]
+    assert texts == [f"message {n}" for n in range(5)]
+    assert coalescer.batches == 2 and coalescer._pages == {}
+
+
+def test_appends_keep_submission_order_when_conversions_finish_out_of_order(notion):
+    page_cache.clear()
+    
+    class SlowFirstConversions:
+        """Converts the first snippet last"""
+        
+        async def convert(self, markdown_content):
+            if markdown_content == "message 0":
+                await asyncio.sleep(0.05)
+            if markdown_content == "broken":
+                raise ConversionTimeout("too slow")
+            return MarkdownConverter().convert_markdown_to_blocks(markdown_content)
+    
+    coalescer = AppendCoalescer(window=0.001, conversions=SlowFirstConversions())
+    
+    async def run():
+        snippets = [coalescer.append(make_converter(notion), text, "page")
+                    for text in ("message 0", "broken", "message 1", "message 2")]
+        return await asyncio.gather(*snippets, return_exceptions=True)
+    
+    results = asyncio.run(run())
+    assert isinstance(results[1], ConversionTimeout)
+    assert results[0] == results[2] == results[3] == "https://notion.so/page"
+    texts = [block["paragraph"]["rich_text"][0]["text"]["content"]
+             for _, children, _ in notion.appends for block in children]
+    assert texts == ["message 0", "message 1", "message 2"]
+    assert coalescer._pages == {}
+
+
+def test_scheduled_coalescer_uses_one_job_slot_per_batch(notion):
+    page_cache.clear()
+    scheduler = FairScheduler(max_active=1, tenant_active=1)
+    coalescer = AppendCoalescer(window=0.01, scheduler=scheduler)
+    
+    async def run():
+        snippets = [coalescer.append(make_converter(notion), f"message {n}", "page") for n in range(5)]
+        return await asyncio.gather(*snippets), scheduler.stats()
+    
+    urls, stats = asyncio.run(run())
+    assert urls == ["https://notion.so/page"] * 5
+    # All five snippets waited together, outside the tenant's single slot
+    assert len(notion.appends) == 1
+    assert list(stats.values())[0]["completed"] == 1
+
+
+def test_failed_drain_resolves_its_batch_and_restarts_for_queued_snippets(notion):
+    page_cache.clear()
+    coalescer = AppendCoalescer(window=0.001)
+    append = notion.blocks.children.append
+    
+    async def run():
+        release = asyncio.Event()
+        
+        async def cancelled_first_append(**kwargs):
+            if not notion.appends and not release.is_set():
+                await release.wait()
+                raise asyncio.CancelledError()
+            return await append(**kwargs)
+        notion.blocks.children.append = cancelled_first_append
+        
+        first = asyncio.ensure_future(coalescer.append(make_converter(notion), "first", "page"))
+        await asyncio.sleep(0.05)
+        # Queued while the first batch is uploading; its drain then fails
+        second = asyncio.ensure_future(coalescer.append(make_converter(notion), "second", "page"))
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.wait_for(asyncio.gather(first, second, return_exceptions=True), 5)
+    
+    first, second = asyncio.run(run())
+    assert isinstance(first, asyncio.CancelledError)
+    assert second == "https://notion.so/page"
+    assert notion.texts("page") == ["second"]
+    assert coalescer._pages == {}
+
+
+def test_background_loop_runs_coroutines_from_threads():
+    background = BackgroundLoop()
+    
+    async def answer():
+        return 42
+    
+    assert background.run(answer(), timeout=5) == 42
+
+
+def test_scheduler_interleaves_tenants():
+    scheduler = FairScheduler(max_active=1, tenant_active=1)
+    started = []
+    
+    def job(name):
+        async def run():
+            started.append(name)
+            await asyncio.sleep(0)
+            return name
+        return run
+    
+    async def run():
+        bulk = [scheduler.run("bulk", job(f"bulk-{n}")) for n in range(6)]
+        await asyncio.sleep(0)
+        small = [scheduler.run("small", job(f"small-{n}")) for n in range(2)]
+        results = await asyncio.gather(*bulk, *small)
+        return results, scheduler.stats()
+    
+    results, stats = asyncio.run(run())
+    assert results == [f"bulk-{n}" for n in range(6)] + ["small-0", "small-1"]
+    # The small tenant does not wait behind the whole bulk upload
+    assert started.index("small-1") < started.index("bulk-5")
+    assert stats["bulk"]["completed"] == 6 and stats["small"]["queued"] == 0
+
+
+def test_cancelled_job_does_not_leave_its_caller_waiting():
+    scheduler = FairScheduler(max_active=1, tenant_active=1)
+    
+    async def cancelled():
+        raise asyncio.CancelledError()
+    
+    async def answer():
+        return 42
+    
+    async def run():
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(scheduler.run("tenant", cancelled), 5)
+        # The slot was given back
+        return await asyncio.wait_for(scheduler.run("tenant", answer), 5)
+    
+    assert asyncio.run(run()) == 42
+    assert scheduler.active == 0
+
+
+def test_scheduler_weights_by_job_cost():
+    scheduler = FairScheduler(max_active=1, tenant_active=1)
+    started = []
+    
+    async def run():
+        async def record(name):
+            started.append(name)
+        jobs = [scheduler.run("large", lambda n=n: record(f"large-{n}"), cost=3) for n in range(2)]
+        jobs += [scheduler.run("small", lambda n=n: record(f"small-{n}"), cost=1) for n in range(6)]
+        await asyncio.gather(*jobs)
+    
+    asyncio.run(run())
+    # Each turn credits one unit, so a cost-3 job starts every third turn
+    assert started[:5] == ["large-0", "small-0", "small-1", "large-1", "small-2"]
+
+
+def test_scheduled_jobs_keep_their_request_id():
+    scheduler = FairScheduler(max_active=1, tenant_active=1)
+    seen = []
+    
+    async def submit(request_id):
+        set_request_id(request_id)
+        
+        async def job():
+            seen.append((request_id, request_id_var.get()))
+            await asyncio.sleep(0)
+        await scheduler.run("tenant", job)
+    
+    async def run():
+        await asyncio.gather(*(submit(f"req-{name}") for name in "ABC"))
+    
+    asyncio.run(run())
+    # Queued jobs start from whichever job finished, but log under their own ID
+    assert [own for own, _ in seen] == ["req-A", "req-B", "req-C"]
+    assert all(own == logged for own, logged in seen)
+
+
+def test_conversion_pool_matches_serial_conversion(tmp_path):
+    markdown = (ROOT / "tests" / "test_files" / "tables.md").read_text(encoding="utf-8")
+    path = tmp_path / "doc.md"
+    path.write_text(markdown, encoding="utf-8")
+    pool = ConversionPool(workers=1)
+    
+    async def run():
+        return await pool.convert(markdown), await pool.convert(path=str(path))
+    
+    try:
+        from_text, from_file = asyncio.run(run())
+    finally:
+        pool.shutdown()
+    expected = MarkdownConverter().convert_markdown_to_blocks(markdown)
+    assert from_text == expected and from_file == expected
+
+
+def test_conversion_pool_enforces_size_and_time_limits():
+    pool = ConversionPool(workers=1, max_bytes=1000, timeout=0.001)
+    
+    with pytest.raises(DocumentTooLarge):
+        asyncio.run(pool.convert("x" * 1001))
+    assert pool._executor is None
+    
+    try:
+        with pytest.raises(ConversionTimeout):
+            asyncio.run(pool.convert("paragraph\n\n" * 80))
+        # The pool keeps serving once the late job has stopped
+        pool.timeout = 30
+        assert len(asyncio.run(pool.convert("# Title"))) == 1
+    finally:
+        pool.shutdown()
+
+
+def test_stuck_conversion_worker_is_killed_with_its_pool():
+    pool = ConversionPool(workers=1)
+    try:
+        executor = pool._get_executor()
+        slot = pool._take_slot()
+        # Stand in for a job stuck inside one chunk: its worker reported its PID
+        pool._pids[slot] = executor.submit(os.getpid).result(timeout=30)
+        stuck = executor.submit(time.sleep, 60)
+        time.sleep(0.2)
+        pool._kill_if_stuck(executor, stuck, slot)
+        
+        with pytest.raises(BrokenProcessPool):
+            stuck.result(timeout=30)
+        assert pool._executor is None
+        assert len(asyncio.run(pool.convert("# Title"))) == 1
+    finally:
+        pool.shutdown()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Sub-page fan-out tests (no network access needed)
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_cli import MarkdownToNotionConverter
+
+
+def test_sections_become_child_pages_in_order(notion):
+    converter = MarkdownToNotionConverter("test-token", split_level=2)
+    converter.notion = notion
+    markdown = "intro\n\n# One\n\nfirst\n\n## Two\n\nsecond\n\n### Deep\n\nthird\n\n# Three\n\nlast"
+    
+    url = asyncio.run(converter.upload_markdown_to_notion(markdown, "parent", "Handbook"))
+    
+    assert url == "https://notion.so/page-1"
+    assert [(page["parent"]["page_id"], page["title"]) for page in notion.created] == [
+        ("parent", "Handbook"), ("page-1", "One"), ("page-1", "Two"), ("page-1", "Three")
+    ]
+    one, two, three = (page["id"] for page in notion.created[1:])
+    assert notion.texts("page-1") == ["intro"]
+    assert notion.texts(one) == ["first"]
+    assert notion.texts(two) == ["second", "Deep", "third"]
+    assert notion.texts(three) == ["last"]
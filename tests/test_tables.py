@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Table parsing, chunked row and nested block upload tests (no network access needed)
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_cli import MAX_BLOCKS_PER_REQUEST
+
+
+def cell_texts(row_block):
+    return [cell[0]["text"]["content"] for cell in row_block["table_row"]["cells"]]
+
+
+def test_split_table_row_escapes_and_code(converter):
+    cells = converter._split_table_row(r"| a \| b | `x | y` | c |")
+    assert cells == ["a | b", "`x | y`", "c"]
+
+
+def test_ragged_rows_are_kept(converter):
+    markdown = "| a | b |\n| --- | --- |\n| 1 |\n| 2 | 3 | 4 |\n| 5 | 6 |"
+    blocks = converter.convert_markdown_to_blocks(markdown)
+    rows = blocks[0]["table"]["children"]
+    assert [cell_texts(row) for row in rows] == [["a", "b"], ["1", ""], ["2", "3 | 4"], ["5", "6"]]
+
+
+def test_large_table_is_chunked(converter):
+    lines = ["| n | square |", "| --- | --- |"] + [f"| {n} | {n * n} |" for n in range(250)]
+    blocks = converter.convert_markdown_to_blocks("\n".join(lines))
+
+    table = blocks[0]
+    assert len(table["table"]["children"]) == MAX_BLOCKS_PER_REQUEST
+    assert len(table["_pending_rows"]) == 250 - (MAX_BLOCKS_PER_REQUEST - 1)
+
+    block_ids = asyncio.run(converter._upload_blocks(blocks, "page"))
+    calls = converter.notion.appends
+    assert block_ids == ["block-1"]
+    assert "_pending_rows" not in calls[0][1][0]
+    assert [call[0] for call in calls[1:]] == ["block-1", "block-1"]
+    appended = [cell_texts(row)[0] for _, chunk, _ in calls[1:] for row in chunk]
+    assert appended == [str(n) for n in range(MAX_BLOCKS_PER_REQUEST - 1, 250)]
+
+
+def test_infer_column_types(converter):
+    markdown = (
+        "| Name | Count | Done | Due | Notes |\n"
+        "| --- | --- | --- | --- | --- |\n"
+        "| a | 1,200 | yes | 2024-01-02 | x |\n"
+        "| b | 3.5 | No | | 7 |\n"
+    )
+    table = converter.convert_markdown_to_blocks(markdown)[0]
+    assert converter.infer_column_types(table) == ["title", "number", "checkbox", "date", "rich_text"]
+
+    names = converter._database_property_names(table)
+    types = converter.infer_column_types(table)
+    rows = [converter._database_row_properties(names, types, cells) for cells in converter._table_cells(table)]
+    assert rows[0]["Count"] == {"number": 1200.0}
+    assert rows[1]["Done"] == {"checkbox": False}
+    assert rows[1]["Due"] == {"date": None}
+
+
+def test_placeholder_cells_are_empty_in_typed_columns(converter):
+    markdown = "| Name | Count | Due |\n| --- | --- | --- |\n| a | 3 | 2024-01-02 |\n| b | - | n/a |\n| c | + | |\n"
+    table = converter.convert_markdown_to_blocks(markdown)[0]
+    # A lone sign is not a number
+    assert converter.infer_column_types(table) == ["title", "rich_text", "date"]
+
+    markdown = "| Name | Count | Due |\n| --- | --- | --- |\n| a | 3 | 2024-01-02 |\n| b | - | n/a |\n"
+    table = converter.convert_markdown_to_blocks(markdown)[0]
+    names = converter._database_property_names(table)
+    types = converter.infer_column_types(table)
+    assert types == ["title", "number", "date"]
+    row = converter._database_row_properties(names, types, list(converter._table_cells(table))[1])
+    assert row["Count"] == {"number": None} and row["Due"] == {"date": None}
+
+
+def test_table_database_schema_follows_the_api_shape(converter):
+    created = []
+
+    class Databases:
+        async def create(self, **kwargs):
+            created.append(kwargs)
+            return {"id": "db-1"}
+
+    converter.notion.databases = Databases()
+    table = converter.convert_markdown_to_blocks("| Name | Count |\n| --- | --- |\n| a | 1 |\n")[0]
+    asyncio.run(converter._create_table_database(table, "page", "Table"))
+    assert created[0]["properties"] == {"Name": {"title": {}}, "Count": {"number": {}}}
+
+    # Clients with data sources take the columns as the initial data source
+    converter.notion.data_sources = object()
+    asyncio.run(converter._create_table_database(table, "page", "Table"))
+    assert "properties" not in created[1]
+    assert created[1]["initial_data_source"] == {"properties": created[0]["properties"]}
+
+
+def test_nested_children_follow_their_parents(converter):
+    markdown = "- a\n  - b\n    - c\n- d\n  - e\n\ntext"
+    blocks = converter.convert_markdown_to_blocks(markdown)
+
+    block_ids = asyncio.run(converter._upload_blocks(blocks, "page"))
+    calls = converter.notion.appends
+
+    # Skeleton first: "a" without its subtree, "d" with its leaf child inline
+    top = calls[0][1]
+    assert calls[0][0] == "page" and block_ids == ["block-1", "block-2", "block-3"]
+    assert "children" not in top[0]["bulleted_list_item"]
+    assert len(top[1]["bulleted_list_item"]["children"]) == 1
+    # Then "b" (with its leaf "c" inline) is appended under "a"
+    assert calls[1][0] == "block-1"
+    assert calls[1][1][0]["bulleted_list_item"]["children"][0]["bulleted_list_item"]["rich_text"][0]["text"]["content"] == "c"
+    assert len(calls) == 2
+
+
+def test_requests_respect_element_limit(converter):
+    lines = []
+    for table in range(12):
+        lines += [f"| t{table} |", "| --- |"] + [f"| {n} |" for n in range(150)] + [""]
+    blocks = converter.convert_markdown_to_blocks("\n".join(lines))
+
+    asyncio.run(converter._upload_blocks(blocks, "page"))
+    page_calls = [children for target, children, _ in converter.notion.appends if target == "page"]
+    sizes = [sum(1 + len(block["table"]["children"]) for block in children) for children in page_calls]
+    assert all(size <= 1000 for size in sizes)
+    assert sum(len(children) for children in page_calls) == 12
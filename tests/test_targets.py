@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Multi-target upload tests (no network access needed)
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_cli import PreparedBlocks, read_targets_file
+
+
+def test_one_conversion_is_published_to_every_target(converter, notion):
+    notion.failures["bad"] = "object_not_found"
+    blocks = converter.convert_markdown_to_blocks("\n\n".join(f"Paragraph {n}" for n in range(250)))
+    
+    results = asyncio.run(converter.upload_to_targets(blocks, ["a", "bad", "b"], "Release notes"))
+    
+    pages = {page["parent"]["page_id"]: page["id"] for page in notion.created}
+    assert results == [
+        {"page_id": "a", "url": f"https://notion.so/{pages['a']}"},
+        {"page_id": "bad", "error": "object_not_found"},
+        {"page_id": "b", "url": f"https://notion.so/{pages['b']}"},
+    ]
+    by_target = {}
+    for block_id, children, _ in notion.appends:
+        by_target.setdefault(block_id, []).append(children)
+    assert [len(children) for children in by_target[pages["a"]]] == [100, 100, 50]
+    # Each batch was serialized once and the same bytes went to both targets
+    for mine, theirs in zip(by_target[pages["a"]], by_target[pages["b"]]):
+        assert isinstance(mine, PreparedBlocks) and mine is theirs
+    assert converter._shared_batches is None
+
+
+def test_targets_file_skips_blank_lines_and_comments(tmp_path):
+    path = tmp_path / "targets.txt"
+    path.write_text("# Team pages\nabc123\n\n  https://www.notion.so/Notes-def456  # notes\n", encoding="utf-8")
+    assert read_targets_file(str(path)) == ["abc123", "https://www.notion.so/Notes-def456"]
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Adaptive concurrency controller tests (no network access needed)
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_throttle import AdaptiveConcurrency, concurrency_controller
+
+
+class RateLimited(Exception):
+    status = 429
+    code = "rate_limited"
+    headers = {"retry-after": "0"}
+
+
+def test_rate_limited_requests_shrink_window_and_retry():
+    controller = AdaptiveConcurrency(initial=8)
+    attempts = []
+    
+    async def send(value):
+        attempts.append(value)
+        if len(attempts) < 3:
+            raise RateLimited()
+        return value
+    
+    assert asyncio.run(controller.request(send, "ok")) == "ok"
+    assert len(attempts) == 3
+    assert controller.throttled == 2
+    assert controller.window == 4  # halved once per round trip, not per 429
+    assert controller.in_flight == 0
+
+
+def test_window_bounds_in_flight_requests_and_grows():
+    controller = AdaptiveConcurrency(initial=2, maximum=4, latency_factor=1000)
+    active = []
+    peak = []
+    
+    async def send():
+        active.append(1)
+        peak.append(len(active))
+        await asyncio.sleep(0.001)
+        active.pop()
+    
+    async def run():
+        await asyncio.gather(*(controller.request(send) for _ in range(40)))
+    
+    asyncio.run(run())
+    assert max(peak[:2]) <= 2
+    assert max(peak) <= 4
+    assert controller.window == 4
+    assert controller.stats()["in_flight"] == 0
+
+
+def test_controller_is_shared_per_token():
+    assert concurrency_controller("token-a") is concurrency_controller("token-a")
+    assert concurrency_controller("token-a") is not concurrency_controller("token-b")
+
+
+def test_client_requests_go_through_controller():
+    pytest.importorskip("notion_client")
+    from md2notion_cli import create_notion_client
+    
+    client = create_notion_client("token-c")
+    assert client.controller is concurrency_controller("token-c")
+
+
+def test_unsupported_notion_client_is_refused(monkeypatch):
+    notion_client = pytest.importorskip("notion_client")
+    from md2notion_cli import _client_class
+    
+    class OldClient:
+        async def request(self, path, method, query=None, body=None, auth=None):
+            pass
+    
+    _client_class.cache_clear()
+    monkeypatch.setattr(notion_client, "AsyncClient", OldClient)
+    try:
+        with pytest.raises(ImportError, match="notion-client 3.x"):
+            _client_class()
+    finally:
+        _client_class.cache_clear()
+
+
+def test_prepared_children_are_sent_as_serialized_once():
+    pytest.importorskip("notion_client")
+    import httpx
+    from md2notion_cli import PreparedBlocks, create_notion_client
+    
+    sent = []
+    
+    def respond(request):
+        sent.append(request)
+        if len(sent) == 1:
+            return httpx.Response(429, headers={"retry-after": "0"},
+                                  json={"object": "error", "code": "rate_limited", "message": "slow down"})
+        return httpx.Response(200, json={"object": "list", "results": [{"id": "b1"}]})
+    
+    client = create_notion_client("token-d")
+    client.client = httpx.AsyncClient(base_url=str(client.client.base_url), headers=client.client.headers,
+                                      transport=httpx.MockTransport(respond))
+    children = PreparedBlocks([{"type": "paragraph", "paragraph": {"rich_text": [{"text": {"content": "é"}}]}}])
+    
+    result = asyncio.run(client.blocks.children.append(block_id="0" * 32, children=children, after="a1"))
+    assert result["results"] == [{"id": "b1"}]
+    assert len(sent) == 2
+    assert sent[0].content == sent[1].content
+    assert json.loads(sent[1].content) == {"children": list(children), "after": "a1"}
+    assert sent[1].headers["content-type"] == "application/json"
+    assert sent[1].headers["authorization"] == "Bearer token-d"
+
+
+def test_prepared_children_are_framed_correctly_on_the_wire():
+    pytest.importorskip("notion_client")
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from md2notion_cli import PreparedBlocks, create_notion_client
+    
+    received = []
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_PATCH(self):
+            received.append((self.headers["Content-Length"], self.rfile.read(int(self.headers["Content-Length"]))))
+            payload = b'{"object": "list", "results": [{"id": "b1"}]}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = create_notion_client("token-e")
+        client.client.base_url = f"http://127.0.0.1:{server.server_address[1]}/v1/"
+        children = PreparedBlocks([{"type": "paragraph", "paragraph": {"rich_text": [{"text": {"content": "é"}}]}}])
+        result = asyncio.run(client.blocks.children.append(block_id="0" * 32, children=children))
+    finally:
+        server.shutdown()
+    
+    assert result["results"] == [{"id": "b1"}]
+    length, body = received[0]
+    assert length == str(len(body))
+    assert json.loads(body) == {"children": list(children)}
+
+
+def test_client_leaves_rate_limits_to_the_controller():
+    pytest.importorskip("notion_client")
+    import httpx
+    from md2notion_cli import create_notion_client
+    
+    sent = []
+    
+    def respond(request):
+        sent.append(request)
+        if len(sent) == 1:
+            return httpx.Response(429, headers={"retry-after": "0"},
+                                  json={"object": "error", "code": "rate_limited", "message": "slow down"})
+        return httpx.Response(200, json={"object": "user", "id": "u1"})
+    
+    controller = concurrency_controller("token-f")
+    window = controller.window
+    client = create_notion_client("token-f")
+    client.client = httpx.AsyncClient(base_url=str(client.client.base_url), headers=client.client.headers,
+                                      transport=httpx.MockTransport(respond))
+    
+    assert asyncio.run(client.users.me())["id"] == "u1"
+    assert len(sent) == 2
+    assert controller.throttled == 1
+    assert controller.window < window
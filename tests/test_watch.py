@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Watch mode sync tests (no network access needed)
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from md2notion_watch import DirectorySync, STATE_FILENAME, SyncState
+
+
+def make_sync(tmp_path, converter):
+    return DirectorySync(converter, str(tmp_path), "parent")
+
+
+def test_only_changed_blocks_are_replaced(tmp_path, converter, notion):
+    sync = make_sync(tmp_path, converter)
+    doc = tmp_path / "doc.md"
+    doc.write_text("One\n\n---\n\nTwo\n\n---\n\nThree\n", encoding="utf-8")
+    
+    asyncio.run(sync.sync_file(doc))
+    assert (tmp_path / STATE_FILENAME).exists()
+    first_ids = list(notion.children["page-1"])
+    assert len(first_ids) == 5
+    
+    notion.requests.clear()
+    doc.write_text("One\n\n---\n\nTwo, edited\n\n---\n\nThree\n", encoding="utf-8")
+    asyncio.run(sync.sync_file(doc))
+    
+    assert notion.requests == [("delete", first_ids[2]), ("append", "page-1", first_ids[1], 1)]
+    assert notion.children["page-1"][:2] == first_ids[:2] and notion.children["page-1"][3:] == first_ids[3:]
+    assert sync.state.files["doc.md"]["block_ids"] == notion.children["page-1"]
+    
+    # Saving identical content costs nothing
+    notion.requests.clear()
+    asyncio.run(sync.sync_file(doc))
+    assert notion.requests == []
+
+
+def test_changes_at_the_top_are_patched_in_place(tmp_path, converter, notion):
+    sync = make_sync(tmp_path, converter)
+    doc = tmp_path / "doc.md"
+    doc.write_text("One\n\n---\n\nTwo\n", encoding="utf-8")
+    asyncio.run(sync.sync_file(doc))
+    first_ids = list(notion.children["page-1"])
+    
+    # An edited first paragraph goes in after the old one, which is then deleted
+    notion.requests.clear()
+    doc.write_text("One, edited\n\n---\n\nTwo\n", encoding="utf-8")
+    asyncio.run(sync.sync_file(doc))
+    assert notion.requests == [("append", "page-1", first_ids[0], 1), ("delete", first_ids[0])]
+    assert notion.children["page-1"][1:] == first_ids[1:]
+    
+    # A block inserted before an unchanged first block re-creates only that one
+    notion.requests.clear()
+    doc.write_text("Intro\n\nOne, edited\n\n---\n\nTwo\n", encoding="utf-8")
+    asyncio.run(sync.sync_file(doc))
+    assert [request[0] for request in notion.requests] == ["append", "delete"]
+    assert notion.requests[0][3] == 2
+    assert notion.texts("page-1") == ["Intro", "One, edited", "divider", "Two"]
+    assert sync.state.files["doc.md"]["block_ids"] == notion.children["page-1"]
+
+
+def test_failed_patch_records_the_blocks_left_on_the_page(tmp_path, converter, notion):
+    sync = make_sync(tmp_path, converter)
+    doc = tmp_path / "doc.md"
+    doc.write_text("One\n\n---\n\nTwo\n", encoding="utf-8")
+    asyncio.run(sync.sync_file(doc))
+    
+    # The new first block is in, but the old one cannot be deleted
+    notion.failures[notion.children["page-1"][0]] = "Notion is unavailable"
+    doc.write_text("Zero\n\n---\n\nTwo\n", encoding="utf-8")
+    asyncio.run(sync._sync_logged(doc))
+    saved = SyncState(tmp_path / STATE_FILENAME).files["doc.md"]
+    assert saved["block_ids"] == notion.children["page-1"]
+    assert len(saved["hashes"]) == len(notion.children["page-1"]) == 4
+    
+    # The next sync starts from the page as it is and finishes the change
+    notion.failures.clear()
+    asyncio.run(sync.sync_file(doc))
+    assert notion.texts("page-1") == ["Zero", "divider", "Two"]
+    assert sync.state.files["doc.md"]["block_ids"] == notion.children["page-1"]
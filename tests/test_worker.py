@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Queue worker tests (a temporary SQLite queue, no network access needed)
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+import md2notion_cli
+from md2notion_throttle import concurrency_controller
+from md2notion_worker import CREATING_PAGE, JobQueue, SharedRateBudget, Worker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+def job(path="/docs/a.md"):
+    return {"path": path, "target": "a" * 32, "options": {"title": None}}
+
+
+def test_expired_leases_are_requeued_until_attempts_run_out(tmp_path):
+    clock = FakeClock()
+    queue = JobQueue(tmp_path / "jobs.db", max_attempts=2, clock=clock)
+    job_id, = queue.enqueue([job()])
+    
+    claimed = queue.claim("w1", lease_seconds=60)
+    assert claimed["id"] == job_id and claimed["attempts"] == 1
+    assert queue.claim("w2", lease_seconds=60) is None
+    
+    # w1 keeps its lease by heartbeating; once it stops, w2 gets the job
+    clock.now += 50
+    assert queue.heartbeat(job_id, "w1", lease_seconds=60)
+    clock.now += 50
+    assert queue.claim("w2", lease_seconds=60) is None
+    clock.now += 61
+    claimed = queue.claim("w2", lease_seconds=60)
+    assert claimed["id"] == job_id and claimed["attempts"] == 2
+    
+    # The old holder has lost the job: it can neither renew nor finish it
+    assert not queue.heartbeat(job_id, "w1")
+    assert not queue.complete(job_id, "w1", "https://notion.so/late")
+    
+    clock.now += 61
+    assert queue.claim("w3") is None
+    counts = queue.counts()
+    assert counts["failed"] == 1 and counts["running"] == 0
+    assert "Lease expired" in queue.failed_jobs()[0]["error"]
+
+
+def test_failures_retry_and_released_jobs_keep_their_attempts(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.db", max_attempts=2, clock=FakeClock())
+    first, second = queue.enqueue([job("/docs/a.md"), job("/docs/b.md")])
+    
+    assert queue.claim("w1")["id"] == first
+    assert queue.fail(first, "w1", "boom")
+    
+    # Failed jobs keep their place: the oldest is tried again, then fails for good
+    retried = queue.claim("w1")
+    assert retried["id"] == first and retried["attempts"] == 2
+    assert queue.fail(first, "w1", "boom again")
+    assert queue.claim("w1")["id"] == second
+    queue.release(second, "w1")
+    released = queue.claim("w1")
+    assert released["id"] == second and released["attempts"] == 1
+    assert queue.complete(second, "w1", "https://notion.so/b")
+    
+    counts = queue.counts()
+    assert (counts["queued"], counts["running"], counts["done"], counts["failed"]) == (0, 0, 1, 1)
+    assert counts["workers"] == 1
+    assert queue.failed_jobs()[0]["error"] == "boom again"
+
+
+def test_rate_budget_is_shared_between_connections(tmp_path):
+    # Two workers' connections to one queue file draw from one schedule
+    path = tmp_path / "jobs.db"
+    first = SharedRateBudget(JobQueue(path), "token-key", requests_per_second=10)
+    second = SharedRateBudget(JobQueue(path), "token-key", requests_per_second=10)
+    other = SharedRateBudget(JobQueue(path), "other-key", requests_per_second=10)
+    
+    starts = [first.reserve(), second.reserve(), first.reserve(), second.reserve()]
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert all(abs(gap - 0.1) < 1e-6 for gap in gaps)
+    # Other tokens keep their own budget
+    assert other.reserve() < starts[-1]
+    
+    # A Retry-After seen by one worker holds back the other
+    second.block(5)
+    assert first.reserve() >= time.time() + 4.9
+
+
+def test_worker_uploads_queued_files_and_records_failures(tmp_path, monkeypatch, notion):
+    notion.failures["broken"] = "validation failed"
+    monkeypatch.setattr(md2notion_cli, "create_notion_client", lambda token: notion)
+    for name in ("one", "two", "three", "broken"):
+        (tmp_path / f"{name}.md").write_text(f"# {name}\n\nSome text.\n", encoding="utf-8")
+    queue = JobQueue(tmp_path / "jobs.db", max_attempts=2)
+    queue.enqueue([{"path": str(tmp_path / f"{name}.md"), "target": "a" * 32,
+                    "options": {"title": name.title() if name != "broken" else None}}
+                   for name in ("one", "two", "three", "broken")])
+    
+    worker = Worker(queue, "secret_worker_test", worker_id="w1", concurrency=2,
+                    requests_per_second=1000, poll_seconds=0.01)
+    asyncio.run(worker.run(exit_when_done=True))
+    
+    assert sorted(page["title"] for page in notion.created) == ["One", "Three", "Two"]
+    counts = queue.counts()
+    assert (counts["queued"], counts["running"], counts["done"], counts["failed"]) == (0, 0, 3, 1)
+    assert queue.failed_jobs()[0]["error"] == "validation failed"
+    assert worker.completed == 3 and worker.failed == 2
+    # The shared budget is only attached while the worker runs
+    assert concurrency_controller("secret_worker_test").budget is None
+
+
+def test_retried_job_resumes_into_the_page_it_created(tmp_path, monkeypatch, notion):
+    monkeypatch.setattr(md2notion_cli, "create_notion_client", lambda token: notion)
+    path = tmp_path / "long.md"
+    path.write_text("\n\n".join(f"Paragraph {n}" for n in range(250)), encoding="utf-8")
+    queue = JobQueue(tmp_path / "jobs.db", max_attempts=2)
+    job_id, = queue.enqueue([{"path": str(path), "target": "a" * 32, "options": {"title": None}}])
+    
+    # The second append of the first attempt fails after the first one went in
+    append = notion.blocks.children.append
+    appends = []
+    
+    async def flaky_append(**kwargs):
+        appends.append(kwargs["block_id"])
+        if len(appends) == 2:
+            raise RuntimeError("service unavailable")
+        return await append(**kwargs)
+    notion.blocks.children.append = flaky_append
+    
+    worker = Worker(queue, "secret_worker_resume", worker_id="w1", requests_per_second=1000, poll_seconds=0.01)
+    asyncio.run(worker.run(exit_when_done=True))
+    
+    assert worker.failed == 1 and worker.completed == 1
+    assert [page["title"] for page in notion.created] == ["long"]
+    page_id = notion.created[0]["id"]
+    assert notion.texts(page_id) == [f"Paragraph {n}" for n in range(250)]
+    assert queue.counts()["done"] == 1
+    with queue._lock:
+        row = queue._db.execute("SELECT page_id, url FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    assert (row["page_id"], row["url"]) == (page_id, f"https://notion.so/{page_id}")
+
+
+def test_lost_lease_waits_for_the_cancelled_upload(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.db")
+    queue.enqueue([job()])
+    worker = Worker(queue, "secret_worker_lease", worker_id="w1", lease_seconds=0.03)
+    queue.heartbeat = lambda job_id, worker_id, lease_seconds: False
+    finished = []
+    
+    async def hanging_upload(claimed):
+        try:
+            await asyncio.sleep(10)
+        finally:
+            await asyncio.sleep(0)
+            finished.append(claimed["id"])
+    worker._upload = hanging_upload
+    
+    claimed = queue.claim("w1", 0.03)
+    asyncio.run(worker.run_job(claimed))
+    assert finished == [claimed["id"]]
+
+
+def test_interrupted_page_creation_is_reported(tmp_path, monkeypatch, notion, caplog):
+    monkeypatch.setattr(md2notion_cli, "create_notion_client", lambda token: notion)
+    path = tmp_path / "doc.md"
+    path.write_text("Some text.\n", encoding="utf-8")
+    queue = JobQueue(tmp_path / "jobs.db", max_attempts=2)
+    job_id, = queue.enqueue([{"path": str(path), "target": "a" * 32, "options": {"title": None}}])
+    
+    def recorded_page():
+        with queue._lock:
+            return queue._db.execute("SELECT page_id FROM jobs WHERE id = ?", (job_id,)).fetchone()["page_id"]
+    
+    # The first attempt dies after Notion created its page, before the page was recorded
+    create = notion.pages.create
+    markers = []
+    
+    async def dying_create(**kwargs):
+        markers.append(recorded_page())
+        page = await create(**kwargs)
+        if len(markers) == 1:
+            raise RuntimeError("worker died")
+        return page
+    notion.pages.create = dying_create
+    
+    worker = Worker(queue, "secret_worker_marker", worker_id="w1", requests_per_second=1000, poll_seconds=0.01)
+    with caplog.at_level(logging.WARNING, logger="md2notion_worker"):
+        asyncio.run(worker.run(exit_when_done=True))
+    
+    assert markers == [CREATING_PAGE, CREATING_PAGE]
+    assert any("may hold a duplicate 'doc' page" in record.getMessage() for record in caplog.records)
+    assert recorded_page() == notion.created[1]["id"]
+    assert queue.counts()["done"] == 1
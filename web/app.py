@@ -5,12 +5,39 @@ md2notion Web Application
 A simple web interface for converting Markdown files to Notion pages.
 """
 
+import logging
 import os
 import tempfile
-import asyncio
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for
+import time
+from flask import Flask, Response, g, render_template, request, jsonify, flash, redirect, url_for
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 from md2notion_cli import MarkdownToNotionConverter
+from md2notion_logging import configure_logging, set_request_id
+from md2notion_metrics import (
+    ACTIVE_JOBS,
+    CONCURRENCY_WINDOW,
+    HTTP_REQUEST_SECONDS,
+    QUEUED_JOBS,
+    render,
+)
+from md2notion_service import (
+    AppendCoalescer,
+    BackgroundLoop,
+    ConversionPool,
+    ConversionTimeout,
+    DocumentTooLarge,
+    FairScheduler,
+    DEFAULT_COALESCE_WINDOW,
+    DEFAULT_CONVERSION_TIMEOUT,
+    DEFAULT_CONVERSION_WORKERS,
+    DEFAULT_MAX_ACTIVE_JOBS,
+    DEFAULT_MAX_DOCUMENT_BYTES,
+    DEFAULT_TENANT_ACTIVE_JOBS,
+)
+from md2notion_throttle import concurrency_controller, concurrency_stats, token_key
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -19,6 +46,58 @@ app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-producti
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'md', 'markdown', 'txt'}
 
+# Conversion runs in worker processes, so a large document cannot stall other requests
+MAX_DOCUMENT_BYTES = int(os.environ.get('MAX_DOCUMENT_BYTES', DEFAULT_MAX_DOCUMENT_BYTES))
+conversions = ConversionPool(
+    workers=int(os.environ.get('CONVERSION_WORKERS', DEFAULT_CONVERSION_WORKERS)),
+    max_bytes=MAX_DOCUMENT_BYTES,
+    timeout=float(os.environ.get('CONVERSION_TIMEOUT', DEFAULT_CONVERSION_TIMEOUT))
+)
+# Larger requests are refused before they are read; the form fields need some room
+app.config['MAX_CONTENT_LENGTH'] = MAX_DOCUMENT_BYTES + 64 * 1024
+
+# Jobs from different integration tokens (tenants) share the workers fairly
+scheduler = FairScheduler(
+    max_active=int(os.environ.get('MAX_ACTIVE_JOBS', DEFAULT_MAX_ACTIVE_JOBS)),
+    tenant_active=int(os.environ.get('TENANT_ACTIVE_JOBS', DEFAULT_TENANT_ACTIVE_JOBS))
+)
+TOKEN_REQUESTS_PER_SECOND = float(os.environ.get('TOKEN_REQUESTS_PER_SECOND', 3))
+# Scheduling cost unit: one job per this many bytes of Markdown
+JOB_COST_BYTES = 64 * 1024
+
+# One event loop serves all requests, so appends to a page can be coalesced;
+# only each coalesced batch takes a scheduler slot
+background = BackgroundLoop()
+coalescer = AppendCoalescer(float(os.environ.get('APPEND_COALESCE_WINDOW', DEFAULT_COALESCE_WINDOW)),
+                            conversions, scheduler)
+
+
+def set_token_budget(notion_token):
+    """Apply the per-token request rate to the token's concurrency controller"""
+    concurrency_controller(notion_token).requests_per_second = TOKEN_REQUESTS_PER_SECOND
+
+
+def run_tenant_job(notion_token, factory, size):
+    """Run a Notion job through the fair scheduler, within the token's rate budget"""
+    set_token_budget(notion_token)
+    cost = 1.0 + size / JOB_COST_BYTES
+    return background.run(scheduler.run(token_key(notion_token), factory, cost))
+
+
+async def upload_converted_file(converter, path, page_id, title):
+    """Convert a file in the worker pool, then upload its blocks as a new page"""
+    blocks = await conversions.convert(path=path)
+    return await converter.upload_blocks_to_notion(blocks, page_id, title)
+
+
+def conversion_error(error):
+    """Response for a document the conversion pool refused or gave up on"""
+    logger.warning(f"Conversion refused: {str(error)}", extra={'event': 'conversion_refused'})
+    if isinstance(error, DocumentTooLarge):
+        return jsonify({'error': f'Document too large: {str(error)}'}), 413
+    return jsonify({'error': f'Document took too long to convert: {str(error)}'}), 422
+
+
 # Create upload folder if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -34,6 +113,47 @@ def index():
     return render_template('index.html')
 
 
+@app.route('/api/queue')
+def queue_status():
+    """Per-tenant queue depth, wait times and Notion concurrency, keyed by token fingerprint"""
+    tenants = background.call(scheduler.stats)
+    notion = concurrency_stats()
+    for key, stats in tenants.items():
+        stats['notion'] = notion.get(key)
+    return jsonify({'active_jobs': scheduler.active, 'tenants': tenants})
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics: request latency, job queues and Notion API traffic"""
+    tenants = background.call(scheduler.stats)
+    ACTIVE_JOBS.set(scheduler.active)
+    QUEUED_JOBS.replace({(key,): stats['queued'] for key, stats in tenants.items()})
+    CONCURRENCY_WINDOW.replace({(key,): stats['window'] for key, stats in concurrency_stats().items()})
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.before_request
+def start_request():
+    g.request_started = time.perf_counter()
+    g.request_id = set_request_id(request.headers.get('X-Request-ID', '')[:64] or None)
+
+
+@app.after_request
+def finish_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        duration = time.perf_counter() - started
+        HTTP_REQUEST_SECONDS.observe(duration, endpoint=request.endpoint or 'unknown', status=str(response.status_code))
+        logger.log(logging.WARNING if response.status_code >= 500 else logging.INFO,
+                   f"{request.method} {request.path} {response.status_code}",
+                   extra={'event': 'http_request', 'status': response.status_code,
+                          'duration_ms': round(duration * 1000, 1)})
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """Handle file upload and conversion"""
@@ -55,7 +175,7 @@ def upload_file():
             from md2notion_cli import extract_page_id_from_url
             page_id = extract_page_id_from_url(page_id_input)
             if page_id != page_id_input:
-                print(f"Extracted page ID: {page_id} from URL")
+                logger.debug(f"Extracted page ID: {page_id} from URL")
         except ValueError as e:
             return jsonify({'error': f'Invalid page ID or URL: {str(e)}'}), 400
         
@@ -79,29 +199,15 @@ def upload_file():
                 page_title = title if title else os.path.splitext(filename)[0]
                 
                 # Upload to Notion (async)
-                print(f"🔍 DEBUG: Starting Notion upload process")
-                print(f"🔍 DEBUG: File path: {temp_path}")
-                print(f"🔍 DEBUG: Page ID: {page_id}")
-                print(f"🔍 DEBUG: Page title: {page_title}")
-                
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    print(f"🔍 DEBUG: Creating async event loop")
-                    page_url = loop.run_until_complete(
-                        converter.upload_file_to_notion(temp_path, page_id, page_title)
-                    )
-                    print(f"🔍 DEBUG: Successfully got page URL: {page_url}")
-                except Exception as async_error:
-                    print(f"❌ DEBUG: Async operation failed: {str(async_error)}")
-                    print(f"❌ DEBUG: Error type: {type(async_error).__name__}")
-                    import traceback
-                    print(f"❌ DEBUG: Full traceback:")
-                    traceback.print_exc()
-                    raise async_error
-                finally:
-                    print(f"🔍 DEBUG: Closing event loop")
-                    loop.close()
+                size = os.path.getsize(temp_path)
+                logger.info(f"Uploading file to page {page_id}",
+                            extra={'event': 'upload_started', 'page_id': page_id, 'bytes': size})
+                page_url = run_tenant_job(
+                    notion_token,
+                    lambda: upload_converted_file(converter, temp_path, page_id, page_title),
+                    size
+                )
+                logger.info(f"Uploaded file to {page_url}", extra={'event': 'upload_finished', 'page_id': page_id})
                 
                 # Clean up temporary file
                 os.remove(temp_path)
@@ -113,17 +219,17 @@ def upload_file():
                     'title': page_title
                 })
                 
+            except (DocumentTooLarge, ConversionTimeout) as e:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return conversion_error(e)
             except Exception as e:
-                print(f"❌ DEBUG: File upload error: {str(e)}")
-                print(f"❌ DEBUG: Error type: {type(e).__name__}")
-                import traceback
-                print(f"❌ DEBUG: Full traceback for file upload:")
-                traceback.print_exc()
+                logger.exception(f"File upload to page {page_id} failed: {str(e)}",
+                                 extra={'event': 'upload_failed', 'page_id': page_id})
                 
                 # Clean up temporary file on error
                 if os.path.exists(temp_path):
                     os.remove(temp_path)
-                    print(f"🔍 DEBUG: Cleaned up temporary file: {temp_path}")
                 
                 return jsonify({'error': f'Error uploading to Notion: {str(e)}'}), 500
                 
@@ -133,30 +239,15 @@ def upload_file():
                 # Convert and append to Notion
                 converter = MarkdownToNotionConverter(notion_token)
                 
-                # Append content to existing page (async)
-                print(f"🔍 DEBUG: Starting Notion append process")
-                print(f"🔍 DEBUG: Page ID: {page_id}")
-                print(f"🔍 DEBUG: Content length: {len(markdown_text)} characters")
-                print(f"🔍 DEBUG: Content preview: {markdown_text[:200]}...")
-                
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    print(f"🔍 DEBUG: Creating async event loop for append")
-                    page_url = loop.run_until_complete(
-                        converter.append_markdown_to_notion(markdown_text, page_id)
-                    )
-                    print(f"🔍 DEBUG: Successfully appended content, page URL: {page_url}")
-                except Exception as async_error:
-                    print(f"❌ DEBUG: Async append operation failed: {str(async_error)}")
-                    print(f"❌ DEBUG: Error type: {type(async_error).__name__}")
-                    import traceback
-                    print(f"❌ DEBUG: Full traceback for append:")
-                    traceback.print_exc()
-                    raise async_error
-                finally:
-                    print(f"🔍 DEBUG: Closing event loop for append")
-                    loop.close()
+                # Append content to existing page (async); only its size is
+                # logged, never the content
+                logger.info(f"Appending text to page {page_id}",
+                            extra={'event': 'append_started', 'page_id': page_id, 'chars': len(markdown_text)})
+                # Snippets for the same page arriving together share one
+                # upload, which the coalescer schedules as one tenant job
+                set_token_budget(notion_token)
+                page_url = background.run(coalescer.append(converter, markdown_text, page_id))
+                logger.info(f"Appended text to {page_url}", extra={'event': 'append_finished', 'page_id': page_id})
                 
                 return jsonify({
                     'success': True,
@@ -165,22 +256,19 @@ def upload_file():
                     'title': 'Content appended'
                 })
                 
+            except (DocumentTooLarge, ConversionTimeout) as e:
+                return conversion_error(e)
             except Exception as e:
-                print(f"❌ DEBUG: Text append error: {str(e)}")
-                print(f"❌ DEBUG: Error type: {type(e).__name__}")
-                import traceback
-                print(f"❌ DEBUG: Full traceback for text append:")
-                traceback.print_exc()
+                logger.exception(f"Text append to page {page_id} failed: {str(e)}",
+                                 extra={'event': 'append_failed', 'page_id': page_id})
                 return jsonify({'error': f'Error appending to Notion: {str(e)}'}), 500
         else:
             return jsonify({'error': 'Please provide either a file or markdown text'}), 400
             
+    except RequestEntityTooLarge:
+        return jsonify({'error': f'Upload is larger than {MAX_DOCUMENT_BYTES} bytes'}), 413
     except Exception as e:
-        print(f"❌ DEBUG: Unexpected error in upload_file: {str(e)}")
-        print(f"❌ DEBUG: Error type: {type(e).__name__}")
-        import traceback
-        print(f"❌ DEBUG: Full traceback for unexpected error:")
-        traceback.print_exc()
+        logger.exception(f"Unexpected error in upload_file: {str(e)}")
         return jsonify({'error': f'Unexpected error: {str(e)}'}), 500
 
 
@@ -190,6 +278,9 @@ if __name__ == '__main__':
     
     # Run in debug mode if FLASK_ENV is set to development
     debug = os.environ.get('FLASK_ENV') == 'development'
+    configure_logging(os.environ.get('LOG_LEVEL', 'DEBUG' if debug else 'INFO'),
+                      json_format=os.environ.get('LOG_FORMAT', 'json') == 'json',
+                      sample_rate=float(os.environ.get('LOG_SAMPLE_RATE', 1.0)))
     
     print(f"Starting md2notion web server on port {port}")
     print("Open your browser and go to: http://localhost:5000")